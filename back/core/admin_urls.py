@@ -0,0 +1,7 @@
+from django.contrib import admin
+
+# Included by core.urls and imported on first use, so API workers never load the admin
+# modules unless an admin page is requested (or a URL is reversed)
+admin.autodiscover()
+
+urlpatterns = admin.site.get_urls()
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -10,7 +11,7 @@ DEBUG = True
 ALLOWED_HOSTS = []
 
 INSTALLED_APPS = [
-    'django.contrib.admin',
+    'django.contrib.admin.apps.SimpleAdminConfig',  # autodiscovered by courses.apps or core.admin_urls
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -57,13 +58,194 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'core.wsgi.application'
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DJANGO_DB_ENGINE picks the profile: 'sqlite' (default) or 'postgres'
+DB_ENGINE = os.environ.get('DJANGO_DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgres':
+    # Requires psycopg 3 (pip install "psycopg[binary,pool]"). DJANGO_DB_POOL=1 switches from
+    # persistent per-worker connections to a psycopg_pool pool; Django rejects both at once.
+    DB_POOL = os.environ.get('DJANGO_DB_POOL', '') == '1'
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DJANGO_DB_NAME', 'webproject'),
+            'USER': os.environ.get('DJANGO_DB_USER', 'postgres'),
+            'PASSWORD': os.environ.get('DJANGO_DB_PASSWORD', ''),
+            'HOST': os.environ.get('DJANGO_DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DJANGO_DB_PORT', '5432'),
+            'CONN_MAX_AGE': 0 if DB_POOL else int(os.environ.get('DJANGO_DB_CONN_MAX_AGE', 600)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.environ.get('DJANGO_DB_POOL_MIN_SIZE', 2)),
+                    'max_size': int(os.environ.get('DJANGO_DB_POOL_MAX_SIZE', 10)),
+                    'timeout': 10,
+                },
+            } if DB_POOL else {},
+        }
     }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DJANGO_DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': int(os.environ.get('DJANGO_DB_CONN_MAX_AGE', 600)),
+            'OPTIONS': {
+                # Take the write lock at BEGIN: a deferred transaction that reads and then
+                # writes fails with "database is locked" instead of waiting on busy_timeout.
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
+    }
+
+# Read replicas (courses.routing): DJANGO_DB_REPLICAS lists them comma-separated, as
+# host[:port] with postgres or as file paths with sqlite (kept in sync locally by
+# `manage.py replicate_sqlite`). A user who wrote reads from the primary for
+# DATABASE_PIN_SECONDS afterwards, pinned in the API cache, which must then be shared by
+# the server processes (check courses.E001). Tests run every replica alias against the primary.
+DATABASE_REPLICAS = []
+for number, replica in enumerate(filter(None, os.environ.get('DJANGO_DB_REPLICAS', '').split(',')), 1):
+    config = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+    if DB_ENGINE == 'postgres':
+        host, _, port = replica.strip().partition(':')
+        config.update(HOST=host, PORT=port or config['PORT'])
+    else:
+        config.update(NAME=replica.strip(), OPTIONS={})  # read-only: no IMMEDIATE transactions
+    DATABASES[f'replica{number}'] = config
+    DATABASE_REPLICAS.append(f'replica{number}')
+DATABASE_PIN_SECONDS = float(os.environ.get('DJANGO_DB_PIN_SECONDS', 5))
+if DATABASE_REPLICAS:
+    DATABASE_ROUTERS = ['courses.routing.PrimaryReplicaRouter']
+    MIDDLEWARE.insert(1, 'courses.routing.DatabaseRoutingMiddleware')
+
+# Applied to every new SQLite connection by courses.signals.tune_sqlite_connection.
+# DJANGO_SQLITE_PRAGMAS=0 keeps SQLite's defaults (for comparison in bench_enrollments).
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',  # readers don't block the writer (persisted in the db file)
+    'synchronous': 'NORMAL',  # fsync at checkpoints only; safe with WAL
+    'busy_timeout': int(os.environ.get('DJANGO_SQLITE_BUSY_TIMEOUT', 20000)),  # ms to wait for the write lock
+    'mmap_size': 134217728,  # 128 MB of memory-mapped reads
+    'temp_store': 'MEMORY',
+} if os.environ.get('DJANGO_SQLITE_PRAGMAS', '1') == '1' else {}
+
+# Locmem is per process; point DJANGO_CACHE_BACKEND/LOCATION at Redis or a file cache
+# (e.g. django.core.cache.backends.redis.RedisCache) so invalidation reaches every worker.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('DJANGO_CACHE_LOCATION', 'webproject'),
+    },
+    # Throttle histories (courses.throttling): local to each process unless pointed at a shared cache
+    'throttle': {
+        'BACKEND': os.environ.get('DJANGO_THROTTLE_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('DJANGO_THROTTLE_CACHE_LOCATION', 'throttle'),
+    },
 }
 
+API_CACHE_TIMEOUT = int(os.environ.get('API_CACHE_TIMEOUT', 300))
+
+# Seconds a request waits for an identical anonymous read already being computed by
+# another thread (or coroutine) of the process before computing it itself; 0 disables
+API_COALESCE_TIMEOUT = float(os.environ.get('API_COALESCE_TIMEOUT', 10))
+
+# Per-scope rate limits (courses.throttling); API_THROTTLING=0 turns them all off
+API_THROTTLING = os.environ.get('API_THROTTLING', '1') == '1'
+API_THROTTLE_CACHE = 'throttle'
+
+# Serve course/enrollment lists through the values()-based fast path (courses.fastpath)
+API_FAST_LIST = os.environ.get('API_FAST_LIST', '1') == '1'
+
+# Route the hot read endpoints to courses.async_views. Meant for ASGI (core.asgi under
+# uvicorn); under WSGI every async view would pay for its own event loop.
+API_ASYNC_VIEWS = os.environ.get('API_ASYNC_VIEWS', '') == '1'
+
+# Opt-in request profiling (courses.profiling): Server-Timing headers on every response
+# and per-view histograms at /api/metrics/ (staff only). Requests sampled at
+# API_PROFILING_SAMPLE_RATE run under cProfile; those slower than API_PROFILING_SLOW_MS
+# are dumped to API_PROFILING_DIR. Requests running one query shape at least
+# API_PROFILING_REPEATED_QUERIES times are logged as likely N+1s.
+API_PROFILING = os.environ.get('API_PROFILING', '') == '1'
+API_PROFILING_SAMPLE_RATE = float(os.environ.get('API_PROFILING_SAMPLE_RATE', 0))
+API_PROFILING_SLOW_MS = int(os.environ.get('API_PROFILING_SLOW_MS', 500))
+API_PROFILING_DIR = os.environ.get('API_PROFILING_DIR', BASE_DIR / 'profiles')
+API_PROFILING_REPEATED_QUERIES = int(os.environ.get('API_PROFILING_REPEATED_QUERIES', 5))
+if API_PROFILING:
+    # Outermost, so the totals cover every other middleware
+    MIDDLEWARE.insert(0, 'courses.profiling.ProfilingMiddleware')
+
+# Delta sync (/api/changes/, courses.changes): cursors stop short of change log entries
+# younger than API_SYNC_SETTLE seconds, which may still have earlier ids committing;
+# entries are kept for API_SYNC_RETENTION seconds (pruned by run_workers)
+API_SYNC_SETTLE = float(os.environ.get('API_SYNC_SETTLE', 2))
+API_SYNC_RETENTION = int(os.environ.get('API_SYNC_RETENTION', 30 * 24 * 3600))
+
+# Admin performance mode (courses.admin_performance) for the large course, enrollment and
+# user tables: changelist counts stop at ADMIN_COUNT_LIMIT rows (unfiltered lists show the
+# table statistics' estimate instead), course and teacher filters load through
+# autocomplete, searches match indexed prefixes and each page shows its query count.
+ADMIN_PERFORMANCE_MODE = os.environ.get('DJANGO_ADMIN_PERFORMANCE_MODE', '1') == '1'
+ADMIN_COUNT_LIMIT = int(os.environ.get('DJANGO_ADMIN_COUNT_LIMIT', 10000))
+
+# Worker boot (courses.startup). core.wsgi/core.asgi set DJANGO_LAZY_ADMIN=1, so served
+# processes import the admin modules on the first admin request; manage.py commands
+# (checks, tests, runserver) still load them at startup. `manage.py startup_report`
+# fails when boot plus the first response takes longer than STARTUP_BUDGET_MS.
+LAZY_ADMIN = os.environ.get('DJANGO_LAZY_ADMIN', '') == '1'
+STARTUP_BUDGET_MS = int(os.environ.get('STARTUP_BUDGET_MS', 1500))
+
+# Background jobs (courses.jobs), run by `manage.py run_workers`. A claimed job is
+# leased for JOBS_LEASE seconds before another worker may retry it; failures back off
+# exponentially from JOBS_RETRY_BACKOFF seconds, up to JOBS_MAX_ATTEMPTS attempts.
+# Finished jobs, and so their idempotency keys, are kept for JOBS_RETENTION seconds.
+JOBS_WORKER_THREADS = int(os.environ.get('JOBS_WORKER_THREADS', 2))
+JOBS_POLL_INTERVAL = float(os.environ.get('JOBS_POLL_INTERVAL', 1.0))
+JOBS_CLAIM_SIZE = int(os.environ.get('JOBS_CLAIM_SIZE', 50))
+JOBS_LEASE = int(os.environ.get('JOBS_LEASE', 300))
+JOBS_MAX_ATTEMPTS = int(os.environ.get('JOBS_MAX_ATTEMPTS', 5))
+JOBS_RETRY_BACKOFF = float(os.environ.get('JOBS_RETRY_BACKOFF', 10))
+JOBS_RETRY_MAX_DELAY = float(os.environ.get('JOBS_RETRY_MAX_DELAY', 3600))
+JOBS_RETENTION = int(os.environ.get('JOBS_RETENTION', 7 * 24 * 3600))
+
+# Welcome and enrollment emails (courses.notifications); printed to the worker's stdout
+# unless another backend is configured
+EMAIL_BACKEND = os.environ.get('DJANGO_EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+DEFAULT_FROM_EMAIL = os.environ.get('DJANGO_DEFAULT_FROM_EMAIL', 'courses@localhost')
+
+# Password hashing profile. DJANGO_PASSWORD_HASHER picks the hasher for new and rehashed
+# passwords: 'pbkdf2' (default), 'scrypt' or 'argon2' (needs argon2-cffi). The others stay
+# listed so existing hashes still verify; they are upgraded on the user's next login.
+PASSWORD_HASHER = os.environ.get('DJANGO_PASSWORD_HASHER', 'pbkdf2')
+_PASSWORD_HASHERS = {
+    'pbkdf2': 'courses.passwords.TunedPBKDF2PasswordHasher',
+    'scrypt': 'courses.passwords.TunedScryptPasswordHasher',
+    'argon2': 'courses.passwords.TunedArgon2PasswordHasher',
+}
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[PASSWORD_HASHER]] + [
+    path for name, path in _PASSWORD_HASHERS.items() if name != PASSWORD_HASHER
+] + [
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+# Cost parameters; changing them also rehashes on the next login
+PASSWORD_HASHER_PARAMS = {
+    'pbkdf2': {'iterations': int(os.environ.get('DJANGO_PBKDF2_ITERATIONS', 1_000_000))},
+    'scrypt': {
+        # N=2^15, r=8, p=3: 32 MiB per hash, one of OWASP's equivalent minimum settings
+        'work_factor': 2 ** int(os.environ.get('DJANGO_SCRYPT_LOG_N', 15)),
+        'block_size': int(os.environ.get('DJANGO_SCRYPT_BLOCK_SIZE', 8)),
+        'parallelism': int(os.environ.get('DJANGO_SCRYPT_PARALLELISM', 3)),
+    },
+    'argon2': {
+        # argon2id, m=19 MiB, t=2, p=1 (OWASP's minimum)
+        'time_cost': int(os.environ.get('DJANGO_ARGON2_TIME_COST', 2)),
+        'memory_cost': int(os.environ.get('DJANGO_ARGON2_MEMORY_COST', 19456)),  # KiB
+        'parallelism': int(os.environ.get('DJANGO_ARGON2_PARALLELISM', 1)),
+    },
+}
+
+# Login loads the profile with the user (for the role claims in the token)
+AUTHENTICATION_BACKENDS = ['courses.authentication.ProfileModelBackend']
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -91,13 +273,29 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Opt-in: build request.user from the JWT role claims instead of loading User and Profile
+# on every request. Role changes then apply once the access token is refreshed.
+JWT_STATELESS_AUTH = os.environ.get('JWT_STATELESS_AUTH', '') == '1'
+
+FULL_USER_CACHE_TIMEOUT = 60
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'courses.authentication.StatelessJWTAuthentication' if JWT_STATELESS_AUTH
+        else 'courses.authentication.AsyncJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
-    )
+    ),
+    # Per client address (or user): token and registration attempts, anonymous course/category reads
+    'DEFAULT_THROTTLE_RATES': {
+        'login': os.environ.get('API_THROTTLE_LOGIN', '20/min'),
+        'register': os.environ.get('API_THROTTLE_REGISTER', '10/hour'),
+        'anon_read': os.environ.get('API_THROTTLE_ANON_READ', '600/min'),
+    },
+    # Proxies in front of the app whose X-Forwarded-For entries are trusted; with 0 the
+    # client address is REMOTE_ADDR, so clients can't pick their own throttle key
+    'NUM_PROXIES': int(os.environ.get('DJANGO_NUM_PROXIES', 0)),
 }
 
 SIMPLE_JWT = {
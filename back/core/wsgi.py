@@ -3,5 +3,13 @@ import os
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+# The admin modules load with the first admin request, not at worker boot
+os.environ.setdefault('DJANGO_LAZY_ADMIN', '1')
 
 application = get_wsgi_application()
+
+# Build what each worker's first requests would otherwise pay for (URL resolution,
+# serializer fields, translations); see courses.startup
+from courses.startup import warm
+
+warm()
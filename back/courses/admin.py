@@ -1,7 +1,9 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
-from .models import Profile, Category, Course, Enrollment
+from django.utils import timezone
+from .admin_performance import PerformanceAdminMixin
+from .models import Profile, Category, Course, Enrollment, Job
 
 class ProfileInline(admin.StackedInline):
     model = Profile
@@ -9,7 +11,7 @@ class ProfileInline(admin.StackedInline):
     verbose_name_plural = 'Profiles'
     fk_name = 'user'
 
-class CustomUserAdmin(BaseUserAdmin):
+class CustomUserAdmin(PerformanceAdminMixin, BaseUserAdmin):
     inlines = (ProfileInline,)
     list_display = ('username', 'email', 'first_name', 'last_name', 'is_staff', 'get_is_student', 'get_is_teacher')
     list_select_related = ('profile',)
@@ -32,17 +34,36 @@ class CategoryAdmin(admin.ModelAdmin):
     prepopulated_fields = {'slug': ('name',)}
 
 @admin.register(Course)
-class CourseAdmin(admin.ModelAdmin):
+class CourseAdmin(PerformanceAdminMixin, admin.ModelAdmin):
     list_display = ('title', 'teacher', 'category', 'created_at', 'updated_at')
     list_filter = ('category', 'teacher', 'created_at')
     search_fields = ('title', 'description', 'teacher__username')
     prepopulated_fields = {'slug': ('title',)}
     list_select_related = ('teacher', 'category', 'teacher__profile')
+    lazy_filters = ('teacher',)
+    lazy_form_fields = ('teacher',)
+    prefix_search_fields = ('title_folded', 'teacher__username')  # course_title_folded_idx
 
 @admin.register(Enrollment)
-class EnrollmentAdmin(admin.ModelAdmin):
+class EnrollmentAdmin(PerformanceAdminMixin, admin.ModelAdmin):
     list_display = ('student', 'course', 'enrolled_at')
     list_filter = ('course', 'enrolled_at')
     search_fields = ('student__username', 'course__title')
     autocomplete_fields = ('student', 'course')
-    list_select_related = ('student', 'course')
\ No newline at end of file
+    list_select_related = ('student', 'course')
+    lazy_filters = ('course',)
+    prefix_search_fields = ('student__username', 'course__title_folded')
+    performance_ordering = ('-pk',)  # Follows enrolled_at, which has no index of its own
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'key', 'status', 'attempts', 'run_at', 'created_at', 'finished_at')
+    list_filter = ('status', 'kind')
+    search_fields = ('key',)
+    readonly_fields = ('claimed_by', 'started_at', 'finished_at', 'last_error')
+    actions = ('retry_jobs',)
+
+    @admin.action(description='Queue selected jobs again')
+    def retry_jobs(self, request, queryset):
+        retried = queryset.exclude(status=Job.RUNNING).update(status=Job.QUEUED, attempts=0, run_at=timezone.now(), finished_at=None)
+        self.message_user(request, f'{retried} jobs queued.')
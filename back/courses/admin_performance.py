@@ -0,0 +1,220 @@
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db import connections, router
+from django.db.models import Q
+from django.forms import Media
+from django.test.utils import CaptureQueriesContext
+from django.utils.functional import cached_property
+from django.utils.text import unescape_string_literal
+from .models import FoldedCharField
+
+# Admin performance mode (ADMIN_PERFORMANCE_MODE, on by default) for tables too large for
+# the stock changelist: counts are capped or estimated instead of a full COUNT(*),
+# high-cardinality foreign key filters become autocomplete widgets that load their
+# choices on demand, searches are prefix ranges on indexed columns, and every page
+# reports how many queries it ran (footer and X-Query-Count header).
+
+
+def performance_mode():
+    return getattr(settings, 'ADMIN_PERFORMANCE_MODE', True)
+
+
+def estimated_row_count(model):
+    # Planner statistics (ANALYZE) instead of a COUNT(*); None when there are none
+    connection = connections[router.db_for_read(model)]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+            row = cursor.fetchone()
+            return row[0] if row and row[0] >= 0 else None
+        if connection.vendor == 'sqlite':
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+            row = cursor.fetchone()
+            return int(row[0].split()[0]) if row else None
+    return None
+
+
+class CappedCountPaginator(Paginator):
+    # Counts at most ADMIN_COUNT_LIMIT + 1 rows. An unfiltered changelist over the limit
+    # shows the planner's row estimate; a filtered one stops at the limit.
+    capped = False
+    estimated = False
+
+    @cached_property
+    def count(self):
+        limit = getattr(settings, 'ADMIN_COUNT_LIMIT', 10000)
+        count = self.object_list.order_by()[:limit + 1].count()
+        if count <= limit:
+            return count
+        if not self.object_list.query.has_filters():
+            estimate = estimated_row_count(self.object_list.model)
+            if estimate is not None and estimate > limit:
+                self.estimated = True
+                return estimate
+        self.capped = True
+        return count
+
+
+class AutocompleteFilter(admin.FieldListFilter):
+    # Foreign key filter rendered as the admin's select2 autocomplete widget, backed by
+    # the related model admin's search: only the selected object is loaded with the page
+    template = 'admin/courses/autocomplete_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.lookup_kwarg = f'{field_path}__{field.target_field.name}__exact'
+        super().__init__(field, request, params, model, model_admin, field_path)
+        self.title = getattr(field, 'verbose_name', field_path)
+        self.widget = AutocompleteSelect(field, model_admin.admin_site, attrs={'style': 'width: 100%'})
+        self.widget.choices = field.formfield().choices  # Queried for the selected object only
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+
+    def choices(self, changelist):
+        value = self.used_parameters.get(self.lookup_kwarg)
+        value = value[-1] if isinstance(value, list) else value
+        yield {
+            'selected': value is None,
+            'query_string': changelist.get_query_string(remove=[self.lookup_kwarg]),
+            'widget': self.widget.render(self.lookup_kwarg, value, attrs={
+                'id': f'filter_{self.lookup_kwarg}',
+                'data-filter-url': changelist.get_query_string(remove=[self.lookup_kwarg, 'p']),
+            }),
+        }
+
+
+def prefix_bound(value):
+    # Smallest string greater than every string starting with value
+    return value[:-1] + chr(ord(value[-1]) + 1)
+
+
+def resolve_path(model, path):
+    *relations, name = path.split('__')
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    return relations, model._meta.get_field(name)
+
+
+def prefix_condition(model, path, term):
+    # path is an indexed field path; a FoldedCharField matches case-insensitively, the term
+    # folded the same way as the column. Related paths become an IN subquery on the
+    # related table's index.
+    relations, field = resolve_path(model, path)
+    value = field.fold(term) if isinstance(field, FoldedCharField) else term
+    condition = Q(**{f'{field.name}__gte': value, f'{field.name}__lt': prefix_bound(value)})
+    if not relations:
+        return condition
+    subquery = field.model._default_manager.filter(condition).values('pk')
+    return Q(**{f'{"__".join(relations)}__in': subquery})
+
+
+def search_label(model, path):
+    # A folded column is labelled by the column it copies
+    relations, field = resolve_path(model, path)
+    name = field.source_field if isinstance(field, FoldedCharField) else field.name
+    return ' '.join([*relations, name])
+
+
+class PerformanceAdminMixin:
+    # lazy_filters: list_filter entries shown as AutocompleteFilter in performance mode
+    # prefix_search_fields: replaces search_fields in performance mode (see prefix_condition)
+    # lazy_form_fields: foreign keys edited with autocomplete widgets in performance mode
+    # performance_ordering: default ordering that an index can serve
+    lazy_filters = ()
+    lazy_form_fields = ()
+    prefix_search_fields = ()
+    performance_ordering = None
+    change_list_template = 'admin/courses/performance_change_list.html'
+    change_form_template = 'admin/courses/performance_change_form.html'
+
+    @property
+    def show_full_result_count(self):
+        # The unfiltered total next to a filtered count is another COUNT(*) of the table
+        return not performance_mode()
+
+    @property
+    def media(self):
+        media = super().media
+        if performance_mode() and self.lazy_filters:
+            media += AutocompleteSelect(None, self.admin_site).media + Media(js=['courses/admin/autocomplete_filter.js'])
+        return media
+
+    def get_list_filter(self, request):
+        list_filter = super().get_list_filter(request)
+        if not performance_mode():
+            return list_filter
+        return [(name, AutocompleteFilter) if name in self.lazy_filters else name for name in list_filter]
+
+    def get_autocomplete_fields(self, request):
+        fields = super().get_autocomplete_fields(request)
+        if performance_mode():
+            fields = tuple(fields) + tuple(name for name in self.lazy_form_fields if name not in fields)
+        return fields
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        if not performance_mode():
+            return super().get_paginator(request, queryset, per_page, orphans, allow_empty_first_page)
+        return CappedCountPaginator(queryset, per_page, orphans, allow_empty_first_page)
+
+    def get_ordering(self, request):
+        if performance_mode() and self.performance_ordering:
+            return self.performance_ordering
+        return super().get_ordering(request)
+
+    def get_search_results(self, request, queryset, search_term):
+        if not (performance_mode() and self.prefix_search_fields):
+            return super().get_search_results(request, queryset, search_term)
+        # The whole term is one prefix (a range on the index), so it isn't split into words
+        term = search_term.strip()
+        if term[:1] in ('"', "'") and term[-1:] == term[0] and len(term) > 1:
+            term = unescape_string_literal(term)
+        if not term:
+            return queryset, False
+        condition = Q()
+        for path in self.prefix_search_fields:
+            condition |= prefix_condition(self.model, path, term)
+        return queryset.filter(condition), False
+
+    def get_search_help_text(self):
+        return 'Matches the start of: ' + ', '.join(search_label(self.model, path) for path in self.prefix_search_fields)
+
+    def get_changelist_instance(self, request):
+        changelist = super().get_changelist_instance(request)
+        if performance_mode() and self.prefix_search_fields:
+            changelist.search_help_text = self.get_search_help_text()
+        return changelist
+
+    def counted(self, view, request, *args, **kwargs):
+        if not performance_mode():
+            return view(request, *args, **kwargs)
+        with CaptureQueriesContext(connections[router.db_for_read(self.model)]) as queries:
+            response = view(request, *args, **kwargs)
+            if hasattr(response, 'render') and not response.is_rendered:
+                # Read when the footer renders, after the page's own queries
+                response.context_data['query_count'] = QueryCount(queries)
+                response.render()
+        response['X-Query-Count'] = str(len(queries))
+        return response
+
+    def changelist_view(self, request, extra_context=None):
+        return self.counted(super().changelist_view, request, extra_context)
+
+    def changeform_view(self, request, object_id=None, form_url='', extra_context=None):
+        return self.counted(super().changeform_view, request, object_id, form_url, extra_context)
+
+    def delete_view(self, request, object_id, extra_context=None):
+        return self.counted(super().delete_view, request, object_id, extra_context)
+
+
+class QueryCount:
+    def __init__(self, queries):
+        self.queries = queries
+
+    def __str__(self):
+        return str(len(self.queries))
@@ -1,4 +1,7 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.contrib.admin import autodiscover
+from django.core import checks
 
 class CoursesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
@@ -8,4 +11,9 @@ class CoursesConfig(AppConfig):
         try:
             import courses.signals
         except ImportError:
-            pass
\ No newline at end of file
+            pass
+        from .routing import check_pin_cache
+        checks.register(check_pin_cache, checks.Tags.caches)
+        # Served processes (LAZY_ADMIN) discover the admin modules in core.admin_urls instead
+        if not settings.LAZY_ADMIN:
+            autodiscover()
\ No newline at end of file
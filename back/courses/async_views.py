@@ -0,0 +1,200 @@
+import inspect
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.utils.decorators import classonlymethod
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, permissions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from .cache import acache, acached_response, aget_version
+from .models import Course, Enrollment
+from .profiling import timed
+from .renderers import FastJSONRenderer
+from .throttling import acheck_throttles
+from . import views
+
+# Async versions of the hot read endpoints, routed when API_ASYNC_VIEWS is on (ASGI
+# deployments). Each one reuses its DRF view for queryset, serializer, pagination and
+# permissions, fetches rows through the async ORM with courses.fastpath and renders
+# the same bytes; every other method (writes, OPTIONS) goes to the sync DRF view.
+
+
+def render(data):
+    with timed('render'):
+        return FastJSONRenderer().render(data)
+
+
+class AsyncAPIReadView(View):
+    view_class = None  # DRF view providing queryset, serializer, pagination and permissions
+    view_action = None
+    sync_view = None  # handles every method other than GET/HEAD
+    cache_resource = None  # anonymous responses use the CachedReadMixin cache when set
+    permission_classes = [permissions.AllowAny]  # only for views without a view_class
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        # Authentication is by JWT header only, like the DRF views
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method in ('GET', 'HEAD'):
+            return self.get(request, *args, **kwargs)
+        if self.sync_view is None:
+            return self.http_method_not_allowed(request, *args, **kwargs)
+        return sync_to_async(self.sync_view)(request, *args, **kwargs)
+
+    async def get(self, request, *args, **kwargs):
+        drf_request = Request(request)
+        view = self.initialize_view(drf_request, args, kwargs)
+        try:
+            drf_request.user = await self.authenticate(drf_request, view)
+            await self.check_permissions(drf_request, view)
+            if view is not None:
+                await acheck_throttles(drf_request, view)
+            if self.cache_resource and not drf_request.user.is_authenticated:
+                return await acached_response(
+                    request, view.get_cache_resources(), lambda: self.respond(view), view.cache_dependency
+                )
+            status, body = await self.respond(view)
+        except exceptions.APIException as exc:
+            return self.exception_response(drf_request, view, exc)
+        return HttpResponse(body, status=status, content_type='application/json', headers={'Vary': 'Accept'})
+
+    def initialize_view(self, request, args, kwargs):
+        if self.view_class is None:
+            return None
+        view = self.view_class(action=self.view_action, format_kwarg=None)
+        view.request, view.args, view.kwargs, view.headers = request, args, kwargs, {}
+        return view
+
+    def get_authenticators(self, view):
+        if view is not None:
+            return view.get_authenticators()
+        return [auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+
+    async def authenticate(self, request, view):
+        # APIClient.force_authenticate, honoured the way rest_framework.request.Request does
+        forced_user = getattr(request._request, '_force_auth_user', None)
+        if forced_user is not None:
+            return forced_user
+        for authenticator in self.get_authenticators(view):
+            if hasattr(authenticator, 'aauthenticate'):
+                result = await authenticator.aauthenticate(request)
+            else:
+                result = await sync_to_async(authenticator.authenticate)(request)
+            if result is not None:
+                return result[0]
+        return AnonymousUser()
+
+    async def check_permissions(self, request, view):
+        for permission in view.get_permissions() if view else [p() for p in self.permission_classes]:
+            # Permission classes may define has_permission as a coroutine
+            allowed = permission.has_permission(request, view)
+            if inspect.isawaitable(allowed):
+                allowed = await allowed
+            if not allowed:
+                if not request.user.is_authenticated:
+                    raise exceptions.NotAuthenticated()
+                raise exceptions.PermissionDenied(getattr(permission, 'message', None))
+
+    def exception_response(self, request, view, exc):
+        # Same body and headers as DRF's exception handler
+        data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+        headers, status = {'Vary': 'Accept'}, exc.status_code
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            authenticators = self.get_authenticators(view)
+            if authenticators:
+                headers['WWW-Authenticate'] = authenticators[0].authenticate_header(request)
+            else:
+                status = 403
+        if getattr(exc, 'wait', None):
+            headers['Retry-After'] = str(int(exc.wait))
+        return HttpResponse(render(data), status=status, content_type='application/json', headers=headers)
+
+    # Returns (status, body); runs inside the response cache for anonymous requests
+    async def respond(self, view):
+        representation = view.get_fast_representation()
+        if representation is None:
+            response = await sync_to_async(self.sync_view)(view.request._request, *view.args, **view.kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+            return response.status_code, response.content
+        await self.prepare_context(view, representation.serializer.context)
+        if self.view_action == 'retrieve':
+            return await self.retrieve(view, representation)
+        return await self.list(view, representation)
+
+    async def prepare_context(self, view, context):
+        pass
+
+    async def list(self, view, representation):
+        rows = view.get_fast_rows(representation, view.filter_queryset(view.get_queryset()))
+        if view.paginator is not None:
+            page = await view.paginator.apaginate_queryset(rows, view.request, view)
+            if page is not None:
+                return 200, render(view.get_paginated_response(representation.to_representation(page)).data)
+        return 200, render(representation.to_representation([row async for row in rows.aiterator()]))
+
+    async def retrieve(self, view, representation):
+        queryset = view.filter_queryset(view.get_queryset())
+        lookup = {view.lookup_field: view.kwargs[view.lookup_url_kwarg or view.lookup_field]}
+        row = await representation.values(queryset.filter(**lookup)).afirst()
+        if row is None:
+            raise exceptions.NotFound(f'No {queryset.model._meta.object_name} matches the given query.')
+        return 200, render(representation.to_representation([row])[0])
+
+
+class AsyncCourseListView(AsyncAPIReadView):
+    view_class = views.CourseViewSet
+    view_action = 'list'
+    sync_view = staticmethod(views.CourseViewSet.as_view({'get': 'list', 'post': 'create'}))
+    cache_resource = views.CourseViewSet.cache_resource
+
+
+class AsyncCourseDetailView(AsyncAPIReadView):
+    view_class = views.CourseViewSet
+    view_action = 'retrieve'
+    sync_view = staticmethod(views.CourseViewSet.as_view(
+        {'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'}
+    ))
+    cache_resource = views.CourseViewSet.cache_resource
+
+
+class AsyncCategoryListView(AsyncAPIReadView):
+    view_class = views.CategoryViewSet
+    view_action = 'list'
+    sync_view = staticmethod(views.CategoryViewSet.as_view({'get': 'list'}))
+    cache_resource = views.CategoryViewSet.cache_resource
+
+
+class AsyncEnrollmentListView(AsyncAPIReadView):
+    view_class = views.EnrollmentListCreateView
+    sync_view = staticmethod(views.EnrollmentListCreateView.as_view())
+
+    async def prepare_context(self, view, context):
+        # The nested courses' is_enrolled would otherwise query synchronously
+        user = view.request.user
+        context['enrolled_course_ids'] = {
+            course_id async for course_id in
+            Enrollment.objects.filter(student_id=user.id).values_list('course_id', flat=True)
+        }
+
+
+class AsyncMyCoursesView(AsyncAPIReadView):
+    view_class = views.MyCoursesView
+    sync_view = staticmethod(views.MyCoursesView.as_view())
+
+
+class AsyncCourseCountView(AsyncAPIReadView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    async def respond(self, view):
+        # Same per-version cache entry as course_count_view
+        key = f'api:course-count:{await aget_version(views.RESOURCE_COURSES):.3f}'
+        count = await acache('get', key)
+        if count is None:
+            count = await Course.objects.acount()
+            await acache('set', key, count, None)
+        return 200, render({"total_courses": count})
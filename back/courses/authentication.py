@@ -0,0 +1,107 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import User
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication, JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from .cache import get_cache
+
+
+class ClaimsProfile:
+    def __init__(self, is_student, is_teacher):
+        self.is_student = is_student
+        self.is_teacher = is_teacher
+
+
+# request.user built from the claims MyTokenObtainPairSerializer.get_token writes,
+# so role checks (`user.profile.is_teacher`) need no User or Profile query.
+class ClaimsUser(TokenUser):
+    @cached_property
+    def profile(self):
+        return ClaimsProfile(bool(self.token.get('is_student')), bool(self.token.get('is_teacher')))
+
+
+# Opt-in via JWT_STATELESS_AUTH: trusts role claims until the access token expires
+class StatelessJWTAuthentication(JWTStatelessUserAuthentication):
+    def get_user(self, validated_token):
+        user = super().get_user(validated_token)
+        return ClaimsUser(user.token)
+
+    async def aauthenticate(self, request):
+        # No database access, so async views can call it directly
+        return self.authenticate(request)
+
+
+# JWTAuthentication that also serves async views: token checks are CPU-only, the User
+# and its profile are loaded through the async ORM with the same checks as get_user().
+class AsyncJWTAuthentication(JWTAuthentication):
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+        try:
+            user = await User.objects.select_related('profile').aget(**{api_settings.USER_ID_FIELD: user_id})
+        except User.DoesNotExist:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return user
+
+
+def full_user_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+# For code paths that need a real User (FK assignment, nested serialization):
+# load it with its profile once and keep it for a short TTL.
+def get_full_user(user):
+    if isinstance(user, User):
+        return user
+    cache = get_cache()
+    key = full_user_key(user.id)
+    full_user = cache.get(key)
+    if full_user is None:
+        full_user = User.objects.select_related('profile').get(pk=user.id)
+        cache.set(key, full_user, getattr(settings, 'FULL_USER_CACHE_TIMEOUT', 60))
+    return full_user
+
+
+def forget_full_user(user_id):
+    get_cache().delete(full_user_key(user_id))
+
+
+# Password login (TokenObtainPairView, admin) that loads the profile in the same query:
+# MyTokenObtainPairSerializer.get_token() reads the role flags right after authenticating.
+class ProfileModelBackend(ModelBackend):
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = User._default_manager.select_related('profile').get(**{User.USERNAME_FIELD: username})
+        except User.DoesNotExist:
+            # Hash anyway, like ModelBackend, so unknown usernames take as long as wrong passwords
+            User().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
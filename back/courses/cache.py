@@ -0,0 +1,386 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import HttpResponse
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from . import routing
+
+# Each cached resource has a version key; bumping it orphans every response cached
+# under the previous version, so invalidation never has to enumerate keys.
+RESOURCE_COURSES = 'courses'
+RESOURCE_CATEGORIES = 'categories'
+# Course.enrollment_count changes with every enrollment, so it is versioned per course
+# (see CachedReadMixin.cache_dependency); the resource version itself only keys the
+# responses whose rows or order depend on every count (ordering=popular, min_enrollments).
+RESOURCE_ENROLLMENT_COUNTS = 'enrollment-counts'
+
+STATS = ('hit', 'miss', 'coalesced', 'not_modified', 'bypass')
+
+
+def get_cache():
+    return caches[getattr(settings, 'API_CACHE_ALIAS', 'default')]
+
+
+def version_key(resource):
+    return f'api:version:{resource}'
+
+
+def get_version(resource):
+    cache = get_cache()
+    version = cache.get(version_key(resource))
+    if version is None:
+        cache.add(version_key(resource), time.time(), timeout=None)
+        version = cache.get(version_key(resource))
+    return version
+
+
+def bump_version(*resources):
+    cache = get_cache()
+    for resource in resources:
+        previous = cache.get(version_key(resource)) or 0
+        # The version doubles as the Last-Modified time, so keep it strictly increasing
+        cache.set(version_key(resource), max(time.time(), previous + 0.001), timeout=None)
+
+
+def object_version_key(resource, pk):
+    return f'api:version:{resource}:{pk}'
+
+
+def bump_object_versions(resource, pks):
+    # Moves the resource version too, for the responses that depend on every object
+    bump_version(resource)
+    now = time.time()
+    get_cache().set_many({object_version_key(resource, pk): now for pk in pks}, timeout=None)
+
+
+def object_versions(resource, pks, create=True):
+    # {pk: version}; a missing version is created as 0 so that one evicted later never
+    # matches a recorded snapshot (None: evicted again before it could be read)
+    cache = get_cache()
+    keys = {object_version_key(resource, pk): pk for pk in pks}
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing and create:
+        for key in missing:
+            cache.add(key, 0.0, timeout=None)
+        found.update(cache.get_many(missing))
+    return {pk: found.get(key) for key, pk in keys.items()}
+
+
+# Runs cache.<method>() from async code. Django's async cache methods wrap the sync ones
+# in sync_to_async; locmem never blocks on I/O, so it is called directly instead of
+# paying a thread hop per call.
+async def acache(method, *args, **kwargs):
+    cache = get_cache()
+    if isinstance(cache, LocMemCache):
+        return getattr(cache, method)(*args, **kwargs)
+    return await getattr(cache, f'a{method}')(*args, **kwargs)
+
+
+async def aget_version(resource):
+    version = await acache('get', version_key(resource))
+    if version is None:
+        await acache('add', version_key(resource), time.time(), timeout=None)
+        version = await acache('get', version_key(resource))
+    return version
+
+
+async def aobject_versions(resource, pks, create=True):
+    keys = {object_version_key(resource, pk): pk for pk in pks}
+    found = await acache('get_many', list(keys))
+    missing = [key for key in keys if key not in found]
+    if missing and create:
+        for key in missing:
+            await acache('add', key, 0.0, timeout=None)
+        found.update(await acache('get_many', missing))
+    return {pk: found.get(key) for key, pk in keys.items()}
+
+
+def record(stat):
+    cache = get_cache()
+    key = f'api:stats:{stat}'
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+
+async def arecord(stat):
+    key = f'api:stats:{stat}'
+    await acache('add', key, 0, timeout=None)
+    try:
+        await acache('incr', key)
+    except ValueError:
+        await acache('set', key, 1, timeout=None)
+
+
+def get_stats():
+    cache = get_cache()
+    stats = {stat: cache.get(f'api:stats:{stat}', 0) for stat in STATS}
+    # Rejections per throttle scope (courses.throttling)
+    scopes = getattr(settings, 'REST_FRAMEWORK', {}).get('DEFAULT_THROTTLE_RATES', {})
+    stats['throttled'] = {scope: cache.get(f'api:stats:throttled:{scope}', 0) for scope in scopes}
+    return stats
+
+
+# The counters above in Prometheus text format, appended to /api/metrics/
+def render_stats():
+    stats = get_stats()
+    lines = [
+        '# HELP api_cache_responses_total Anonymous read responses by cache result',
+        '# TYPE api_cache_responses_total counter',
+    ]
+    lines += [f'api_cache_responses_total{{result="{stat}"}} {stats[stat]}' for stat in STATS]
+    lines += [
+        '# HELP api_throttled_requests_total Requests rejected by a throttle, by scope',
+        '# TYPE api_throttled_requests_total counter',
+    ]
+    lines += [f'api_throttled_requests_total{{scope="{scope}"}} {count}' for scope, count in stats['throttled'].items()]
+    return '\n'.join(lines) + '\n'
+
+
+# Single-flight: concurrent do(key, fn) calls with the same key share one run of fn.
+# Response-cache misses go through it, so a burst of identical anonymous reads (right
+# after an invalidation, or on a cold cache) runs the queries once per process instead
+# of once per request. Callers that wait longer than API_COALESCE_TIMEOUT seconds, or
+# whose leader failed, run fn themselves; a timeout of 0 turns coalescing off.
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.ok = False
+        self.result = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}  # key -> _Call in flight
+
+    def do(self, key, fn, timeout):
+        # Returns (result, shared)
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+        if not leader:
+            if call.done.wait(timeout) and call.ok:
+                return call.result, True
+            return fn(), False
+        try:
+            call.result = fn()
+            call.ok = True
+            return call.result, False
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+
+
+# The same for coroutines; calls are only shared within one event loop
+class AsyncSingleFlight:
+    def __init__(self):
+        self.calls = {}  # (loop, key) -> Future of the result, None if the leader failed
+
+    async def do(self, key, fn, timeout):
+        flight = (asyncio.get_running_loop(), key)
+        future = self.calls.get(flight)
+        if future is not None:
+            try:
+                result = await asyncio.wait_for(asyncio.shield(future), timeout)
+            except asyncio.TimeoutError:
+                result = None
+            if result is not None:
+                return result, True
+            return await fn(), False
+        future = self.calls[flight] = asyncio.get_running_loop().create_future()
+        result = None
+        try:
+            result = await fn()
+            return result, False
+        finally:
+            del self.calls[flight]
+            future.set_result(result)
+
+
+flights = SingleFlight()
+aflights = AsyncSingleFlight()
+
+
+def coalesce_timeout():
+    return getattr(settings, 'API_COALESCE_TIMEOUT', 10)
+
+
+# Cache key of a response at the given resource versions
+def response_cache_key(request, resources, versions):
+    path_hash = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    stamp = '-'.join(f'{version:.3f}' for version in versions)
+    return f'api:response:{"+".join(resources)}:{stamp}:{path_hash}'
+
+
+# ETag and Last-Modified of a cached body: its key, and the newest per-object version it shows
+def response_headers(key, versions, snapshot):
+    modified = max([*versions, *snapshot.values()])
+    tag = key.removeprefix('api:response:')
+    if snapshot:
+        tag += f':{max(snapshot.values()):.3f}'
+    return {'ETag': quote_etag(tag), 'Last-Modified': http_date(int(modified))}, modified
+
+
+def is_not_modified(request, etag, last_modified):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        return etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+    if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return if_modified_since is not None and int(last_modified) <= if_modified_since
+
+
+def dependency_ids(data, field):
+    # Ids of the objects of a list, page or detail payload that show `field`
+    items = data.get('results', [data]) if isinstance(data, dict) else data
+    return [item['id'] for item in items if isinstance(item, dict) and field in item and 'id' in item]
+
+
+def usable_snapshot(versions, started):
+    # A version that moved after the render started may postdate what the body shows
+    if any(version is None or version >= started for version in versions.values()):
+        return None
+    return versions
+
+
+def snapshot_change(snapshot, current):
+    # Newest version of a recorded object that moved since the snapshot (None: unchanged)
+    if current == snapshot:
+        return None
+    return max((version for version in current.values() if version is not None), default=time.time())
+
+
+# Mixin for read-only viewset actions: anonymous JSON responses are cached per
+# resource version and full path, and carry ETag/Last-Modified for conditional GETs.
+# With cache_dependency = (resource, field), a body also records the per-object
+# versions (bump_object_versions) of the objects showing `field`, and is served only
+# while none of them moved: a change to one object's field invalidates the pages that
+# show that object, not the whole resource.
+class CachedReadMixin:
+    cache_resource = None
+    cache_dependency = None
+
+    def get_cache_resources(self):
+        # Resources whose versions key the response
+        return (self.cache_resource,)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if request.user.is_authenticated or request.accepted_renderer.format != 'json':
+            record('bypass')
+            return handler(request, *args, **kwargs)
+
+        resources = self.get_cache_resources()
+        versions = [get_version(resource) for resource in resources]
+        key = response_cache_key(request, resources, versions)
+        cache = get_cache()
+        entry = cache.get(key)
+        if entry is not None and entry[1]:
+            changed = snapshot_change(entry[1], object_versions(self.cache_dependency[0], entry[1], create=False))
+            if changed is not None:
+                routing.read_primary_since(changed)
+                entry = None
+        if entry is None:
+            response = None
+            # A lagging replica would cache the previous state under the new version
+            routing.read_primary_since(max(versions))
+
+            def render():
+                # Runs once for all concurrent identical requests; only 200s are shared
+                nonlocal response
+                started = time.time()
+                response = handler(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return None
+                body = request.accepted_renderer.render(
+                    response.data, request.accepted_media_type, self.get_renderer_context()
+                )
+                snapshot = {}
+                if self.cache_dependency is not None:
+                    resource, field = self.cache_dependency
+                    snapshot = usable_snapshot(object_versions(resource, dependency_ids(response.data, field)), started)
+                if snapshot is None:
+                    return body, {}
+                cache.set(key, (body, snapshot), getattr(settings, 'API_CACHE_TIMEOUT', 300))
+                return body, snapshot
+
+            entry, shared = flights.do(key, render, coalesce_timeout())
+            if entry is None:
+                return response if response is not None else handler(request, *args, **kwargs)
+            result = 'coalesced' if shared else 'miss'
+        else:
+            result = 'hit'
+        body, snapshot = entry
+        headers, modified = response_headers(key, versions, snapshot)
+        if is_not_modified(request, headers['ETag'], modified):
+            record('not_modified')
+            return HttpResponse(status=304, headers=headers)
+        record(result)
+        headers['X-Cache'] = result.upper()
+        return HttpResponse(body, content_type=request.accepted_media_type, headers=headers)
+
+
+# Async counterpart of CachedReadMixin.cached_response for courses.async_views;
+# `render` is a coroutine returning the (status, body) of the uncached response.
+async def acached_response(request, resources, render, dependency=None, content_type='application/json'):
+    versions = [await aget_version(resource) for resource in resources]
+    key = response_cache_key(request, resources, versions)
+    entry = await acache('get', key)
+    if entry is not None and entry[1]:
+        changed = snapshot_change(entry[1], await aobject_versions(dependency[0], entry[1], create=False))
+        if changed is not None:
+            routing.read_primary_since(changed)
+            entry = None
+    if entry is None:
+        routing.read_primary_since(max(versions))
+        response = None
+
+        async def compute():
+            # Only 200s are shared: on None, waiting requests render their own response
+            nonlocal response
+            started = time.time()
+            response = await render()
+            status, body = response
+            if status != 200:
+                return None
+            snapshot = {}
+            if dependency is not None:
+                resource, field = dependency
+                ids = dependency_ids(json.loads(body), field)
+                snapshot = usable_snapshot(await aobject_versions(resource, ids), started)
+            if snapshot is None:
+                return body, {}
+            await acache('set', key, (body, snapshot), getattr(settings, 'API_CACHE_TIMEOUT', 300))
+            return body, snapshot
+
+        entry, shared = await aflights.do(key, compute, coalesce_timeout())
+        if entry is None:
+            status, body = response if response is not None else await render()
+            return HttpResponse(body, status=status, content_type=content_type)
+        result = 'coalesced' if shared else 'miss'
+    else:
+        result = 'hit'
+    body, snapshot = entry
+    headers, modified = response_headers(key, versions, snapshot)
+    if is_not_modified(request, headers['ETag'], modified):
+        await arecord('not_modified')
+        return HttpResponse(status=304, headers=headers)
+    await arecord(result)
+    headers['X-Cache'] = result.upper()
+    return HttpResponse(body, content_type=content_type, headers=headers)
@@ -0,0 +1,113 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Max, Min
+from django.utils import timezone
+from .models import ChangeLogEntry
+
+# Change log behind the delta-sync endpoint (/api/changes/?since=<cursor>). Course writes
+# and the enrollments of each student append entries (signals, and the bulk write paths
+# explicitly); a sync returns what changed after its cursor, collapsed to the latest
+# state per object, plus tombstones for deleted ones. Counter columns
+# (enrollment_count, course_count) change without an entry.
+#
+# Ids are allocated before commit, so under concurrent writers an entry can become
+# visible after a later one. The returned cursor therefore stops before any entry
+# younger than API_SYNC_SETTLE seconds: such entries are sent again on the next sync
+# (clients apply changes idempotently) instead of being skipped for good.
+
+PAGE_SIZE = 500  # entries per stream and call
+PRUNE_BATCH = 1000
+
+
+class CursorExpired(Exception):
+    # The entries after the cursor have been pruned, or the cursor is ahead of the log
+    # (e.g. it was issued before a database reset): the client must reload in full
+    pass
+
+
+class Feed:
+    def __init__(self, cursor, has_more):
+        self.cursor = cursor
+        self.has_more = has_more
+        self.changed = {ChangeLogEntry.COURSE: [], ChangeLogEntry.ENROLLMENT: []}
+        self.deleted = {ChangeLogEntry.COURSE: [], ChangeLogEntry.ENROLLMENT: []}
+
+
+def record_courses(course_ids, deleted=False):
+    now = timezone.now()
+    ChangeLogEntry.objects.bulk_create([
+        ChangeLogEntry(kind=ChangeLogEntry.COURSE, object_id=pk, deleted=deleted, created_at=now)
+        for pk in course_ids
+    ])
+
+
+def record_enrollments(enrollments, deleted=False):
+    now = timezone.now()
+    ChangeLogEntry.objects.bulk_create([
+        ChangeLogEntry(
+            kind=ChangeLogEntry.ENROLLMENT, object_id=enrollment.course_id, student_id=enrollment.student_id,
+            deleted=deleted, created_at=now,
+        )
+        for enrollment in enrollments
+    ])
+
+
+def latest_cursor():
+    return ChangeLogEntry.objects.aggregate(latest=Max('pk'))['latest'] or 0
+
+
+def read(since, student_id=None, limit=PAGE_SIZE):
+    # Two queries: SQLite answers a lone MIN() or MAX() from the index, but not both at once
+    oldest = ChangeLogEntry.objects.aggregate(oldest=Min('pk'))['oldest']
+    if oldest is not None and since < oldest - 1:
+        raise CursorExpired()
+    if since > latest_cursor():
+        raise CursorExpired()
+    streams = [ChangeLogEntry.objects.filter(student__isnull=True, pk__gt=since)]
+    if student_id is not None:
+        streams.append(ChangeLogEntry.objects.filter(student_id=student_id, pk__gt=since))
+    entries, end = [], None
+    for stream in streams:
+        rows = list(stream.order_by('pk').values_list('pk', 'kind', 'object_id', 'deleted', 'created_at')[:limit])
+        if len(rows) == limit:
+            # A full page: entries of the other stream past its end wait for the next call
+            end = rows[-1][0] if end is None else min(end, rows[-1][0])
+        entries += rows
+    if end is not None:
+        entries = [entry for entry in entries if entry[0] <= end]
+    entries.sort()
+
+    horizon = timezone.now() - timedelta(seconds=getattr(settings, 'API_SYNC_SETTLE', 2))
+    cursor = since
+    for pk, _, _, _, created_at in entries:
+        if created_at > horizon:
+            break
+        cursor = pk
+    feed = Feed(cursor, end is not None and cursor == end)
+    latest = {}  # (kind, object_id) -> deleted, in entry order
+    for _, kind, object_id, deleted, _ in entries:
+        latest.pop((kind, object_id), None)
+        latest[(kind, object_id)] = deleted
+    for (kind, object_id), deleted in latest.items():
+        (feed.deleted if deleted else feed.changed)[kind].append(object_id)
+    return feed
+
+
+def prune(retention=None):
+    # Walks the log from its oldest entry, so the cost follows the number of expired entries;
+    # the newest entry always stays, it anchors the cursor check in read()
+    retention = getattr(settings, 'API_SYNC_RETENTION', 30 * 24 * 3600) if retention is None else retention
+    cutoff = timezone.now() - timedelta(seconds=retention)
+    latest = latest_cursor()
+    total = 0
+    while True:
+        rows = ChangeLogEntry.objects.filter(pk__lt=latest).order_by('pk').values_list('pk', 'created_at')[:PRUNE_BATCH]
+        expired = None
+        for pk, created_at in rows:
+            if created_at >= cutoff:
+                break
+            expired = pk
+        if expired is None:
+            return total
+        deleted, _ = ChangeLogEntry.objects.filter(pk__lte=expired).delete()
+        total += deleted
@@ -0,0 +1,124 @@
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+from .models import Category, Course, CourseFacetCount, Enrollment
+
+_state = threading.local()
+
+
+def count_subquery(queryset, field):
+    counts = queryset.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts), 0)
+
+
+# Recomputes counters from the source tables; None means every row
+def refresh_enrollment_counts(course_ids=None):
+    courses = Course.objects.all() if course_ids is None else Course.objects.filter(pk__in=course_ids)
+    return courses.update(enrollment_count=count_subquery(Enrollment.objects.all(), 'course'))
+
+
+def refresh_category_counts(category_ids=None):
+    categories = Category.objects.all() if category_ids is None else Category.objects.filter(pk__in=category_ids)
+    return categories.update(course_count=count_subquery(Course.objects.all(), 'category'))
+
+
+def refresh_facet_counts():
+    # Rebuilds CourseFacetCount from Course (one GROUP BY); returns the number of rows
+    rows = (
+        Course.objects.order_by().values('category_id', 'teacher_id', day=TruncDate('created_at'))
+        .annotate(total=Count('pk')).values_list('category_id', 'teacher_id', 'day', 'total')
+    )
+    CourseFacetCount.objects.all().delete()
+    return len(CourseFacetCount.objects.bulk_create(
+        (CourseFacetCount(category_id=category_id, teacher_id=teacher_id, day=day, course_count=total)
+         for category_id, teacher_id, day, total in rows.iterator()),
+        batch_size=2000,
+    ))
+
+
+# Bounds of a calendar day in the current time zone, as used by TruncDate
+def day_range(day):
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def course_day(course):
+    return timezone.localdate(course.created_at)
+
+
+@contextmanager
+def deferred_counts():
+    # Bulk writes record the touched rows and recount them once on exit instead of
+    # issuing one F() update per enrollment signal.
+    if getattr(_state, 'pending', None) is not None:
+        yield
+        return
+    _state.pending = pending = {'courses': set(), 'categories': set(), 'facets': Counter()}
+    try:
+        yield
+    finally:
+        _state.pending = None
+    if pending['courses']:
+        refresh_enrollment_counts(pending['courses'])
+    if pending['categories']:
+        refresh_category_counts(pending['categories'])
+    for (category_id, teacher_id, day), delta in pending['facets'].items():
+        if delta:
+            apply_facet_delta(category_id, teacher_id, day, delta)
+
+
+def adjust_enrollment_count(course_id, delta):
+    pending = getattr(_state, 'pending', None)
+    if pending is not None:
+        pending['courses'].add(course_id)
+    else:
+        Course.objects.filter(pk=course_id).update(enrollment_count=F('enrollment_count') + delta)
+
+
+def adjust_course_count(category_id, delta):
+    if category_id is None:
+        return
+    pending = getattr(_state, 'pending', None)
+    if pending is not None:
+        pending['categories'].add(category_id)
+    else:
+        Category.objects.filter(pk=category_id).update(course_count=F('course_count') + delta)
+
+
+def adjust_facet_count(category_id, teacher_id, day, delta):
+    pending = getattr(_state, 'pending', None)
+    if pending is not None:
+        pending['facets'][(category_id, teacher_id, day)] += delta
+    else:
+        apply_facet_delta(category_id, teacher_id, day, delta)
+
+
+def apply_facet_delta(category_id, teacher_id, day, delta):
+    # Moves one row of the key: with duplicate rows, updating them all would count twice
+    rows = CourseFacetCount.objects.filter(category_id=category_id, teacher_id=teacher_id, day=day)
+    if delta < 0:
+        rows = rows.filter(course_count__gte=-delta)
+    updated = CourseFacetCount.objects.filter(pk__in=Subquery(rows.values('pk')[:1])).update(
+        course_count=F('course_count') + delta
+    )
+    if updated:
+        return
+    if delta > 0:
+        CourseFacetCount.objects.create(category_id=category_id, teacher_id=teacher_id, day=day, course_count=delta)
+    else:
+        # No single row can absorb the decrement (or the rows are gone with their teacher): recount the key
+        refresh_facet_key(category_id, teacher_id, day)
+
+
+def refresh_facet_key(category_id, teacher_id, day):
+    CourseFacetCount.objects.filter(category_id=category_id, teacher_id=teacher_id, day=day).delete()
+    start, end = day_range(day)
+    total = Course.objects.filter(
+        category_id=category_id, teacher_id=teacher_id, created_at__gte=start, created_at__lt=end
+    ).count()
+    if total:
+        CourseFacetCount.objects.create(category_id=category_id, teacher_id=teacher_id, day=day, course_count=total)
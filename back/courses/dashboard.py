@@ -0,0 +1,58 @@
+from django.db import connections, router
+from django.db.models import F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Substr
+from .models import Course, DashboardEntry, Enrollment
+
+# Maintenance of the DashboardEntry read model. Entries are inserted for new enrollments,
+# removed with them (on_delete=CASCADE) and refreshed in place when the course, its
+# teacher or its category changes; rebuild() recreates the whole table.
+
+SUMMARY_LENGTH = 200  # Same cut as CourseSerializer.summary
+
+# DashboardEntry column -> expression over the course at `prefix`
+def course_columns(prefix=''):
+    return {
+        'course_title': F(f'{prefix}title'),
+        'course_slug': F(f'{prefix}slug'),
+        'course_summary': Substr(f'{prefix}description', 1, SUMMARY_LENGTH),
+        'teacher_username': F(f'{prefix}teacher__username'),
+        'category_name': Coalesce(F(f'{prefix}category__name'), Value('')),
+    }
+
+
+def add_entries(enrollments, missing_only=True):
+    # INSERT ... SELECT of the enrollments that have no entry yet; returns how many were added
+    if missing_only:
+        enrollments = enrollments.filter(dashboard_entry__isnull=True)
+    columns = course_columns('course__')
+    rows = (
+        enrollments.order_by().annotate(**columns)
+        .values_list('pk', 'student_id', 'course_id', 'enrolled_at', *columns)
+    )
+    using = router.db_for_write(DashboardEntry)
+    connection = connections[using]
+    select, params = rows.query.get_compiler(using).as_sql()
+    names = ', '.join(
+        connection.ops.quote_name(DashboardEntry._meta.get_field(name).column)
+        for name in ('enrollment_id', 'student_id', 'course_id', 'enrolled_at', *columns)
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(f'INSERT INTO {connection.ops.quote_name(DashboardEntry._meta.db_table)} ({names}) {select}', params)
+        return cursor.rowcount
+
+
+def refresh_entries(entries):
+    # Re-copies the course columns into the given entries in one UPDATE
+    return entries.update(**{
+        name: Subquery(Course.objects.filter(pk=OuterRef('course_id')).values(value=expression)[:1])
+        for name, expression in course_columns().items()
+    })
+
+
+def refresh_courses(course_ids):
+    return refresh_entries(DashboardEntry.objects.filter(course_id__in=course_ids))
+
+
+def rebuild():
+    DashboardEntry.objects.all().delete()
+    return add_entries(Enrollment.objects.all(), missing_only=False)
@@ -0,0 +1,105 @@
+from django.contrib.auth.models import User
+from django.db.models import Sum
+from rest_framework import serializers
+from .counters import day_range
+from .models import Category, CourseFacetCount
+
+# Catalog filters (?category=, ?teacher=, ?created_after=, ?created_before=) and the
+# facet summary served by /api/courses/facets/. Each facet counts courses under every
+# filter except its own, so the other categories (or teachers) stay selectable; the
+# counts are sums over CourseFacetCount, never a GROUP BY over Course.
+
+TEACHER_FACET_LIMIT = 20  # teachers with the most matching courses
+MAX_ID = 2 ** 63 - 1  # Larger ids can't be bound as database integers
+
+
+class CourseFilterSerializer(serializers.Serializer):
+    category = serializers.CharField(required=False, help_text='Category id, or "none" for uncategorised courses')
+    teacher = serializers.IntegerField(required=False, min_value=1, max_value=MAX_ID)
+    created_after = serializers.DateField(required=False, help_text='First creation day, inclusive')
+    created_before = serializers.DateField(required=False, help_text='Last creation day, inclusive')
+
+    def validate_category(self, value):
+        if value == 'none':
+            return None
+        # isdecimal(): isdigit() also accepts '²', which int() rejects
+        if not value.isdecimal() or int(value) > MAX_ID:
+            raise serializers.ValidationError('Expected a category id or "none".')
+        return int(value)
+
+    def validate(self, attrs):
+        after, before = attrs.get('created_after'), attrs.get('created_before')
+        if after and before and after > before:
+            raise serializers.ValidationError({'created_before': 'Must not be earlier than created_after.'})
+        return attrs
+
+
+def parse_filters(query_params):
+    # Raises ValidationError (400) for malformed values
+    serializer = CourseFilterSerializer(data={
+        name: query_params[name] for name in CourseFilterSerializer._declared_fields if name in query_params
+    })
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data
+
+
+# Each filter maps onto a prefix of one of the Course indexes:
+# (category, -created_at), (teacher, -created_at) or (-created_at)
+def filter_courses(queryset, filters):
+    if 'category' in filters:
+        queryset = queryset.filter(category_id=filters['category'])
+    if 'teacher' in filters:
+        queryset = queryset.filter(teacher_id=filters['teacher'])
+    if 'created_after' in filters:
+        queryset = queryset.filter(created_at__gte=day_range(filters['created_after'])[0])
+    if 'created_before' in filters:
+        queryset = queryset.filter(created_at__lt=day_range(filters['created_before'])[1])
+    return queryset
+
+
+def filter_counts(filters, exclude=None):
+    rows = CourseFacetCount.objects.order_by()
+    if 'category' in filters and exclude != 'category':
+        rows = rows.filter(category_id=filters['category'])
+    if 'teacher' in filters and exclude != 'teacher':
+        rows = rows.filter(teacher_id=filters['teacher'])
+    if 'created_after' in filters:
+        rows = rows.filter(day__gte=filters['created_after'])
+    if 'created_before' in filters:
+        rows = rows.filter(day__lte=filters['created_before'])
+    return rows
+
+
+def summary(filters):
+    # Grouped on the ids alone (an index-only scan); names are looked up for the groups
+    category_counts = (
+        filter_counts(filters, exclude='category')
+        .values('category_id').annotate(count=Sum('course_count')).filter(count__gt=0)
+        .values_list('category_id', 'count')
+    )
+    names = {pk: (name, slug) for pk, name, slug in Category.objects.values_list('pk', 'name', 'slug')}
+    categories = []
+    for pk, count in category_counts:
+        name, slug = names.get(pk, (None, None))
+        categories.append({'id': pk, 'name': name, 'slug': slug, 'count': count})
+    # Largest first; uncategorised courses (id None) after named categories on ties
+    categories.sort(key=lambda entry: (-entry['count'], entry['name'] is None, entry['name'] or ''))
+    teacher_counts = (
+        filter_counts(filters, exclude='teacher')
+        .values('teacher_id').annotate(count=Sum('course_count')).filter(count__gt=0)
+        .order_by('-count', 'teacher_id').values_list('teacher_id', 'count')
+    )
+    teacher_counts = list(teacher_counts[:TEACHER_FACET_LIMIT])
+    selected = filters.get('teacher')
+    if selected is not None and selected not in dict(teacher_counts):
+        # The selected teacher stays listed even outside the top ones
+        teacher_counts += filter_counts(filters).values('teacher_id').annotate(count=Sum('course_count')).values_list('teacher_id', 'count')
+    usernames = dict(User.objects.filter(pk__in=[pk for pk, _ in teacher_counts]).values_list('pk', 'username'))
+    teachers = [{'id': pk, 'username': usernames.get(pk), 'count': count} for pk, count in teacher_counts if count]
+
+    # The category facet ignores only the category filter, so the total is one of its entries
+    if 'category' in filters:
+        total = next((entry['count'] for entry in categories if entry['id'] == filters['category']), 0)
+    else:
+        total = sum(entry['count'] for entry in categories)
+    return {'total': total, 'categories': categories, 'teachers': teachers}
@@ -0,0 +1,151 @@
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+from rest_framework.response import Response
+from .profiling import timed
+
+# Read-only fast path for list endpoints. Rows are fetched with values() for exactly the
+# columns the serializer declares and assembled into the same nested dicts that
+# Serializer.to_representation would build, without per-instance field dispatch.
+
+# Fields whose to_representation() returns database values unchanged
+IDENTITY_FIELDS = (serializers.CharField, serializers.IntegerField, serializers.BooleanField, serializers.ReadOnlyField)
+# Readable fields that need model instances (or several rows) to render
+UNSUPPORTED_FIELDS = (serializers.RelatedField, serializers.ManyRelatedField, serializers.ListSerializer)
+
+
+class FastPathUnsupported(Exception):
+    pass
+
+
+# Attribute access over one level of a values() row, so SerializerMethodField getters
+# written against model instances (obj.pk, getattr(obj, 'enrolled', None)) work unchanged.
+class Row:
+    __slots__ = ('values', 'prefix')
+
+    def __init__(self, values, prefix):
+        self.values = values
+        self.prefix = prefix
+
+    def __getattr__(self, name):
+        try:
+            return self.values[self.prefix + ('id' if name == 'pk' else name)]
+        except KeyError:
+            raise AttributeError(name)
+
+
+def datetime_representation(field):
+    # DateTimeField.to_representation looks the current timezone up for every value;
+    # resolve it once per list for the default ISO 8601 output.
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+        return field.to_representation
+
+    def to_representation(value):
+        if isinstance(value, str) or value == '' or timezone.is_naive(value):
+            return field.to_representation(value)
+        value = value.astimezone(field_timezone).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return to_representation
+
+
+class FastRepresentation:
+    def __init__(self, serializer):
+        self.serializer = serializer
+        self.columns = []
+        self.plan = self.compile(serializer, serializer.Meta.model, '')
+
+    def compile(self, serializer, model, prefix):
+        plan, has_methods = [], False
+        for field in serializer.fields.values():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.SerializerMethodField):
+                plan.append((field.field_name, 'method', field))
+                has_methods = True
+                continue
+            if isinstance(field, UNSUPPORTED_FIELDS) or '.' in field.source or field.source == '*':
+                raise FastPathUnsupported(f'{type(serializer).__name__}.{field.field_name}')
+            try:
+                model_field = model._meta.get_field(field.source)
+            except FieldDoesNotExist:
+                raise FastPathUnsupported(f'{type(serializer).__name__}.{field.field_name}')
+            path = prefix + field.source
+            if isinstance(field, serializers.Serializer):
+                related_model = model_field.related_model
+                pk_path = f'{path}__{related_model._meta.pk.name}'
+                self.add_column(pk_path)
+                # A null relation renders as None (as it does for select_related() querysets)
+                plan.append((field.field_name, 'nested', (pk_path, self.compile(field, related_model, path + '__'))))
+            else:
+                self.add_column(path)
+                if isinstance(field, IDENTITY_FIELDS):
+                    plan.append((field.field_name, 'identity', path))
+                elif isinstance(field, serializers.DateTimeField):
+                    plan.append((field.field_name, 'field', (path, datetime_representation(field))))
+                else:
+                    plan.append((field.field_name, 'field', (path, field.to_representation)))
+        return (prefix, has_methods, plan)
+
+    def add_column(self, path):
+        if path not in self.columns:
+            self.columns.append(path)
+
+    def values(self, queryset, extra=()):
+        # Annotations (e.g. `enrolled`, `summary_text`) ride along for method fields
+        columns = self.columns + [name for name in queryset.query.annotations if name not in self.columns]
+        columns += [name for name in extra if name not in columns]
+        return queryset.values(*columns)
+
+    def to_representation(self, rows):
+        with timed('serialize'):
+            return [self.build(row, self.plan) for row in rows]
+
+    def build(self, row, node):
+        prefix, has_methods, plan = node
+        obj = Row(row, prefix) if has_methods else None
+        ret = {}
+        for name, kind, data in plan:
+            if kind == 'identity':
+                ret[name] = row[data]
+            elif kind == 'field':
+                value = row[data[0]]
+                ret[name] = None if value is None else data[1](value)
+            elif kind == 'nested':
+                pk_path, subplan = data
+                ret[name] = None if row[pk_path] is None else self.build(row, subplan)
+            else:
+                ret[name] = data.to_representation(obj)
+        return ret
+
+
+# List action for generic views: serves list() through FastRepresentation when the
+# serializer can be compiled, falling back to the regular serializer otherwise.
+class FastListMixin:
+    def get_fast_representation(self):
+        if not getattr(settings, 'API_FAST_LIST', True):
+            return None
+        try:
+            return FastRepresentation(self.get_serializer())
+        except FastPathUnsupported:
+            return None
+
+    def get_fast_rows(self, representation, queryset):
+        # Cursor pagination reads its position from the ordering columns of the page's edge rows
+        extra = ()
+        if self.paginator is not None and hasattr(self.paginator, 'get_ordering'):
+            extra = [name.lstrip('-') for name in self.paginator.get_ordering(self.request, queryset, self)]
+        return representation.values(queryset, extra)
+
+    def list(self, request, *args, **kwargs):
+        representation = self.get_fast_representation()
+        if representation is None:
+            return super().list(request, *args, **kwargs)
+        rows = self.get_fast_rows(representation, self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(representation.to_representation(page))
+        return Response(representation.to_representation(rows))
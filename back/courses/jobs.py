@@ -0,0 +1,239 @@
+import logging
+import random
+import time
+import traceback
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.db.models import Count, F, Min
+from django.utils import timezone
+from .models import Job
+
+# Durable job queue on the Job table. Work is enqueued in the request's transaction, so a
+# job exists exactly when the change that caused it was committed, and is run later by
+# `manage.py run_workers`. Delivery is at least once: a job whose worker died is taken
+# over when its lease ends, so handlers must be idempotent.
+#
+# A handler takes the payloads of a batch of jobs of its kind and is registered with
+#
+#     @handler('send_welcome_email', batch_size=50)
+#     def send_welcome_emails(payloads): ...
+#
+# If it raises, every job of the batch is retried with exponential backoff, up to
+# JOBS_MAX_ATTEMPTS attempts, then left as failed with its traceback in last_error.
+
+logger = logging.getLogger(__name__)
+
+registry = {}  # kind -> JobType
+
+
+class JobType:
+    def __init__(self, function, batch_size, max_attempts):
+        self.function = function
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+
+
+def handler(kind, batch_size=1, max_attempts=None):
+    def register(function):
+        registry[kind] = JobType(function, batch_size, max_attempts)
+        return function
+    return register
+
+
+def setting(name, default):
+    return getattr(settings, name, default)
+
+
+def enqueue(kind, payload=None, key=None, delay=0):
+    # A job with the same idempotency key is kept as is (ON CONFLICT DO NOTHING)
+    enqueue_many(kind, [payload or {}], keys=[key], delay=delay)
+
+
+def enqueue_many(kind, payloads, keys=None, delay=0):
+    now = timezone.now()
+    keys = keys or [None] * len(payloads)
+    Job.objects.bulk_create([
+        Job(kind=kind, payload=payload, key=key, created_at=now, run_at=now + timedelta(seconds=delay))
+        for payload, key in zip(payloads, keys)
+    ], ignore_conflicts=True)
+
+
+def claim(limit):
+    # One conditional UPDATE takes the jobs: a concurrent claim that got there first has
+    # already moved run_at past now, so each job goes to a single worker
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    due = list(Job.objects.filter(run_at__lte=now).order_by('run_at').values_list('pk', flat=True)[:limit])
+    if not due:
+        return []
+    claimed = Job.objects.filter(pk__in=due, run_at__lte=now).update(
+        status=Job.RUNNING, claimed_by=token, attempts=F('attempts') + 1, started_at=now,
+        run_at=now + timedelta(seconds=setting('JOBS_LEASE', 300)),
+    )
+    if not claimed:
+        return []
+    return list(Job.objects.filter(pk__in=due, claimed_by=token).order_by('pk'))
+
+
+def retry_delay(attempts):
+    base = setting('JOBS_RETRY_BACKOFF', 10) * 2 ** (attempts - 1)
+    # Jitter spreads the retries of a failed batch
+    return min(base, setting('JOBS_RETRY_MAX_DELAY', 3600)) * random.uniform(0.75, 1.25)
+
+
+def complete(jobs):
+    Job.objects.filter(pk__in=[job.pk for job in jobs], claimed_by=jobs[0].claimed_by).update(
+        status=Job.DONE, run_at=None, finished_at=timezone.now(), last_error='',
+    )
+
+
+def fail(jobs, job_type, error):
+    now = timezone.now()
+    max_attempts = (job_type and job_type.max_attempts) or setting('JOBS_MAX_ATTEMPTS', 5)
+    for job in jobs:
+        if job.attempts >= max_attempts:
+            changes = {'status': Job.FAILED, 'run_at': None, 'finished_at': now}
+        else:
+            changes = {'status': Job.QUEUED, 'run_at': now + timedelta(seconds=retry_delay(job.attempts))}
+        Job.objects.filter(pk=job.pk, claimed_by=job.claimed_by).update(last_error=error, **changes)
+
+
+def run_batch(jobs):
+    job_type = registry.get(jobs[0].kind)
+    try:
+        if job_type is None:
+            raise LookupError(f"No handler registered for job kind '{jobs[0].kind}'")
+        job_type.function([job.payload for job in jobs])
+    except Exception:
+        logger.exception('Job batch %s failed (%d jobs)', jobs[0].kind, len(jobs))
+        fail(jobs, job_type, traceback.format_exc())
+        return False
+    complete(jobs)
+    return True
+
+
+def run_due(limit=None):
+    # Claims up to `limit` due jobs and runs them, in batches of one kind; returns how many were claimed
+    jobs = claim(limit or setting('JOBS_CLAIM_SIZE', 50))
+    by_kind = {}
+    for job in jobs:
+        by_kind.setdefault(job.kind, []).append(job)
+    for kind, kind_jobs in by_kind.items():
+        batch_size = registry[kind].batch_size if kind in registry else 1
+        for start in range(0, len(kind_jobs), batch_size):
+            run_batch(kind_jobs[start:start + batch_size])
+    return len(jobs)
+
+
+def prune(retention=None):
+    # Done jobs are kept for a while: their keys keep deduplicating, and they feed the latency metrics
+    retention = setting('JOBS_RETENTION', 7 * 24 * 3600) if retention is None else retention
+    cutoff = timezone.now() - timedelta(seconds=retention)
+    deleted, _ = Job.objects.filter(status=Job.DONE, finished_at__lt=cutoff).delete()
+    return deleted
+
+
+def get_stats(window=300, sample=1000):
+    # Pending depth (job_due_idx), failures, and the jobs finished in the last `window`
+    # seconds; wait and run times come from the latest `sample` of those, so a scrape
+    # stays cheap however busy the workers are
+    now = timezone.now()
+    depth = {}
+    for kind, status, count in Job.objects.filter(run_at__isnull=False).values_list('kind', 'status').annotate(count=Count('pk')).order_by():
+        depth.setdefault(kind, {Job.QUEUED: 0, Job.RUNNING: 0})[status] = count
+    oldest = Job.objects.filter(run_at__lte=now, status=Job.QUEUED).aggregate(oldest=Min('run_at'))['oldest']
+    failed = dict(Job.objects.filter(status=Job.FAILED).values_list('kind').annotate(count=Count('pk')).order_by())
+    recent = Job.objects.filter(status=Job.DONE, finished_at__gte=now - timedelta(seconds=window))
+    finished = dict(recent.values_list('kind').annotate(count=Count('pk')).order_by())
+    latency = {}
+    for kind, created_at, started_at, finished_at in recent.order_by('-finished_at').values_list('kind', 'created_at', 'started_at', 'finished_at')[:sample]:
+        entry = latency.setdefault(kind, {'sampled': 0, 'wait': 0.0, 'max_wait': 0.0, 'run': 0.0})
+        wait = (started_at - created_at).total_seconds()
+        entry['sampled'] += 1
+        entry['wait'] += wait
+        entry['max_wait'] = max(entry['max_wait'], wait)
+        entry['run'] += (finished_at - started_at).total_seconds()
+    return {
+        'depth': depth,
+        'oldest_due_seconds': (now - oldest).total_seconds() if oldest else 0.0,
+        'failed': failed,
+        'latency': {
+            kind: {'count': finished[kind], 'avg_wait': entry['wait'] / entry['sampled'],
+                   'max_wait': entry['max_wait'], 'avg_run': entry['run'] / entry['sampled']}
+            for kind, entry in latency.items()
+        },
+        'window': window,
+    }
+
+
+def render_stats():
+    # Prometheus text format, appended to /api/metrics/
+    stats = get_stats()
+    lines = [
+        '# HELP api_jobs_pending Jobs waiting or running, by kind and status',
+        '# TYPE api_jobs_pending gauge',
+    ]
+    for kind, statuses in sorted(stats['depth'].items()):
+        lines += [f'api_jobs_pending{{kind="{kind}",status="{status}"}} {count}' for status, count in statuses.items()]
+    lines += [
+        '# HELP api_jobs_oldest_due_seconds Age of the oldest due job that no worker has taken yet',
+        '# TYPE api_jobs_oldest_due_seconds gauge',
+        f'api_jobs_oldest_due_seconds {stats["oldest_due_seconds"]:.3f}',
+        '# HELP api_jobs_failed Jobs that used up their attempts, by kind',
+        '# TYPE api_jobs_failed gauge',
+    ]
+    lines += [f'api_jobs_failed{{kind="{kind}"}} {count}' for kind, count in sorted(stats['failed'].items())]
+    lines += [
+        f'# HELP api_jobs_wait_seconds Enqueue-to-start time of recently finished jobs (last {stats["window"]}s, sampled)',
+        '# TYPE api_jobs_wait_seconds gauge',
+    ]
+    for kind, entry in sorted(stats['latency'].items()):
+        lines += [
+            f'api_jobs_wait_seconds{{kind="{kind}",stat="avg"}} {entry["avg_wait"]:.3f}',
+            f'api_jobs_wait_seconds{{kind="{kind}",stat="max"}} {entry["max_wait"]:.3f}',
+        ]
+    lines += [
+        f'# HELP api_jobs_run_seconds Average run time of recently finished jobs (last {stats["window"]}s, sampled)',
+        '# TYPE api_jobs_run_seconds gauge',
+    ]
+    lines += [f'api_jobs_run_seconds{{kind="{kind}"}} {entry["avg_run"]:.3f}' for kind, entry in sorted(stats['latency'].items())]
+    lines += [
+        f'# HELP api_jobs_finished Jobs finished in the last {stats["window"]}s, by kind',
+        '# TYPE api_jobs_finished gauge',
+    ]
+    lines += [f'api_jobs_finished{{kind="{kind}"}} {entry["count"]}' for kind, entry in sorted(stats['latency'].items())]
+    return '\n'.join(lines) + '\n'
+
+
+def work(stop, poll_interval=None, limit=None):
+    # Worker loop for one thread; returns when `stop` (a threading.Event) is set
+    poll_interval = setting('JOBS_POLL_INTERVAL', 1.0) if poll_interval is None else poll_interval
+    try:
+        while not stop.is_set():
+            try:
+                # As around each request: replaces a connection that broke (e.g. a database
+                # restart) and enforces CONN_MAX_AGE
+                close_old_connections()
+                claimed = run_due(limit)
+            except Exception:
+                # E.g. the database went away; keep polling
+                logger.exception('Job claim failed')
+                claimed = 0
+            if not claimed:
+                stop.wait(poll_interval)
+    finally:
+        connections.close_all()
+
+
+def drain(limit=None, timeout=None):
+    # Runs due jobs in this thread until none are left (or `timeout` seconds have passed)
+    deadline = None if timeout is None else time.monotonic() + timeout
+    total = 0
+    while deadline is None or time.monotonic() < deadline:
+        claimed = run_due(limit)
+        if not claimed:
+            break
+        total += claimed
+    return total
@@ -0,0 +1,269 @@
+import http.client
+import json
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+from urllib.parse import urlencode, urlsplit
+from django.conf import settings
+from django.db import connections, reset_queries
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from .models import Enrollment
+from .serializers import MyTokenObtainPairSerializer
+
+# Scenario scripts and transports for the bench_api command. Scenarios drive the API the
+# way the Angular app does; every request is recorded under a stable endpoint name so
+# results can be compared between runs (bench_api --output / --compare).
+
+# Synthetic data written by seed_bench_data
+SEED_PREFIX = 'seed'
+SEED_PASSWORD = 'seed-bench-pass-42'
+TOPICS = (
+    'Python', 'Django', 'Angular', 'TypeScript', 'SQL', 'Statistics', 'Algebra', 'Physics', 'Chemistry',
+    'Biology', 'History', 'Economics', 'Marketing', 'Design', 'Photography', 'Music', 'Spanish', 'German',
+    'Writing', 'Networking', 'Security', 'Linux', 'Docker', 'Kubernetes', 'Rust', 'Go', 'Java', 'Kotlin',
+    'Swift', 'Excel', 'Finance', 'Accounting', 'Drawing', 'Cooking', 'Yoga', 'Chess', 'Astronomy',
+    'Geography', 'Philosophy', 'Psychology',
+)
+LEVELS = ('Introduction to', 'Practical', 'Advanced', 'Hands-on', 'Applied', 'Modern', 'Essential', 'Mastering')
+WORDS = (
+    'projects', 'exercises', 'theory', 'fundamentals', 'patterns', 'testing', 'performance', 'examples',
+    'beginners', 'professionals', 'data', 'tools', 'workflow', 'best', 'practices', 'case', 'studies',
+)
+
+SERVER_TIMING_QUERIES = re.compile(r'\bdb;[^,]*desc="(\d+) queries')
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(list)  # endpoint -> [(ms, queries, ok)]
+
+    def add(self, endpoint, ms, queries, ok):
+        with self.lock:
+            self.samples[endpoint].append((ms, queries, ok))
+
+    def summary(self, elapsed):
+        endpoints = {}
+        for endpoint, samples in sorted(self.samples.items()):
+            latencies = sorted(ms for ms, _, _ in samples)
+            queries = [count for _, count, _ in samples if count is not None]
+            endpoints[endpoint] = {
+                'requests': len(samples),
+                'errors': sum(1 for _, _, ok in samples if not ok),
+                'rps': round(len(samples) / elapsed, 2),
+                'mean_ms': round(sum(latencies) / len(latencies), 2),
+                'p50_ms': round(percentile(latencies, 0.5), 2),
+                'p90_ms': round(percentile(latencies, 0.9), 2),
+                'p99_ms': round(percentile(latencies, 0.99), 2),
+                'max_ms': round(latencies[-1], 2),
+                # None when the server doesn't report them (HTTP without API_PROFILING)
+                'queries': round(sum(queries) / len(queries), 2) if queries else None,
+            }
+        return endpoints
+
+
+# In-process through Django's test client. Query counts come from CaptureQueriesContext,
+# whose debug cursor is part of every measured latency (the same for every run).
+class ClientTransport:
+    def __init__(self):
+        # 'testserver' is only allowed under the test runner; DEBUG allows localhost
+        self.client = APIClient(SERVER_NAME='testserver' if 'testserver' in settings.ALLOWED_HOSTS else 'localhost')
+        self.client.raise_request_exception = False
+
+    def request(self, method, path, data=None, token=None):
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        reset_queries()  # queries_log is bounded; a full log would capture nothing
+        # Every alias: reads may go to replicas (courses.routing)
+        with ExitStack() as stack:
+            captured = [stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in connections]
+            response = getattr(self.client, method.lower())(path, data, format='json', headers=headers)
+        return response.status_code, response.content, sum(len(queries) for queries in captured)
+
+    def close(self):
+        pass
+
+
+# Keep-alive HTTP/1.1 to a running server. Query counts are read from the Server-Timing
+# header, so start the server with API_PROFILING=1 to get them.
+class HTTPTransport:
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.conn = None
+
+    def request(self, method, path, data=None, token=None):
+        headers = {'Accept': 'application/json'}
+        body = None
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        if data is not None:
+            body = json.dumps(data)
+            headers['Content-Type'] = 'application/json'
+        for attempt in range(2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            try:
+                self.conn.request(method, path, body, headers)
+                response = self.conn.getresponse()
+                content = response.read()
+                break
+            except (OSError, http.client.HTTPException):
+                # The server may close an idle keep-alive connection; retry once on a new one
+                self.close()
+                if attempt:
+                    raise
+        match = SERVER_TIMING_QUERIES.search(response.getheader('Server-Timing') or '')
+        return response.status, content, int(match.group(1)) if match else None
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+class VirtualUser:
+    def __init__(self, transport, recorder, rng, user, course_ids, category_ids):
+        self.transport = transport
+        self.recorder = recorder
+        self.rng = rng
+        self.user = user
+        self.course_ids = course_ids
+        self.category_ids = category_ids
+        self.token = str(MyTokenObtainPairSerializer.get_token(user).access_token)
+        self.enrolled = set(Enrollment.objects.filter(student=user).values_list('course_id', flat=True))
+
+    def call(self, endpoint, method, path, data=None, expect=(200,), auth=True):
+        start = time.perf_counter()
+        try:
+            status, content, queries = self.transport.request(method, path, data, self.token if auth else None)
+        except (OSError, http.client.HTTPException):
+            self.recorder.add(endpoint, (time.perf_counter() - start) * 1000, None, False)
+            return None
+        self.recorder.add(endpoint, (time.perf_counter() - start) * 1000, queries, status in expect)
+        if status not in expect or not content:
+            return None
+        return json.loads(content)
+
+    def unenrolled_course(self):
+        while True:
+            course_id = self.rng.choice(self.course_ids)
+            if course_id not in self.enrolled:
+                return course_id
+
+
+def login(user):
+    credentials = {'username': user.user.username, 'password': SEED_PASSWORD}
+    user.call('POST /api/token/', 'POST', '/api/token/', credentials, auth=False)
+    user.call('GET /api/course-count/', 'GET', '/api/course-count/')
+
+
+# Accounts created by the register scenario; bench_api deletes them after the run
+SIGNUP_PREFIX = f'{SEED_PREFIX}-signup-'
+
+
+def register(user):
+    username = f'{SIGNUP_PREFIX}{user.rng.getrandbits(64):016x}'
+    password = f'{user.rng.choice(WORDS)}-{user.rng.getrandbits(32):08x}'
+    data = {'username': username, 'email': f'{username}@example.com', 'password': password, 'password2': password}
+    user.call('POST /api/register/', 'POST', '/api/register/', data, expect=(201,), auth=False)
+    user.call('POST /api/token/ (new user)', 'POST', '/api/token/', {'username': username, 'password': password}, auth=False)
+
+
+def browse(user):
+    page = user.call('GET /api/courses/', 'GET', '/api/courses/')
+    if page and page.get('next'):
+        next_page = urlsplit(page['next'])
+        user.call('GET /api/courses/?cursor=', 'GET', f'{next_page.path}?{next_page.query}')
+    user.call('GET /api/courses/?ordering=popular', 'GET', '/api/courses/?ordering=popular')
+    user.call('GET /api/courses/?fields=', 'GET', '/api/courses/?fields=id,title,slug,summary,category.name')
+    user.call('GET /api/courses/<id>/', 'GET', f'/api/courses/{user.rng.choice(user.course_ids)}/')
+    query = urlencode({'q': f'{user.rng.choice(TOPICS)} {user.rng.choice(WORDS)[:3]}'})
+    user.call('GET /api/courses/search/', 'GET', f'/api/courses/search/?{query}')
+    user.call('GET /api/categories/', 'GET', '/api/categories/')
+
+
+def enroll(user):
+    course_id = user.unenrolled_course()
+    if user.call('POST /api/enrollments/', 'POST', '/api/enrollments/', {'course_id': course_id}, expect=(201,)):
+        user.enrolled.add(course_id)
+    user.call('GET /api/enrollments/', 'GET', '/api/enrollments/')
+    if course_id in user.enrolled:
+        user.call('DELETE /api/courses/<id>/unenroll/', 'DELETE', f'/api/courses/{course_id}/unenroll/', expect=(204,))
+        user.enrolled.discard(course_id)
+
+
+def teacher_crud(user):
+    data = {
+        'title': f'{user.rng.choice(LEVELS)} {user.rng.choice(TOPICS)} (load test)',
+        'description': ' '.join(user.rng.choices(WORDS, k=60)),
+        'category_id': user.rng.choice(user.category_ids) if user.category_ids else None,
+    }
+    course = user.call('POST /api/courses/', 'POST', '/api/courses/', data, expect=(201,))
+    if course is None:
+        return
+    path = f"/api/courses/{course['id']}/"
+    user.call('PATCH /api/courses/<id>/', 'PATCH', path, {'description': 'Updated by the load test.'})
+    user.call('DELETE /api/courses/<id>/', 'DELETE', path, expect=(204,))
+
+
+# name -> (script, role of the seeded users running it)
+SCENARIOS = {
+    'login': (login, 'student'),
+    'register': (register, 'student'),
+    'browse': (browse, 'student'),
+    'enroll': (enroll, 'student'),
+    'teacher_crud': (teacher_crud, 'teacher'),
+}
+
+
+# Runs every scenario `iterations` times on each of `concurrency` threads; thread i plays
+# the i-th seeded student (or teacher), so concurrent enrollments never collide. A single
+# virtual user runs on the calling thread (and its database connection).
+def run(transport_factory, scenarios, concurrency, iterations, users, course_ids, category_ids, seed=0):
+    recorder = Recorder()
+    errors = []
+
+    def worker(index):
+        rng = random.Random(seed + index)
+        transport = transport_factory()
+        actors = {
+            role: VirtualUser(transport, recorder, rng, people[index % len(people)], course_ids, category_ids)
+            for role, people in users.items()
+        }
+        try:
+            for _ in range(iterations):
+                for name in scenarios:
+                    script, role = SCENARIOS[name]
+                    script(actors[role])
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            transport.close()
+
+    def thread_main(index):
+        try:
+            worker(index)
+        finally:
+            connections.close_all()
+
+    start = time.perf_counter()
+    if concurrency == 1:
+        worker(0)
+    else:
+        threads = [threading.Thread(target=thread_main, args=(index,)) for index in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - start
+    if errors:
+        raise errors[0]
+    return elapsed, recorder.summary(elapsed)
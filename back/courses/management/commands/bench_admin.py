@@ -0,0 +1,67 @@
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from courses.models import Course, Enrollment
+
+
+class Command(BaseCommand):
+    help = (
+        'Renders the course, enrollment and user admin pages against the current database (seed it with '
+        'seed_bench_data) and reports queries and milliseconds per page, in admin performance mode and, '
+        'with --compare, without it. Runs as a temporary superuser, rolled back afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--compare', action='store_true', help='Also render every page with ADMIN_PERFORMANCE_MODE off')
+
+    def handle(self, *args, **options):
+        course = Course.objects.order_by('-pk').select_related('teacher').first()
+        enrollment = Enrollment.objects.order_by('-pk').select_related('student').first()
+        if course is None or enrollment is None:
+            raise CommandError('No courses or enrollments; run seed_bench_data first.')
+        term = course.title[:4]
+        pages = [
+            ('courses', reverse('admin:courses_course_changelist')),
+            ('courses by teacher', reverse('admin:courses_course_changelist') + f'?teacher__id__exact={course.teacher_id}'),
+            ('courses search', reverse('admin:courses_course_changelist') + f'?q={term}'),
+            ('course form', reverse('admin:courses_course_change', args=[course.pk])),
+            ('enrollments', reverse('admin:courses_enrollment_changelist')),
+            ('enrollments by course', reverse('admin:courses_enrollment_changelist') + f'?course__id__exact={enrollment.course_id}'),
+            ('enrollments search', reverse('admin:courses_enrollment_changelist') + f'?q={enrollment.student.username}'),
+            ('enrollments broad search', reverse('admin:courses_enrollment_changelist') + f'?q={enrollment.student.username[:2]}'),
+            ('enrollment form', reverse('admin:courses_enrollment_change', args=[enrollment.pk])),
+            ('users', reverse('admin:auth_user_changelist')),
+            ('users search', reverse('admin:auth_user_changelist') + f'?q={enrollment.student.username}'),
+            ('course autocomplete', reverse('admin:autocomplete') + f'?app_label=courses&model_name=enrollment&field_name=course&term={term}'),
+        ]
+        modes = [True, False] if options['compare'] else [True]
+        self.stdout.write(f"{'page':<24}" + ''.join(f"{label + ' queries':>18}{label + ' ms':>14}" for label in (['perf', 'stock'][:len(modes)])))
+        with transaction.atomic():
+            user = User.objects.create_superuser('bench-admin', 'bench-admin@example.com', None)
+            client = Client(HTTP_HOST='localhost')
+            client.force_login(user)
+            with override_settings(ALLOWED_HOSTS=['localhost']):
+                for name, url in pages:
+                    row = f'{name:<24}'
+                    for mode in modes:
+                        with override_settings(ADMIN_PERFORMANCE_MODE=mode):
+                            queries, ms = self.measure(client, url, options['repeat'])
+                        row += f'{queries:>18}{ms:>14.1f}'
+                    self.stdout.write(row)
+            transaction.set_rollback(True)
+
+    def measure(self, client, url, repeat):
+        elapsed = []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = client.get(url)
+                elapsed.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                raise CommandError(f'{url} returned {response.status_code}')
+        return len(queries), min(elapsed)
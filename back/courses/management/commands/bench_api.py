@@ -0,0 +1,131 @@
+import json
+import logging
+import platform
+import subprocess
+from datetime import datetime, timezone
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from courses.loadtest import SCENARIOS, SEED_PREFIX, SIGNUP_PREFIX, ClientTransport, HTTPTransport, run
+from courses.models import Category, Course
+
+# Settings that change what the API does per request, recorded with every run
+RECORDED_SETTINGS = ('PASSWORD_HASHER', 'API_COALESCE_TIMEOUT', 'API_FAST_LIST', 'API_ASYNC_VIEWS', 'API_PROFILING', 'JWT_STATELESS_AUTH', 'DB_ENGINE', 'DATABASE_REPLICAS')
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs the load-test scenarios (courses.loadtest) against the data from seed_bench_data and reports '
+        'throughput, latency percentiles and queries per endpoint. Uses the in-process test client by default, '
+        'or a running server with --url (start it with API_PROFILING=1 to get query counts). '
+        'Writes are undone by the scenarios themselves (accounts from the register scenario are deleted '
+        'afterwards), so runs are repeatable.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+        parser.add_argument('--concurrency', type=int, default=1, help='Virtual users, one thread each')
+        parser.add_argument('--iterations', type=int, default=20, help='Runs of every scenario per virtual user')
+        parser.add_argument('--url', help='Base URL of a running server, e.g. http://127.0.0.1:8000')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--compare', help='JSON results of an earlier run to compare against')
+        parser.add_argument(
+            '--throttle', action='store_true',
+            help='Keep the rate limits on for in-process runs (every virtual user shares one client address)',
+        )
+
+    def handle(self, *args, **options):
+        roles = {SCENARIOS[name][1] for name in options['scenarios']}
+        users = {
+            role: list(User.objects.filter(username__startswith=f'{SEED_PREFIX}-{role}-').order_by('pk')[:options['concurrency']])
+            for role in roles
+        }
+        course_ids = list(Course.objects.filter(teacher__username__startswith=f'{SEED_PREFIX}-').values_list('pk', flat=True))
+        if not all(users.values()) or not course_ids:
+            raise CommandError('No seeded users or courses; run seed_bench_data first.')
+        category_ids = list(Category.objects.values_list('pk', flat=True))
+
+        if options['url']:
+            transport_factory = lambda: HTTPTransport(options['url'])
+        else:
+            transport_factory = ClientTransport
+            # Expected 4xx/5xx are counted as errors; don't log each one
+            logging.getLogger('django.request').setLevel(logging.CRITICAL)
+
+        # In-process, every virtual user shares one client address: lift the limits unless asked
+        options['throttling'] = settings.API_THROTTLING and bool(options['throttle'] or options['url'])
+        try:
+            with override_settings(API_THROTTLING=options['throttling']):
+                elapsed, endpoints = run(
+                    transport_factory, options['scenarios'], options['concurrency'], options['iterations'],
+                    users, course_ids, category_ids, options['seed'],
+                )
+        finally:
+            User.objects.filter(username__startswith=SIGNUP_PREFIX).delete()
+        results = {'meta': self.describe(options, elapsed, len(course_ids)), 'endpoints': endpoints}
+        baseline = self.load(options['compare'])['endpoints'] if options['compare'] else {}
+        self.report(endpoints, baseline)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def describe(self, options, elapsed, courses):
+        return {
+            'commit': self.git_commit(),
+            'started': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'target': options['url'] or 'test client',
+            'scenarios': options['scenarios'],
+            'concurrency': options['concurrency'],
+            'iterations': options['iterations'],
+            'throttling': options['throttling'],
+            'seconds': round(elapsed, 2),
+            'database': connection.vendor,
+            'courses': courses,
+            'python': platform.python_version(),
+            'settings': {name: getattr(settings, name, None) for name in RECORDED_SETTINGS},
+        }
+
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def load(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'Cannot read {path}: {exc}')
+
+    def report(self, endpoints, baseline):
+        self.stdout.write(
+            f"{'endpoint':<40}{'reqs':>6}{'err':>5}{'req/s':>8}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'queries':>9}"
+        )
+        for name, stats in endpoints.items():
+            queries = '-' if stats['queries'] is None else f"{stats['queries']:g}"
+            self.stdout.write(
+                f"{name:<40}{stats['requests']:>6}{stats['errors']:>5}{stats['rps']:>8.1f}"
+                f"{stats['p50_ms']:>9.1f}{stats['p90_ms']:>9.1f}{stats['p99_ms']:>9.1f}{queries:>9}"
+            )
+            before = baseline.get(name)
+            if before:
+                self.stdout.write(
+                    f"{'  vs baseline':<40}{'':>11}{self.change(before['rps'], stats['rps']):>8}"
+                    f"{self.change(before['p50_ms'], stats['p50_ms']):>9}{self.change(before['p90_ms'], stats['p90_ms']):>9}"
+                    f"{self.change(before['p99_ms'], stats['p99_ms']):>9}{self.change(before['queries'], stats['queries']):>9}"
+                )
+
+    def change(self, before, after):
+        if before is None or after is None:
+            return '-'
+        if before == 0:
+            return '=' if after == 0 else 'new'
+        return f'{(after - before) / before * 100:+.0f}%'
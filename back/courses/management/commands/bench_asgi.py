@@ -0,0 +1,154 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from courses.models import Course, Enrollment
+from courses.serializers import MyTokenObtainPairSerializer
+
+PREFIX = 'bench-asgi'
+
+# name, server command line (after "python -m"), extra environment
+SERVERS = (
+    ('wsgi', ['gunicorn', 'core.wsgi:application', '-k', 'gthread', '--threads', '{threads}', '--workers', '{workers}'], {}),
+    ('asgi-sync', ['uvicorn', 'core.asgi:application', '--workers', '{workers}', '--lifespan', 'off'], {'API_ASYNC_VIEWS': '0'}),
+    ('asgi-async', ['uvicorn', 'core.asgi:application', '--workers', '{workers}', '--lifespan', 'off'], {'API_ASYNC_VIEWS': '1'}),
+)
+
+# name, path, authenticated
+SCENARIOS = (
+    ('anon course list (cached)', '/api/courses/', False),
+    ('course list', '/api/courses/', True),
+    ('my enrollments', '/api/enrollments/', True),
+    ('course count', '/api/course-count/', True),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Starts the app under gunicorn (WSGI), uvicorn with sync views and uvicorn with async views, '
+        'and drives the hot read endpoints with a local keep-alive load generator. '
+        'Needs gunicorn and uvicorn installed; seeds (and afterwards removes) its own rows.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=200, help='Open client connections')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds per scenario')
+        parser.add_argument('--workers', type=int, default=1)
+        parser.add_argument('--threads', type=int, default=32, help='gunicorn threads per worker')
+        parser.add_argument('--servers', nargs='+', choices=[name for name, _, _ in SERVERS])
+
+    def handle(self, *args, **options):
+        token = self.populate()
+        try:
+            self.stdout.write(f"{'server':<12}{'scenario':<28}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}")
+            for name, command, env in SERVERS:
+                if options['servers'] and name not in options['servers']:
+                    continue
+                port = self.free_port()
+                argv = [sys.executable, '-m'] + [part.format(**options) for part in command]
+                argv += ['--bind', f'127.0.0.1:{port}'] if argv[2] == 'gunicorn' else ['--port', str(port), '--log-level', 'warning']
+                server = subprocess.Popen(
+                    argv, cwd=settings.BASE_DIR, env={**os.environ, **env},
+                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                )
+                try:
+                    self.wait_for_port(port, server)
+                    for scenario, path, authenticated in SCENARIOS:
+                        stats = asyncio.run(self.load(
+                            port, path, token if authenticated else None, options['concurrency'], options['duration']
+                        ))
+                        self.stdout.write(
+                            f"{name:<12}{scenario:<28}{stats['rps']:>9.0f}{stats['p50']:>9.1f}{stats['p99']:>9.1f}{stats['errors']:>8}"
+                        )
+                finally:
+                    server.terminate()
+                    server.wait()
+        finally:
+            User.objects.filter(username__startswith=f'{PREFIX}-').delete()
+
+    def populate(self):
+        User.objects.filter(username__startswith=f'{PREFIX}-').delete()
+        teacher = User.objects.create(username=f'{PREFIX}-teacher')
+        student = User.objects.create(username=f'{PREFIX}-student')
+        courses = [Course.objects.create(title=f'Bench ASGI course {i}', teacher=teacher) for i in range(40)]
+        for course in courses[:20]:
+            Enrollment.objects.create(student=student, course=course)
+        return str(MyTokenObtainPairSerializer.get_token(student).access_token)
+
+    def free_port(self):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            return sock.getsockname()[1]
+
+    def wait_for_port(self, port, server, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'Server exited with code {server.returncode} (is it installed?)')
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError(f'Server did not start listening on port {port}')
+
+    async def load(self, port, path, token, concurrency, duration):
+        request = f'GET {path} HTTP/1.1\r\nHost: localhost\r\nAccept: application/json\r\n'
+        if token:
+            request += f'Authorization: Bearer {token}\r\n'
+        request = (request + '\r\n').encode()
+        latencies, errors = [], [0]
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(self.client(port, request, deadline, latencies, errors) for _ in range(concurrency)))
+        latencies.sort()
+        if not latencies:
+            return {'rps': 0, 'p50': 0, 'p99': 0, 'errors': errors[0]}
+        return {
+            'rps': len(latencies) / duration,
+            'p50': latencies[len(latencies) // 2],
+            'p99': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+            'errors': errors[0],
+        }
+
+    async def client(self, port, request, deadline, latencies, errors):
+        reader = writer = None
+        while time.perf_counter() < deadline:
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                start = time.perf_counter()
+                writer.write(request)
+                await writer.drain()
+                status, keep_alive = await self.read_response(reader)
+                latencies.append((time.perf_counter() - start) * 1000)
+                if status != 200:
+                    errors[0] += 1
+                if not keep_alive:
+                    writer.close()
+                    writer = None
+            except (OSError, asyncio.IncompleteReadError, ValueError):
+                errors[0] += 1
+                if writer is not None:
+                    writer.close()
+                writer = None
+        if writer is not None:
+            writer.close()
+
+    async def read_response(self, reader):
+        status = int((await reader.readline()).split()[1])
+        headers = {}
+        while (line := await reader.readline()) not in (b'\r\n', b''):
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip().lower()
+        if 'content-length' in headers:
+            await reader.readexactly(int(headers['content-length']))
+        elif headers.get('transfer-encoding') == 'chunked':
+            while size := int((await reader.readline()).strip(), 16):
+                await reader.readexactly(size + 2)
+            await reader.readline()
+        return status, headers.get('connection') != 'close'
@@ -0,0 +1,58 @@
+import time
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from courses.authentication import StatelessJWTAuthentication
+from courses.models import Course, Enrollment
+from courses.serializers import MyTokenObtainPairSerializer
+
+MODES = (('database', JWTAuthentication), ('stateless', StatelessJWTAuthentication))
+
+
+class Command(BaseCommand):
+    help = 'Compares queries and latency per request for database-backed and stateless JWT authentication (rolled back).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            teacher = User.objects.create(username='bench-auth-teacher')
+            teacher.profile.is_student = False
+            teacher.profile.is_teacher = True
+            teacher.profile.save()
+            student = User.objects.create(username='bench-auth-student')
+            course = Course.objects.create(title='Bench auth course', teacher=teacher)
+            Enrollment.objects.create(student=student, course=course)
+
+            detail = f'/api/courses/{course.id}/'
+            scenarios = [
+                ('GET /api/courses/', student, '/api/courses/', lambda c: c.get('/api/courses/')),
+                ('GET /api/enrollments/', student, '/api/enrollments/', lambda c: c.get('/api/enrollments/')),
+                ('GET /api/course-count/', student, '/api/course-count/', lambda c: c.get('/api/course-count/')),
+                ('PATCH /api/courses/<id>/', teacher, detail, lambda c: c.patch(detail, {'description': 'x'}, format='json')),
+            ]
+            self.stdout.write(f"{'endpoint':<28}{'mode':<12}{'queries':>9}{'ms/req':>10}")
+            for name, user, path, call in scenarios:
+                # Views bind authentication_classes when they are defined, so patch the resolved class
+                view_class = resolve(path).func.cls
+                token = str(MyTokenObtainPairSerializer.get_token(user).access_token)
+                for mode, auth_class in MODES:
+                    client = APIClient(SERVER_NAME='localhost')
+                    client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+                    with mock.patch.object(view_class, 'authentication_classes', [auth_class]):
+                        call(client)  # warm caches
+                        reset_queries()  # queries_log is bounded; a full log would capture nothing
+                        with CaptureQueriesContext(connection) as ctx:
+                            call(client)
+                        start = time.perf_counter()
+                        for _ in range(options['requests']):
+                            call(client)
+                        elapsed = (time.perf_counter() - start) * 1000 / options['requests']
+                    self.stdout.write(f"{name:<28}{mode:<12}{len(ctx.captured_queries):>9}{elapsed:>10.2f}")
+            transaction.set_rollback(True)
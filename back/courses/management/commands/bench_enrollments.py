@@ -0,0 +1,101 @@
+import logging
+import statistics
+import threading
+import time
+from collections import Counter
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from rest_framework.test import APIClient
+from courses.models import Course
+
+PREFIX = 'bench-enroll'
+
+
+class Command(BaseCommand):
+    help = (
+        'Load test: concurrent students POST /api/enrollments/ against the configured database profile. '
+        'Writes real rows (committed, other threads must see them) and deletes them afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--enrollments', type=int, default=25, help='Enrollments per thread (one course each)')
+
+    def handle(self, *args, **options):
+        self.describe_profile()
+        # Failed requests are counted below; don't print a traceback for each one
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+        teacher, students, course_ids = self.populate(options['threads'], options['enrollments'])
+        results = []
+        barrier = threading.Barrier(len(students))
+        threads = [
+            threading.Thread(target=self.enroll, args=(student, course_ids, barrier, results))
+            for student in students
+        ]
+        try:
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+        finally:
+            User.objects.filter(pk__in=[teacher.pk] + [student.pk for student in students]).delete()
+
+        outcomes = Counter(outcome for outcome, _ in results)
+        latencies = sorted(latency for outcome, latency in results if outcome == 'created')
+        created = outcomes.pop('created', 0)
+        self.stdout.write(f"{len(results)} requests from {len(students)} threads in {elapsed:.2f}s")
+        self.stdout.write(f"created: {created} ({created / elapsed:.0f}/s), errors: {dict(outcomes) or 0}")
+        if latencies:
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            self.stdout.write(f"latency ms: p50 {statistics.median(latencies):.1f}, p95 {p95:.1f}, max {latencies[-1]:.1f}")
+
+    def describe_profile(self):
+        db = settings.DATABASES['default']
+        profile = f"{connection.vendor}, CONN_MAX_AGE={db.get('CONN_MAX_AGE', 0)}"
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                journal_mode = cursor.fetchone()[0]
+                cursor.execute('PRAGMA synchronous')
+                synchronous = cursor.fetchone()[0]
+            transaction_mode = db.get('OPTIONS', {}).get('transaction_mode', 'DEFERRED')
+            profile += f", journal_mode={journal_mode}, synchronous={synchronous}, transaction_mode={transaction_mode}"
+        elif 'pool' in db.get('OPTIONS', {}):
+            profile += f", pool={db['OPTIONS']['pool']}"
+        self.stdout.write(f"profile: {profile}")
+
+    def populate(self, threads, enrollments):
+        User.objects.filter(username__startswith=f'{PREFIX}-').delete()
+        teacher = User.objects.create(username=f'{PREFIX}-teacher')
+        teacher.profile.is_student = False
+        teacher.profile.is_teacher = True
+        teacher.profile.save()
+        students = [User.objects.create(username=f'{PREFIX}-student-{i}') for i in range(threads)]
+        course_ids = [
+            Course.objects.create(title=f'Bench enroll course {i}', teacher=teacher).pk for i in range(enrollments)
+        ]
+        return teacher, students, course_ids
+
+    def enroll(self, student, course_ids, barrier, results):
+        client = APIClient(SERVER_NAME='localhost')
+        client.raise_request_exception = False
+        client.force_authenticate(student)
+        try:
+            barrier.wait()
+            for course_id in course_ids:
+                start = time.perf_counter()
+                response = client.post('/api/enrollments/', {'course_id': course_id}, format='json')
+                latency = (time.perf_counter() - start) * 1000
+                if response.status_code == 201:
+                    outcome = 'created'
+                elif getattr(response, 'exc_info', None):
+                    outcome = str(response.exc_info[1])[:40]
+                else:
+                    outcome = f'HTTP {response.status_code}'
+                results.append((outcome, latency))
+        finally:
+            connections.close_all()
@@ -0,0 +1,64 @@
+import random
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from courses.models import Category, Course
+from courses.search import IcontainsSearchBackend, get_search_backend
+
+WORDS = (
+    'python django angular web data science machine learning design marketing '
+    'finance history physics chemistry biology music drawing writing english '
+    'statistics algebra calculus network security cloud devops testing mobile'
+).split()
+
+# Broad terms match thousands of rows; module codes and misses are selective, where a scan can't stop early
+QUERIES = ['python', 'mach learn', 'data science', 'module417', 'module99 secur', 'quantum']
+
+
+class Command(BaseCommand):
+    help = 'Compares the search index against the icontains scan on a synthetic catalog (rolled back afterwards).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            self.populate(rng, options['courses'])
+            get_search_backend().rebuild()
+            backends = [('index', get_search_backend()), ('icontains', IcontainsSearchBackend())]
+            queryset = Course.objects.select_related('teacher', 'category')
+            self.stdout.write(f"{'query':<18}" + ''.join(f'{name + " ms":>16}' for name, _ in backends))
+            for query in QUERIES:
+                row = f'{query:<18}'
+                for name, backend in backends:
+                    row += f'{self.measure(backend, queryset, query, options["repeat"]):>16.2f}'
+                self.stdout.write(row)
+            transaction.set_rollback(True)
+
+    def populate(self, rng, count):
+        teacher = User.objects.create(username='bench-search-teacher', first_name='Bench', last_name='Teacher')
+        categories = Category.objects.bulk_create(
+            Category(name=f'Bench {word}', slug=f'bench-{word}') for word in WORDS[:10]
+        )
+        batch = []
+        for i in range(count):
+            title = ' '.join(rng.sample(WORDS, 3)).title()
+            batch.append(Course(
+                title=title, slug=f'bench-search-{i}', teacher=teacher,
+                category=rng.choice(categories),
+                description=' '.join(rng.choices(WORDS, k=40) + [f'module{i % 5000}']),
+            ))
+            if len(batch) == 5000:
+                Course.objects.bulk_create(batch)
+                batch = []
+        Course.objects.bulk_create(batch)
+
+    def measure(self, backend, queryset, query, repeat):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            list(backend.search(queryset, query))
+        return (time.perf_counter() - start) * 1000 / repeat
@@ -0,0 +1,89 @@
+import time
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from courses.fastpath import FastRepresentation
+from courses.models import Category, Course, Profile
+from courses.renderers import FastJSONRenderer
+from courses.serializers import CourseSerializer, parse_fields
+
+# The fields the Angular course list actually renders
+LIST_FIELDS = 'id,title,summary,created_at,teacher.username,category.name'
+
+
+class Command(BaseCommand):
+    help = 'Reports payload bytes and query/serialize/render time per 1,000 courses for course list representations: DRF serializers vs the values()/orjson fast path (rolled back).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[100, 1000, 10000])
+        parser.add_argument('--description-length', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        request = Request(APIRequestFactory().get('/api/courses/'))
+        request.user = AnonymousUser()
+        with transaction.atomic():
+            self.populate(max(options['rows']), options['description_length'])
+            self.stdout.write(f"{'rows':>6} {'variant':<12}{'KB/1k':>10}{'query ms/1k':>13}{'serialize ms/1k':>17}{'render ms/1k':>14}  same bytes")
+            for rows in options['rows']:
+                bodies = {}
+                for name, run in self.variants(request):
+                    stats = run(rows)
+                    scale = 1000 / rows
+                    # Fast variants must render exactly what their serializer counterpart renders
+                    base = name.removesuffix('-fast')
+                    same = ('yes' if bodies[base] == stats['body'] else 'NO') if base in bodies else ''
+                    bodies[name] = stats['body']
+                    self.stdout.write(
+                        f"{rows:>6} {name:<12}{len(stats['body']) * scale / 1024:>10.1f}{stats['query'] * scale:>13.2f}"
+                        f"{stats['serialize'] * scale:>17.2f}{stats['render'] * scale:>14.2f}  {same}"
+                    )
+            transaction.set_rollback(True)
+
+    def variants(self, request):
+        base = Course.objects.select_related('teacher', 'category', 'teacher__profile').order_by('-created_at', '-id')
+        fields = parse_fields(LIST_FIELDS)
+        sparse = CourseSerializer.optimize_queryset(base, fields)
+        return [
+            ('full', lambda rows: self.measure(base, rows, request)),
+            ('full-fast', lambda rows: self.measure(base, rows, request, fast=True)),
+            ('sparse', lambda rows: self.measure(sparse, rows, request, fields)),
+            ('sparse-fast', lambda rows: self.measure(sparse, rows, request, fields, fast=True)),
+        ]
+
+    def measure(self, queryset, rows, request, fields=None, fast=False):
+        serializer = CourseSerializer(context={'request': request}, fields=fields)
+        start = time.perf_counter()
+        if fast:
+            representation = FastRepresentation(serializer)
+            courses = list(representation.values(queryset)[:rows])
+        else:
+            courses = list(queryset[:rows])
+        queried = time.perf_counter()
+        if fast:
+            data = representation.to_representation(courses)
+        else:
+            data = CourseSerializer(courses, many=True, context={'request': request}, fields=fields).data
+        serialized = time.perf_counter()
+        body = (FastJSONRenderer if fast else JSONRenderer)().render(data)
+        rendered = time.perf_counter()
+        return {
+            'body': body, 'query': (queried - start) * 1000,
+            'serialize': (serialized - queried) * 1000, 'render': (rendered - serialized) * 1000,
+        }
+
+    def populate(self, count, description_length):
+        teachers = User.objects.bulk_create(User(username=f'bench-serializer-{i}') for i in range(50))
+        # bulk_create skips the post_save signal that normally creates the profile
+        Profile.objects.bulk_create(Profile(user=teacher, is_student=False, is_teacher=True) for teacher in teachers)
+        categories = Category.objects.bulk_create(
+            Category(name=f'Bench serializer {i}', slug=f'bench-serializer-{i}') for i in range(20)
+        )
+        description = ('Lorem ipsum dolor sit amet. ' * (description_length // 28 + 1))[:description_length]
+        Course.objects.bulk_create(
+            (Course(title=f'Bench course {i}', slug=f'bench-serializer-course-{i}', description=description,
+                    teacher=teachers[i % 50], category=categories[i % 20]) for i in range(count)),
+            batch_size=2000,
+        )
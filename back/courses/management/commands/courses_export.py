@@ -0,0 +1,54 @@
+import csv
+import json
+import sys
+import time
+from django.core.management.base import BaseCommand, CommandError
+from courses.models import Course
+
+FIELDS = ('slug', 'title', 'description', 'category', 'teacher', 'created_at', 'updated_at')
+
+
+class Command(BaseCommand):
+    help = 'Streams every course to CSV or JSON Lines in the format accepted by courses_import.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Output file, or '-' for stdout")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Defaults to the file extension')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or ('csv' if options['path'].endswith('.csv') else 'jsonl')
+        try:
+            stream = sys.stdout if options['path'] == '-' else open(options['path'], 'w', newline='', encoding='utf-8')
+        except OSError as e:
+            raise CommandError(str(e))
+
+        # values_list + iterator() keeps memory flat: no model instances, no result cache
+        rows = Course.objects.order_by('pk').values_list(
+            'slug', 'title', 'description', 'category__name', 'teacher__username', 'created_at', 'updated_at'
+        ).iterator(chunk_size=options['chunk_size'])
+
+        start = time.perf_counter()
+        count = 0
+        try:
+            if fmt == 'csv':
+                writer = csv.writer(stream)
+                writer.writerow(FIELDS)
+                for row in rows:
+                    writer.writerow(row)
+                    count += 1
+            else:
+                for row in rows:
+                    record = dict(zip(FIELDS, row))
+                    record['created_at'] = record['created_at'].isoformat()
+                    record['updated_at'] = record['updated_at'].isoformat()
+                    stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+                    count += 1
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+
+        elapsed = time.perf_counter() - start
+        self.stderr.write(self.style.SUCCESS(
+            f"Exported {count} courses in {elapsed:.2f}s ({count / elapsed if elapsed else 0:.0f} rows/s)"
+        ))
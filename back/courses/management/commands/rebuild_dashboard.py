@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from courses.dashboard import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the "my courses" dashboard read model (DashboardEntry) from enrollments.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            entries = rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Dashboard rebuilt with {entries} entries.'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from courses.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the course full-text search index from the database.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rebuild_index()
+        self.stdout.write(self.style.SUCCESS('Course search index rebuilt.'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from courses.cache import bump_version, RESOURCE_CATEGORIES, RESOURCE_COURSES
+from courses.counters import refresh_category_counts, refresh_enrollment_counts, refresh_facet_counts
+
+
+class Command(BaseCommand):
+    help = 'Recomputes Course.enrollment_count, Category.course_count and the facet counts from the source tables.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            courses = refresh_enrollment_counts()
+            categories = refresh_category_counts()
+            facets = refresh_facet_counts()
+        bump_version(RESOURCE_CATEGORIES, RESOURCE_COURSES)
+        self.stdout.write(self.style.SUCCESS(f'Recounted {courses} courses and {categories} categories, rebuilt {facets} facet rows.'))
@@ -0,0 +1,41 @@
+import sqlite3
+import time
+from contextlib import closing
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Local stand-in for replication: copies the SQLite primary into every replica file '
+        '(DJANGO_DB_REPLICAS) with the online backup API, once or every --interval seconds, '
+        'so the replicas lag the primary by up to one interval plus the copy time.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0, help='Seconds between copies; 0 copies once')
+
+    def handle(self, *args, **options):
+        if connections['default'].vendor != 'sqlite':
+            raise CommandError('replicate_sqlite only copies SQLite databases.')
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('No replicas configured; set DJANGO_DB_REPLICAS to their file paths.')
+        try:
+            while True:
+                start = time.perf_counter()
+                for alias in settings.DATABASE_REPLICAS:
+                    self.copy(settings.DATABASES[alias]['NAME'])
+                elapsed = (time.perf_counter() - start) * 1000
+                self.stdout.write(f'Copied the primary to {len(settings.DATABASE_REPLICAS)} replicas in {elapsed:.0f} ms.')
+                if not options['interval']:
+                    return
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+
+    def copy(self, target):
+        # Readers of the replica wait on busy_timeout while the copy holds its lock
+        with closing(sqlite3.connect(settings.DATABASES['default']['NAME'])) as source:
+            with closing(sqlite3.connect(target, timeout=30)) as replica:
+                source.backup(replica)
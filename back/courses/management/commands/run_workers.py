@@ -0,0 +1,47 @@
+import signal
+import threading
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from courses import changes, jobs
+
+PRUNE_INTERVAL = 600  # seconds between deletions of expired done jobs and change log entries
+
+
+class Command(BaseCommand):
+    help = 'Runs queued background jobs (courses.jobs) on a pool of worker threads until interrupted.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=settings.JOBS_WORKER_THREADS, help='Worker threads, one database connection each')
+        parser.add_argument('--claim-size', type=int, default=settings.JOBS_CLAIM_SIZE, help='Jobs a thread claims at a time')
+        parser.add_argument('--poll-interval', type=float, default=settings.JOBS_POLL_INTERVAL, help='Seconds an idle thread waits before polling again')
+        parser.add_argument('--once', action='store_true', help='Run the jobs that are due in this thread, then exit')
+
+    def handle(self, *args, **options):
+        if options['once']:
+            ran = jobs.drain(options['claim_size'])
+            self.stdout.write(self.style.SUCCESS(f'Ran {ran} jobs.'))
+            return
+
+        # Threads suit the I/O-bound handlers (mail, HTTP); for CPU-bound ones, start
+        # several run_workers processes instead, claims are safe across processes
+        stop = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *args: stop.set())
+        threads = [
+            threading.Thread(target=jobs.work, args=(stop, options['poll_interval'], options['claim_size']), name=f'job-worker-{number}')
+            for number in range(options['threads'])
+        ]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(f'Running {len(threads)} job worker threads; Ctrl-C to stop.')
+        while not stop.is_set():
+            pruned = jobs.prune()
+            if pruned:
+                self.stdout.write(f'Pruned {pruned} finished jobs.')
+            pruned = changes.prune()
+            if pruned:
+                self.stdout.write(f'Pruned {pruned} change log entries.')
+            stop.wait(PRUNE_INTERVAL)
+        for thread in threads:
+            thread.join()
+        self.stdout.write(self.style.SUCCESS('Job workers stopped.'))
@@ -0,0 +1,128 @@
+import itertools
+import random
+import time
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from courses.cache import bump_version, RESOURCE_CATEGORIES, RESOURCE_COURSES
+from courses.counters import refresh_category_counts, refresh_enrollment_counts, refresh_facet_counts
+from courses.dashboard import rebuild as rebuild_dashboard
+from courses.loadtest import LEVELS, SEED_PASSWORD, SEED_PREFIX, TOPICS, WORDS
+from courses.models import Category, Course, Enrollment, Profile
+from courses.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = (
+        'Bulk-inserts synthetic data for bench_api: teachers and students (with profiles, password '
+        f'"{SEED_PASSWORD}"), categories, courses and enrollments with a skewed popularity. Meant for a '
+        'scratch database, e.g. DJANGO_DB_NAME=/tmp/bench.sqlite3 python manage.py migrate first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--teachers', type=int, default=1000)
+        parser.add_argument('--students', type=int, default=50000)
+        parser.add_argument('--categories', type=int, default=40)
+        parser.add_argument('--courses', type=int, default=100000)
+        parser.add_argument('--enrollments', type=int, default=2000000, help='Approximate total')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed gives the same data')
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username__startswith=f'{SEED_PREFIX}-').exists():
+            raise CommandError('Seed data already exists; run against a fresh database.')
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        start = time.perf_counter()
+
+        password = make_password(SEED_PASSWORD)  # hashed once, shared by every seeded user
+        teacher_ids = self.create_users('teacher', options['teachers'], password)
+        student_ids = self.create_users('student', options['students'], password)
+        category_ids = self.create_categories(options['categories'])
+        course_ids = self.create_courses(options['courses'], teacher_ids, category_ids)
+        enrollments = self.create_enrollments(options['enrollments'], student_ids, course_ids)
+
+        self.stdout.write('Recounting and indexing...')
+        with transaction.atomic():
+            refresh_enrollment_counts()
+            refresh_category_counts()
+            refresh_facet_counts()
+            rebuild_index()
+            rebuild_dashboard()
+        bump_version(RESOURCE_CATEGORIES, RESOURCE_COURSES)
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(teacher_ids)} teachers, {len(student_ids)} students, {len(category_ids)} categories, '
+            f'{len(course_ids)} courses and {enrollments} enrollments in {time.perf_counter() - start:.0f}s.'
+        ))
+
+    def batches(self, iterable):
+        iterator = iter(iterable)
+        while batch := list(itertools.islice(iterator, self.batch_size)):
+            yield batch
+
+    def create_users(self, role, count, password):
+        # bulk_create skips the post_save signal, so profiles are inserted alongside
+        ids = []
+        for batch in self.batches(range(count)):
+            with transaction.atomic():
+                users = User.objects.bulk_create([
+                    User(
+                        username=f'{SEED_PREFIX}-{role}-{i}', email=f'{role}{i}@example.com', password=password,
+                        first_name=self.rng.choice(TOPICS), last_name=f'{role.title()} {i}',
+                    )
+                    for i in batch
+                ])
+                Profile.objects.bulk_create([
+                    Profile(user_id=user.pk, is_student=role == 'student', is_teacher=role == 'teacher')
+                    for user in users
+                ])
+            ids += [user.pk for user in users]
+        self.stdout.write(f'{count} {role}s')
+        return ids
+
+    def create_categories(self, count):
+        names = [
+            TOPICS[i % len(TOPICS)] + (f' {i // len(TOPICS) + 1}' if i >= len(TOPICS) else '') for i in range(count)
+        ]
+        existing = set(Category.objects.filter(name__in=names).values_list('name', flat=True))
+        Category.objects.bulk_create(Category.assign_slugs([Category(name=name) for name in names if name not in existing]))
+        return list(Category.objects.filter(name__in=names).values_list('pk', flat=True))
+
+    def create_courses(self, count, teacher_ids, category_ids):
+        ids = []
+        for batch in self.batches(range(count)):
+            courses = [
+                Course(
+                    title=f'{self.rng.choice(LEVELS)} {self.rng.choice(TOPICS)} {i}',
+                    description=' '.join(self.rng.choices(WORDS, k=self.rng.randint(20, 120))),
+                    teacher_id=self.rng.choice(teacher_ids),
+                    # One course in ten is uncategorised
+                    category_id=self.rng.choice(category_ids) if category_ids and self.rng.random() > 0.1 else None,
+                )
+                for i in batch
+            ]
+            with transaction.atomic():
+                ids += [course.pk for course in Course.objects.bulk_create(Course.assign_slugs(courses))]
+        self.stdout.write(f'{len(ids)} courses')
+        return ids
+
+    def create_enrollments(self, total, student_ids, course_ids):
+        # Zipf-like popularity: a few courses draw most enrollments, like a real catalogue
+        ranked = course_ids[:]
+        self.rng.shuffle(ranked)
+        cum_weights = list(itertools.accumulate(1 / (rank + 10) for rank in range(len(ranked))))
+        per_student = total / max(len(student_ids), 1)
+
+        def enrollments():
+            for student_id in student_ids:
+                count = min(len(ranked), max(1, round(self.rng.expovariate(1 / per_student))))
+                for course_id in set(self.rng.choices(ranked, cum_weights=cum_weights, k=count)):
+                    yield Enrollment(student_id=student_id, course_id=course_id)
+
+        created = 0
+        for batch in self.batches(enrollments()):
+            Enrollment.objects.bulk_create(batch)
+            created += len(batch)
+        self.stdout.write(f'{created} enrollments')
+        return created
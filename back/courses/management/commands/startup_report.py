@@ -0,0 +1,50 @@
+from collections import defaultdict
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from courses import startup
+
+
+class Command(BaseCommand):
+    help = (
+        'Boots core.wsgi in a fresh interpreter under python -X importtime, serves one request and '
+        'reports boot and first-response time, the slowest imports and the time per top-level package. '
+        'Fails when boot plus the first response exceeds --budget-ms (STARTUP_BUDGET_MS).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/api/courses/', help='Path of the first request')
+        parser.add_argument('--limit', type=int, default=15, help='Imports listed per table')
+        parser.add_argument('--budget-ms', type=float, default=None)
+        parser.add_argument('--eager-admin', action='store_true', help='Boot with DJANGO_LAZY_ADMIN=0, for comparison')
+
+    def handle(self, *args, **options):
+        env = {'DJANGO_LAZY_ADMIN': '0'} if options['eager_admin'] else None
+        try:
+            result = startup.measure(options['path'], env)
+        except RuntimeError as error:
+            raise CommandError(str(error))
+        limit = options['limit']
+
+        self.stdout.write('Slowest imports (self):')
+        for name, own, cumulative in sorted(result.imports, key=lambda row: -row[1])[:limit]:
+            self.stdout.write(f'  {own / 1000:>8.1f} ms  {name}')
+        self.stdout.write('Slowest imports (cumulative):')
+        for name, own, cumulative in sorted(result.imports, key=lambda row: -row[2])[:limit]:
+            self.stdout.write(f'  {cumulative / 1000:>8.1f} ms  {name}')
+        packages = defaultdict(int)
+        for name, own, cumulative in result.imports:
+            packages[name.split('.')[0]] += own
+        self.stdout.write('Import time per package:')
+        for name, own in sorted(packages.items(), key=lambda item: -item[1])[:limit]:
+            self.stdout.write(f'  {own / 1000:>8.1f} ms  {name}')
+
+        loaded = ', '.join(name for name in ('courses.admin', 'django.contrib.auth.admin', 'pytils') if name in result.modules)
+        self.stdout.write(f'Modules imported: {len(result.imports)} ({sum(row[1] for row in result.imports) / 1000:.1f} ms); '
+                          f'admin/slug modules loaded: {loaded or "none"}')
+        self.stdout.write(
+            f"Boot {result.boot_ms:.1f} ms, first response ({options['path']} -> {result.status}) "
+            f'{result.first_response_ms:.1f} ms, process {result.wall_ms:.1f} ms'
+        )
+        budget = options['budget_ms'] if options['budget_ms'] is not None else settings.STARTUP_BUDGET_MS
+        if result.total_ms > budget:
+            raise CommandError(f'Boot plus first response took {result.total_ms:.1f} ms, over the {budget:.0f} ms budget.')
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+FTS_TABLE = 'courses_course_fts'
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        "title, description, category, teacher, "
+        "prefix='2 3', tokenize='unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute(
+        f"INSERT INTO {FTS_TABLE}(rowid, title, description, category, teacher) "
+        "SELECT c.id, c.title, c.description, COALESCE(cat.name, ''), "
+        "TRIM(u.username || ' ' || u.first_name || ' ' || u.last_name) "
+        "FROM courses_course c "
+        "LEFT JOIN courses_category cat ON cat.id = c.category_id "
+        "INNER JOIN auth_user u ON u.id = c.teacher_id"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0002_course_enrollment_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
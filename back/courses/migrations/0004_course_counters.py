@@ -0,0 +1,42 @@
+# Generated by Django 5.2 on 2026-10-18 16:50
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counts(apps, schema_editor):
+    Category = apps.get_model('courses', 'Category')
+    Course = apps.get_model('courses', 'Course')
+    Enrollment = apps.get_model('courses', 'Enrollment')
+    enrollments = Enrollment.objects.filter(course=OuterRef('pk')).order_by().values('course').annotate(total=Count('pk')).values('total')
+    Course.objects.update(enrollment_count=Coalesce(Subquery(enrollments), 0))
+    courses = Course.objects.filter(category=OuterRef('pk')).order_by().values('category').annotate(total=Count('pk')).values('total')
+    Category.objects.update(course_count=Coalesce(Subquery(courses), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0003_course_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='course_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Courses'),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='enrollment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Enrollments'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['-enrollment_count', '-created_at', '-id'], name='course_popularity_idx'),
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2 on 2026-10-18 17:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Same rows as courses.dashboard.rebuild(), in one statement
+BACKFILL_SQL = """
+INSERT INTO courses_dashboardentry (
+    enrollment_id, student_id, course_id, enrolled_at,
+    course_title, course_slug, course_summary, teacher_username, category_name
+)
+SELECT e.id, e.student_id, e.course_id, e.enrolled_at,
+       c.title, c.slug, SUBSTR(c.description, 1, 200), u.username, COALESCE(cat.name, '')
+FROM courses_enrollment e
+INNER JOIN courses_course c ON c.id = e.course_id
+INNER JOIN auth_user u ON u.id = c.teacher_id
+LEFT OUTER JOIN courses_category cat ON cat.id = c.category_id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0005_hot_path_composite_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardEntry',
+            fields=[
+                ('enrollment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='dashboard_entry', serialize=False, to='courses.enrollment')),
+                ('course_title', models.CharField(max_length=200)),
+                ('course_slug', models.SlugField(db_index=False, max_length=210)),
+                ('course_summary', models.CharField(blank=True, max_length=200)),
+                ('teacher_username', models.CharField(max_length=150)),
+                ('category_name', models.CharField(blank=True, max_length=100)),
+                ('enrolled_at', models.DateTimeField()),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='courses.course')),
+                ('student', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-enrolled_at', '-enrollment'],
+                'indexes': [models.Index(fields=['student', '-enrolled_at', '-enrollment'], name='dashboard_student_date_idx')],
+            },
+        ),
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+    ]
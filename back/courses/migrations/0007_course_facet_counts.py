@@ -0,0 +1,47 @@
+# Generated by Django 5.2 on 2026-10-18 18:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def backfill_facet_counts(apps, schema_editor):
+    # Same rows as courses.counters.refresh_facet_counts()
+    Course = apps.get_model('courses', 'Course')
+    CourseFacetCount = apps.get_model('courses', 'CourseFacetCount')
+    rows = (
+        Course.objects.order_by().values('category_id', 'teacher_id', day=TruncDate('created_at'))
+        .annotate(total=Count('pk')).values_list('category_id', 'teacher_id', 'day', 'total')
+    )
+    CourseFacetCount.objects.bulk_create(
+        (CourseFacetCount(category_id=category_id, teacher_id=teacher_id, day=day, course_count=total)
+         for category_id, teacher_id, day, total in rows.iterator()),
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0006_dashboard_entry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseFacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('course_count', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='courses.category')),
+                ('teacher', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['category', 'teacher', 'day', 'course_count'], name='facet_category_idx'), models.Index(fields=['teacher', 'category', 'day', 'course_count'], name='facet_teacher_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_facet_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2 on 2026-10-18 21:05
+
+import courses.models
+from django.db import migrations, models
+
+
+def fill_title_folded(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    field = Course._meta.get_field('title_folded')
+    courses = Course.objects.using(schema_editor.connection.alias).only('pk', 'title').order_by('pk')
+    batch = []
+    for course in courses.iterator(chunk_size=2000):
+        course.title_folded = field.fold(course.title)
+        batch.append(course)
+        if len(batch) == 2000:
+            Course.objects.using(schema_editor.connection.alias).bulk_update(batch, ['title_folded'])
+            batch = []
+    Course.objects.using(schema_editor.connection.alias).bulk_update(batch, ['title_folded'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0010_course_title_lower_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='title_folded',
+            field=courses.models.FoldedCharField(default='', editable=False, max_length=200, source_field='title'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_title_folded, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='course',
+            name='course_title_lower_idx',
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['title_folded'], name='course_title_folded_idx'),
+        ),
+    ]
@@ -1,7 +1,42 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
-from django.utils.text import slugify
-from pytils import translit
+from .slugs import UniqueSlugMixin
+
+# Case-folded copy of another column, for case-insensitive prefix search on a plain index
+# (courses.admin_performance): SQLite's LOWER() folds ASCII only, so "курс" would never
+# match "Курс" through an index on Lower(title). Filled by save() and bulk_create();
+# bulk_update() and QuerySet.update() callers must include it themselves.
+class FoldedCharField(models.CharField):
+    def __init__(self, *args, source_field=None, **kwargs):
+        self.source_field = source_field
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs['source_field'] = self.source_field
+        return name, path, args, kwargs
+
+    def fold(self, value):
+        return (value or '').casefold()[:self.max_length]
+
+    def pre_save(self, model_instance, add):
+        value = self.fold(getattr(model_instance, self.source_field))
+        setattr(model_instance, self.attname, value)
+        return value
+
+# Counter columns are maintained with F() updates (courses.counters); a plain save()
+# of an older in-memory instance must not write its stale value back.
+class CounterFieldsMixin:
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and not args and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.counter_fields
+            ]
+        return super().save(*args, **kwargs)
 
 # BE-1: Model definition (1/4+)
 class Profile(models.Model):
@@ -9,31 +44,37 @@ class Profile(models.Model):
     is_student = models.BooleanField('Is student', default=True)
     is_teacher = models.BooleanField('Is teacher', default=False)
 
+    class Meta:
+        indexes = [
+            # Backs the teacher_id choices (User filtered on profile__is_teacher)
+            models.Index(fields=['is_teacher', 'user'], name='profile_teacher_user_idx'),
+        ]
+
     def __str__(self):
         role = "Student" if self.is_student else "Teacher" if self.is_teacher else "Admin"
         return f"{self.user.username} ({role})"
 
 # BE-1: Model definition (2/4+)
-class Category(models.Model):
+class Category(CounterFieldsMixin, UniqueSlugMixin, models.Model):
     name = models.CharField('Category Name', max_length=100, unique=True)
     slug = models.SlugField('Slug', max_length=110, unique=True, blank=True)
+    course_count = models.PositiveIntegerField('Courses', default=0, editable=False) # Maintained by courses.counters
+
+    counter_fields = ('course_count',)
+    slug_source_field = 'name'
+    slug_fallback = 'category'
 
     class Meta:
         verbose_name = 'Category'
         verbose_name_plural = 'Categories'
         ordering = ['name']
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = translit.slugify(self.name)
-        super().save(*args, **kwargs)
-
     def __str__(self):
         return self.name
 
 # BE-1: Model definition (3/4+)
-class Course(models.Model):
-    category = models.ForeignKey(Category, related_name='courses', on_delete=models.SET_NULL, null=True, blank=True) # BE-3: ForeignKey relation to Category
+class Course(CounterFieldsMixin, UniqueSlugMixin, models.Model):
+    category = models.ForeignKey(Category, related_name='courses', on_delete=models.SET_NULL, null=True, blank=True, db_index=False) # BE-3: ForeignKey relation to Category (indexed by course_category_created_idx)
     title = models.CharField('Title', max_length=200)
     slug = models.SlugField('Slug', max_length=210, unique=True, blank=True)
     description = models.TextField('Description', blank=True)
@@ -41,20 +82,46 @@ class Course(models.Model):
         User,
         related_name='courses_taught',
         on_delete=models.CASCADE,
+        db_index=False, # Covered by course_teacher_created_idx
         limit_choices_to={'profile__is_teacher': True}
     )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    enrollment_count = models.PositiveIntegerField('Enrollments', default=0, editable=False) # Maintained by courses.counters
+    title_folded = FoldedCharField(max_length=200, source_field='title', editable=False)
+
+    counter_fields = ('enrollment_count',)
+    slug_source_field = 'title'
+    slug_fallback = 'course'
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='course_created_id_idx'),
+            models.Index(fields=['-enrollment_count', '-created_at', '-id'], name='course_popularity_idx'),
+            models.Index(fields=['category', '-created_at', '-id'], name='course_category_created_idx'),
+            models.Index(fields=['teacher', '-created_at', '-id'], name='course_teacher_created_idx'),
+            models.Index(fields=['title_folded'], name='course_title_folded_idx'),  # Admin prefix search
+        ]
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-           self.slug = translit.slugify(self.title)
-        if Course.objects.filter(slug=self.slug).exclude(pk=self.pk).exists():
-             self.slug = f"{self.slug}-{self.pk or 'new'}"
-        super().save(*args, **kwargs)
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored category and teacher so course and facet counts can follow reassignment
+        instance._loaded_category_id = instance.__dict__.get('category_id')
+        instance._loaded_teacher_id = instance.__dict__.get('teacher_id')
+        instance._loaded_dashboard_fields = instance.dashboard_fields()
+        return instance
+
+    def dashboard_fields(self):
+        # The columns DashboardEntry copies (courses.dashboard); the description only up to
+        # the summary cut. Deferred columns count as unchanged unless they are loaded.
+        values = self.__dict__
+        summary_length = DashboardEntry._meta.get_field('course_summary').max_length
+        return (
+            values.get('title'), values.get('slug'), (values.get('description') or '')[:summary_length],
+            values.get('teacher_id'), values.get('category_id'),
+        )
 
     def __str__(self):
         return self.title
@@ -77,6 +144,104 @@ class Enrollment(models.Model):
     class Meta:
         unique_together = ('student', 'course')
         ordering = ['-enrolled_at']
+        indexes = [
+            models.Index(fields=['student', '-enrolled_at', '-id'], name='enroll_student_date_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student.username} enrolled in {self.course.title}"
+
+# Denormalized read model behind /api/my-courses/: one row per enrollment carrying what
+# the student's dashboard shows, so a page is one range scan on (student, enrolled_at).
+# Kept in sync by courses.dashboard (signals and the bulk write paths).
+class DashboardEntry(models.Model):
+    enrollment = models.OneToOneField(Enrollment, on_delete=models.CASCADE, primary_key=True, related_name='dashboard_entry')
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', db_index=False) # Covered by dashboard_student_date_idx
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='+')
+    course_title = models.CharField(max_length=200)
+    course_slug = models.SlugField(max_length=210, db_index=False)
+    course_summary = models.CharField(max_length=200, blank=True)
+    teacher_username = models.CharField(max_length=150)
+    category_name = models.CharField(max_length=100, blank=True)
+    enrolled_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-enrolled_at', '-enrollment']
+        indexes = [
+            models.Index(fields=['student', '-enrolled_at', '-enrollment'], name='dashboard_student_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.course_title} ({self.teacher_username})"
+
+
+# Course counts per (category, teacher, creation day), maintained by courses.counters.
+# Facet summaries (courses.facets) sum these rows instead of grouping Course. A key can
+# have several rows (concurrent first inserts) or a zero count; only the sums matter.
+class CourseFacetCount(models.Model):
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, related_name='+', db_index=False) # Covered by facet_category_idx
+    teacher = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', db_index=False) # Covered by facet_teacher_idx
+    day = models.DateField()
+    course_count = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # course_count last, so facet sums are answered from the index alone
+            models.Index(fields=['category', 'teacher', 'day', 'course_count'], name='facet_category_idx'),
+            models.Index(fields=['teacher', 'category', 'day', 'course_count'], name='facet_teacher_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.category_id}/{self.teacher_id}/{self.day}: {self.course_count}"
+
+
+# Durable background job (courses.jobs). run_at is when a queued job is next due, or when
+# a running job's lease ends and another worker may take it over; it is cleared once the
+# job is done or has failed for good, so job_due_idx only holds pending work.
+class Job(models.Model):
+    QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    kind = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    key = models.CharField(max_length=200, unique=True, null=True, blank=True) # Idempotency key: one job per key
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    run_at = models.DateTimeField(null=True, blank=True, default=timezone.now)
+    claimed_by = models.CharField(max_length=32, blank=True) # Token of the worker claim holding the job
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True) # Start of the latest attempt
+    finished_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['run_at'], condition=models.Q(run_at__isnull=False), name='job_due_idx'),
+            models.Index(fields=['status', 'finished_at'], name='job_status_finished_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+
+# Append-only change feed behind /api/changes/ (courses.changes). The id is the sync
+# cursor. Course entries have no student; enrollment entries carry the student and use
+# the course id as object_id. Either feed is a range scan on change_student_id_idx, so
+# a sync reads only the entries after its cursor.
+class ChangeLogEntry(models.Model):
+    COURSE, ENROLLMENT = 'course', 'enrollment'
+    KIND_CHOICES = [(COURSE, 'Course'), (ENROLLMENT, 'Enrollment')]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted = models.BooleanField(default=False) # Tombstone: the row is gone
+    student = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='+', db_index=False) # Covered by change_student_id_idx
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['student', 'id'], name='change_student_id_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.student.username} enrolled in {self.course.title}"
\ No newline at end of file
+        return f"#{self.pk} {self.kind} {self.object_id}{' deleted' if self.deleted else ''}"
@@ -0,0 +1,63 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.mail import EmailMessage, get_connection
+from .jobs import enqueue, enqueue_many, handler
+from .models import Enrollment
+
+# Emails sent from the job queue (courses.jobs) rather than the request: registration and
+# enrollment only record a job. Each batch goes out over one mail connection; users
+# without an address, and enrollments deleted in the meantime, are skipped.
+
+EMAIL_BATCH_SIZE = 50
+
+
+def enqueue_welcome_email(user):
+    enqueue('send_welcome_email', {'user_id': user.pk}, key=f'welcome:{user.pk}')
+
+
+# Keyed by (student, course): bulk_create leaves the new enrollments without a pk, and
+# toggling an enrollment doesn't send the same email twice within JOBS_RETENTION
+def enqueue_enrollment_emails(enrollments):
+    pairs = [(enrollment.student_id, enrollment.course_id) for enrollment in enrollments]
+    enqueue_many(
+        'send_enrollment_email', [{'student_id': student_id, 'course_id': course_id} for student_id, course_id in pairs],
+        keys=[f'enrollment:{student_id}:{course_id}' for student_id, course_id in pairs],
+    )
+
+
+def send_messages(messages):
+    if messages:
+        get_connection(fail_silently=False).send_messages(messages)
+
+
+@handler('send_welcome_email', batch_size=EMAIL_BATCH_SIZE)
+def send_welcome_emails(payloads):
+    users = User.objects.filter(pk__in=[payload['user_id'] for payload in payloads]).exclude(email='')
+    send_messages([
+        EmailMessage(
+            f'Welcome, {user.username}',
+            f'Hi {user.first_name or user.username},\n\nyour account is ready. Browse the course catalog to get started.\n',
+            settings.DEFAULT_FROM_EMAIL, [user.email],
+        )
+        for user in users.only('username', 'first_name', 'email')
+    ])
+
+
+@handler('send_enrollment_email', batch_size=EMAIL_BATCH_SIZE)
+def send_enrollment_emails(payloads):
+    pairs = {(payload['student_id'], payload['course_id']) for payload in payloads}
+    enrollments = (
+        Enrollment.objects.filter(
+            student_id__in={student_id for student_id, _ in pairs}, course_id__in={course_id for _, course_id in pairs}
+        )
+        .exclude(student__email='').select_related('student', 'course')
+        .only('student__username', 'student__email', 'course__title')
+    )
+    send_messages([
+        EmailMessage(
+            f'Enrolled in {enrollment.course.title}',
+            f'Hi {enrollment.student.username},\n\nyou are now enrolled in "{enrollment.course.title}".\n',
+            settings.DEFAULT_FROM_EMAIL, [enrollment.student.email],
+        )
+        for enrollment in enrollments if (enrollment.student_id, enrollment.course_id) in pairs
+    ])
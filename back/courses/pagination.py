@@ -0,0 +1,147 @@
+import json
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination, _reverse_ordering
+
+
+# Stands in for the queryset inside CursorPagination.paginate_queryset, whose only
+# database access is list(queryset[offset:limit]): the first pass records that slice,
+# the second replays the same ordering/filter calls and returns the prefetched rows.
+class PageSlice:
+    def __init__(self, queryset, state):
+        self.queryset = queryset
+        self.state = state
+
+    @property
+    def model(self):
+        return self.queryset.model
+
+    def order_by(self, *fields):
+        return PageSlice(self.queryset.order_by(*fields), self.state)
+
+    def filter(self, *args, **kwargs):
+        return PageSlice(self.queryset.filter(*args, **kwargs), self.state)
+
+    def __getitem__(self, key):
+        if 'rows' in self.state:
+            return self.state['rows']
+        self.state['slice'] = self.queryset[key]
+        return []
+
+
+# paginate_queryset() for async views, fetching the page through the async ORM
+class AsyncCursorPaginationMixin:
+    async def apaginate_queryset(self, queryset, request, view=None):
+        state = {}
+        if self.paginate_queryset(PageSlice(queryset, state), request, view) is None:
+            return None
+        state['rows'] = [row async for row in state['slice']]
+        return self.paginate_queryset(PageSlice(queryset, state), request, view)
+
+# Keyset pagination. DRF's CursorPagination keys its cursor on ordering[0] alone and
+# skips rows that tie on it with an OFFSET capped at offset_cutoff, so a long run of equal
+# values (most courses have enrollment_count 0) never finishes paging. Here the cursor
+# holds the whole ordering tuple, which ends with a unique column: a page is the rows
+# after that tuple, served by a range scan on the index with the same column order.
+class KeysetCursorPagination(AsyncCursorPaginationMixin, CursorPagination):
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        position = None if self.cursor is None else self.cursor.position
+
+        ordering = _reverse_ordering(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.after(ordering, self.decode_position(queryset.model, position)))
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        following = self._get_position_from_instance(results[-1], self.ordering) if len(results) > self.page_size else None
+
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.next_position = position is not None, position
+            self.has_previous, self.previous_position = following is not None, following
+        else:
+            self.has_next, self.next_position = following is not None, following
+            self.has_previous, self.previous_position = position is not None, position
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def after(self, ordering, values):
+        # (a, b, c) after (x, y, z) in each column's direction: a past x, or a = x and b
+        # past y, or a = x, b = y and c past z; plus a bound on the leading column alone,
+        # where the index range scan starts
+        names = [name.lstrip('-') for name in ordering]
+        lookups = ['lt' if name.startswith('-') else 'gt' for name in ordering]
+        condition = Q()
+        for index, name in enumerate(names):
+            equal = dict(zip(names[:index], values[:index]))
+            condition |= Q(**equal, **{f'{name}__{lookups[index]}': values[index]})
+        return Q(**{f'{names[0]}__{lookups[0]}e': values[0]}) & condition
+
+    def decode_position(self, model, position):
+        try:
+            values = json.loads(position)
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise ValueError(position)
+            return [
+                model._meta.get_field(name.lstrip('-')).to_python(value)
+                for name, value in zip(self.ordering, values)
+            ]
+        except (ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _get_position_from_instance(self, instance, ordering):
+        # Rows of the values() fast path are dicts keyed by field name
+        values = []
+        for name in ordering:
+            name = name.lstrip('-')
+            if isinstance(instance, dict):
+                values.append(instance[name])
+            else:
+                values.append(getattr(instance, instance._meta.get_field(name).attname))
+        return json.dumps([str(value) for value in values], separators=(',', ':'))
+
+    # Positions are unique, so a link is the first or last row of the page, never an offset
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        position = self._get_position_from_instance(self.page[-1], self.ordering) if self.page else None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        position = self._get_position_from_instance(self.page[0], self.ordering) if self.page else None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+class CourseCursorPagination(KeysetCursorPagination):
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    # ?ordering=popular pages by the denormalized enrollment counter (course_popularity_idx)
+    orderings = {
+        'newest': ('-created_at', '-id'),
+        'popular': ('-enrollment_count', '-created_at', '-id'),
+    }
+
+    def get_ordering(self, request, queryset, view):
+        return self.orderings.get(request.query_params.get('ordering'), self.ordering)
+
+class EnrollmentCursorPagination(KeysetCursorPagination):
+    ordering = ('-enrolled_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+class DashboardCursorPagination(EnrollmentCursorPagination):
+    ordering = ('-enrolled_at', '-enrollment')  # dashboard_student_date_idx
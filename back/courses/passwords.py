@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, PBKDF2PasswordHasher, ScryptPasswordHasher
+
+# Password hashers whose cost comes from settings.PASSWORD_HASHER_PARAMS. They keep
+# Django's algorithm names, so existing hashes verify unchanged; when the first entry of
+# PASSWORD_HASHERS or its parameters change, check_password() rehashes the password on
+# the user's next successful login (hasher.must_update()).
+
+
+def params(name):
+    return getattr(settings, 'PASSWORD_HASHER_PARAMS', {}).get(name, {})
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        return params('pbkdf2').get('iterations', PBKDF2PasswordHasher.iterations)
+
+
+class TunedScryptPasswordHasher(ScryptPasswordHasher):
+    @property
+    def work_factor(self):
+        return params('scrypt').get('work_factor', ScryptPasswordHasher.work_factor)
+
+    @property
+    def block_size(self):
+        return params('scrypt').get('block_size', ScryptPasswordHasher.block_size)
+
+    @property
+    def parallelism(self):
+        return params('scrypt').get('parallelism', ScryptPasswordHasher.parallelism)
+
+    @property
+    def maxmem(self):
+        # scrypt needs 128 * r * N bytes; OpenSSL refuses anything over 32 MiB by default
+        return 2 * 128 * self.block_size * self.work_factor
+
+
+# Needs argon2-cffi
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    @property
+    def time_cost(self):
+        return params('argon2').get('time_cost', Argon2PasswordHasher.time_cost)
+
+    @property
+    def memory_cost(self):
+        return params('argon2').get('memory_cost', Argon2PasswordHasher.memory_cost)
+
+    @property
+    def parallelism(self):
+        return params('argon2').get('parallelism', Argon2PasswordHasher.parallelism)
@@ -29,8 +29,7 @@ class IsTeacherOwnerOrReadOnly(permissions.BasePermission):
         return (
             request.user and
             request.user.is_authenticated and
-            hasattr(obj, 'teacher') and
-            obj.teacher == request.user and
+            getattr(obj, 'teacher_id', None) == request.user.id and
             hasattr(request.user, 'profile') and
             request.user.profile.is_teacher
         )
@@ -44,8 +43,7 @@ class IsStudentOwnerOrReadOnly(permissions.BasePermission):
         return (
             request.user and
             request.user.is_authenticated and
-            hasattr(obj, 'student') and
-            obj.student == request.user and
+            getattr(obj, 'student_id', None) == request.user.id and
             hasattr(request.user, 'profile') and
             request.user.profile.is_student
         )
\ No newline at end of file
@@ -0,0 +1,295 @@
+import cProfile
+import logging
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from rest_framework import serializers
+
+# Opt-in request profiling (API_PROFILING=1 adds ProfilingMiddleware to MIDDLEWARE).
+# Every request records wall time, SQL query count and time, serialization and render
+# time and response size per view; the totals go out as a Server-Timing header and into
+# per-process histograms served in Prometheus text format by /api/metrics/.
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar('request_profile', default=None)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+# name, help, buckets, RequestProfile attribute
+HISTOGRAMS = (
+    ('api_request_duration_seconds', 'Wall time per request', DURATION_BUCKETS, 'total'),
+    ('api_db_queries', 'SQL queries per request', QUERY_BUCKETS, 'query_count'),
+    ('api_db_duration_seconds', 'Time spent in SQL per request', DURATION_BUCKETS, 'sql_time'),
+    ('api_serialize_duration_seconds', 'Serializer time per request', DURATION_BUCKETS, 'serialize'),
+    ('api_render_duration_seconds', 'Renderer time per request', DURATION_BUCKETS, 'render'),
+    ('api_response_size_bytes', 'Response body size', SIZE_BUCKETS, 'size'),
+)
+
+NUMBER = re.compile(r"\b\d+\b|'(?:[^']|'')*'")
+
+
+class RequestProfile:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.total = 0
+        self.queries = []  # (sql, params, seconds)
+        self.timings = defaultdict(float)
+        self.size = 0
+
+    @property
+    def query_count(self):
+        return len(self.queries)
+
+    @property
+    def sql_time(self):
+        return sum(duration for _, _, duration in self.queries)
+
+    @property
+    def serialize(self):
+        return self.timings['serialize']
+
+    @property
+    def render(self):
+        return self.timings['render']
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, params, time.perf_counter() - start))
+
+    def duplicates(self):
+        # Same statement with the same parameters, run more than once
+        counts = Counter((sql, repr(params)) for sql, params, _ in self.queries)
+        return sum(count - 1 for count in counts.values())
+
+    def similar(self):
+        # Same statement shape with different parameters: the usual N+1 signature.
+        # Returns (count, sql) for the most repeated shape.
+        counts = Counter(NUMBER.sub('?', sql) for sql, _, _ in self.queries)
+        if not counts:
+            return 0, ''
+        sql, count = counts.most_common(1)[0]
+        return count, sql
+
+    def server_timing(self):
+        return ', '.join([
+            f'total;dur={self.total * 1000:.1f}',
+            f'db;dur={self.sql_time * 1000:.1f};desc="{self.query_count} queries, {self.duplicates()} duplicate"',
+            f'serialize;dur={self.serialize * 1000:.1f}',
+            f'render;dur={self.render * 1000:.1f}',
+        ])
+
+
+# Database wrappers are thread-critical: under ASGI the ORM runs on sync_to_async's
+# thread, with its own connection, so a `with connection.execute_wrapper()` block around
+# the request would miss its queries. Each connection instead carries this permanent
+# wrapper, which records into the profile of the request it runs for (if any).
+def record_query(execute, sql, params, many, context):
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    return profile.execute_wrapper(execute, sql, params, many, context)
+
+
+def instrument(connection):
+    # First in the list: `with connection.execute_wrapper()` pops the last one on exit
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+# Accumulates the time spent in the block into the current request's profile
+@contextmanager
+def timed(name):
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.timings[name] += time.perf_counter() - start
+
+
+class TimedSerializerMixin:
+    @property
+    def data(self):
+        with timed('serialize'):
+            return super().data
+
+
+# Meta.list_serializer_class for serializers whose list output should be timed
+class TimedListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    pass
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.histograms = {}  # (metric, view) -> Histogram
+        self.requests = Counter()  # (view, method, status) -> count
+        self.duplicates = Counter()  # view -> duplicate queries
+        self.similar = Counter()  # view -> requests with repeated query shapes
+
+    def observe(self, view, method, status, profile, similar):
+        with self.lock:
+            for name, _, buckets, attribute in HISTOGRAMS:
+                key = (name, view)
+                if key not in self.histograms:
+                    self.histograms[key] = Histogram(buckets)
+                self.histograms[key].observe(getattr(profile, attribute))
+            self.requests[(view, method, status)] += 1
+            self.duplicates[view] += profile.duplicates()
+            self.similar[view] += similar
+
+    def render(self):
+        lines = []
+        with self.lock:
+            lines += [
+                '# HELP api_requests_total Requests by view, method and status',
+                '# TYPE api_requests_total counter',
+            ]
+            for (view, method, status), count in sorted(self.requests.items()):
+                lines.append(f'api_requests_total{{view="{view}",method="{method}",status="{status}"}} {count}')
+            lines += [
+                '# HELP api_db_duplicate_queries_total Queries repeating an earlier query of the same request',
+                '# TYPE api_db_duplicate_queries_total counter',
+            ]
+            for view, count in sorted(self.duplicates.items()):
+                lines.append(f'api_db_duplicate_queries_total{{view="{view}"}} {count}')
+            lines += [
+                '# HELP api_db_repeated_query_requests_total Requests over API_PROFILING_REPEATED_QUERIES runs of one query shape',
+                '# TYPE api_db_repeated_query_requests_total counter',
+            ]
+            for view, count in sorted(self.similar.items()):
+                lines.append(f'api_db_repeated_query_requests_total{{view="{view}"}} {count}')
+            for name, help_text, _, _ in HISTOGRAMS:
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+                for (metric, view), histogram in sorted(self.histograms.items()):
+                    if metric != name:
+                        continue
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        lines.append(f'{name}_bucket{{view="{view}",le="{bound}"}} {count}')
+                    lines.append(f'{name}_bucket{{view="{view}",le="+Inf"}} {histogram.count}')
+                    lines.append(f'{name}_sum{{view="{view}"}} {round(histogram.sum, 6)}')
+                    lines.append(f'{name}_count{{view="{view}"}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+# Per process: with several workers, scrape each one (or aggregate in Prometheus)
+registry = Registry()
+
+
+class ProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        profile, profiler, token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, profile, profiler)
+
+    async def __acall__(self, request):
+        # cProfile only sees the event loop thread here, not the ORM's worker thread
+        profile, profiler, token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, profile, profiler)
+
+    def start(self, request):
+        # Connections of other threads are instrumented by courses.signals.instrument_connection
+        for alias in connections:
+            instrument(connections[alias])
+        profile = RequestProfile()
+        profiler = None
+        if random.random() < getattr(settings, 'API_PROFILING_SAMPLE_RATE', 0):
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:  # another profiler is already active on this thread
+                profiler = None
+        return profile, profiler, _current.set(profile)
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns; time the renderer too
+        profile = _current.get()
+        if profile is not None:
+            start = time.perf_counter()
+
+            def rendered(response):
+                profile.timings['render'] += time.perf_counter() - start
+            response.add_post_render_callback(rendered)
+        return response
+
+    def finish(self, request, response, profile, profiler):
+        profile.total = time.perf_counter() - profile.start
+        if profiler is not None:
+            profiler.disable()
+        if not response.streaming:
+            profile.size = len(response.content)
+        match = request.resolver_match
+        view = (match.view_name or match._func_path) if match else 'unmatched'
+
+        similar, sql = profile.similar()
+        threshold = getattr(settings, 'API_PROFILING_REPEATED_QUERIES', 5)
+        repeated = similar >= threshold
+        if repeated:
+            logger.warning('%s %s ran %d queries shaped like: %s', request.method, request.path, similar, sql)
+        registry.observe(view, request.method, response.status_code, profile, int(repeated))
+        response['Server-Timing'] = profile.server_timing()
+
+        slow_ms = getattr(settings, 'API_PROFILING_SLOW_MS', 500)
+        if profiler is not None and profile.total * 1000 >= slow_ms:
+            self.dump(profiler, view, profile)
+        return response
+
+    def dump(self, profiler, view, profile):
+        directory = getattr(settings, 'API_PROFILING_DIR', None) or os.path.join(settings.BASE_DIR, 'profiles')
+        os.makedirs(directory, exist_ok=True)
+        name = re.sub(r'[^\w.-]', '_', view)
+        filename = f"{time.strftime('%Y%m%d-%H%M%S')}-{name}-{profile.total * 1000:.0f}ms.prof"
+        profiler.dump_stats(os.path.join(directory, filename))
+        logger.info('Wrote %s', filename)
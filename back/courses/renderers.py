@@ -0,0 +1,27 @@
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # optional speedup, falls back to the stdlib encoder
+    orjson = None
+
+
+# JSONRenderer producing the same bytes through orjson for the default compact, unicode
+# output. Dates and other non-JSON types are handed to DRF's encoder so they keep DRF's
+# formatting; indented output (browsable API, ?indent) and anything orjson rejects use
+# the stock renderer. Installed for every action of the category, course, enrollment,
+# dashboard and change-feed views (and the async list views): none of their serializers
+# has a float field, so the bytes match JSONRenderer's. A float added later would still
+# be valid JSON with the same value; only the spelling of some can differ (orjson writes
+# 1e16 where json.dumps writes 1e+16).
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or self.ensure_ascii or not self.compact or
+                self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+        except (TypeError, orjson.JSONEncodeError):
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same \u2028/\u2029 escaping as JSONRenderer
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
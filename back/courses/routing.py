@@ -0,0 +1,157 @@
+import random
+import time
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+# Primary/replica routing (DATABASE_REPLICAS, set from DJANGO_DB_REPLICAS). Reads of
+# GET/HEAD/OPTIONS requests go to one replica picked per request; writes, every query of an unsafe
+# request and of session-authenticated requests (admin, browsable API), and everything
+# outside a request (commands, job workers) use the primary. Once a request writes, its
+# remaining reads use the primary too, and the user is pinned to the primary for
+# DATABASE_PIN_SECONDS, so replication lag never hides their own writes from them.
+
+_state = ContextVar('db_routing', default=None)
+
+
+class RequestState:
+    def __init__(self, primary):
+        self.primary = primary  # reads go to the primary for the rest of the request
+        self.wrote = False
+        self.user_id = None  # from the bearer token
+        self.replica = None  # every replica read of the request, so they all see the same lag
+
+
+def pin_seconds():
+    return getattr(settings, 'DATABASE_PIN_SECONDS', 5)
+
+
+# Shared with the response cache; a per-process cache only pins within one worker
+def pin_cache():
+    return caches[getattr(settings, 'API_CACHE_ALIAS', 'default')]
+
+
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache', 'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+# Registered by CoursesConfig.ready(). With several server processes (gunicorn.conf.py)
+# a pin set by one worker must be seen by the others.
+def check_pin_cache(app_configs, **kwargs):
+    if not getattr(settings, 'DATABASE_REPLICAS', ()):
+        return []
+    alias = getattr(settings, 'API_CACHE_ALIAS', 'default')
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [checks.Error(
+        f"DATABASE_REPLICAS needs a cache shared by all server processes to pin writers to the primary; "
+        f"CACHES['{alias}'] uses {backend}.",
+        hint='Point DJANGO_CACHE_BACKEND and DJANGO_CACHE_LOCATION at Redis, Memcached, the database or a file cache.',
+        id='courses.E001',
+    )]
+
+
+def pin_key(user_id):
+    return f'db:pin:{user_id}'
+
+
+def pin_user(user_id):
+    pin_cache().set(pin_key(user_id), True, pin_seconds())
+
+
+def use_primary():
+    state = _state.get()
+    if state is not None:
+        state.primary = True
+
+
+def read_primary_since(changed_at):
+    # Data changed less than DATABASE_PIN_SECONDS ago may not have reached the replicas yet
+    if time.time() - changed_at < pin_seconds():
+        use_primary()
+
+
+# From the bearer token, before authentication has loaded request.user
+def token_user_id(request):
+    header = request.META.get('HTTP_AUTHORIZATION', '').split()
+    if len(header) != 2 or header[0] not in api_settings.AUTH_HEADER_TYPES:
+        return None
+    try:
+        return AccessToken(header[1]).get(api_settings.USER_ID_CLAIM)
+    except TokenError:
+        return None
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        replicas = getattr(settings, 'DATABASE_REPLICAS', ())
+        if state is None or state.primary or not replicas:
+            return None
+        if state.replica is None:
+            state.replica = random.choice(replicas)
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.primary = state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # every alias holds the same data
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get the primary's schema through replication
+        return db == 'default'
+
+
+class DatabaseRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state, token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        self.finish(request, state)
+        return response
+
+    async def __acall__(self, request):
+        state, token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        self.finish(request, state)
+        return response
+
+    def start(self, request):
+        state = RequestState(request.method not in SAFE_METHODS or settings.SESSION_COOKIE_NAME in request.COOKIES)
+        state.user_id = token_user_id(request)
+        if not state.primary and state.user_id is not None:
+            state.primary = pin_cache().get(pin_key(state.user_id)) is not None
+        return state, _state.set(state)
+
+    def finish(self, request, state):
+        # Session-authenticated requests always read from the primary; new accounts are
+        # pinned by courses.signals
+        if state.wrote and state.user_id is not None:
+            pin_user(state.user_id)
@@ -0,0 +1,156 @@
+import re
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.models import Case, IntegerField, Q, When
+
+FTS_TABLE = 'courses_course_fts'
+
+# Columns of the FTS row: title, description, category name, teacher name
+INDEX_SELECT_SQL = (
+    "SELECT c.id, c.title, c.description, COALESCE(cat.name, ''), "
+    "TRIM(u.username || ' ' || u.first_name || ' ' || u.last_name) "
+    "FROM courses_course c "
+    "LEFT JOIN courses_category cat ON cat.id = c.category_id "
+    "INNER JOIN auth_user u ON u.id = c.teacher_id"
+)
+
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+
+
+def tokenize(text):
+    return re.findall(r'\w+', (text or '').lower())
+
+
+def order_by_ids(queryset, ids):
+    if not ids:
+        return queryset.none()
+    position = Case(*[When(pk=pk, then=pos) for pos, pk in enumerate(ids)], output_field=IntegerField())
+    return queryset.filter(pk__in=ids).order_by(position)
+
+
+# Fallback used on backends without a full-text index (and as the benchmark baseline)
+class IcontainsSearchBackend:
+    def search(self, queryset, text, limit=DEFAULT_SEARCH_LIMIT):
+        tokens = tokenize(text)
+        if not tokens:
+            return queryset.none()
+        condition = Q()
+        for token in tokens:
+            condition &= (
+                Q(title__icontains=token) | Q(description__icontains=token) |
+                Q(category__name__icontains=token) | Q(teacher__username__icontains=token)
+            )
+        return queryset.filter(condition)[:limit]
+
+    def index_courses(self, course_ids):
+        pass
+
+    def remove_courses(self, course_ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+
+# SQLite FTS5 index kept in sync by courses.signals; rowid is the course id
+class SqliteFTSSearchBackend(IcontainsSearchBackend):
+    # bm25 column weights: title, description, category, teacher
+    weights = (10.0, 1.0, 4.0, 4.0)
+
+    def match_expression(self, tokens):
+        # Every token is a quoted prefix query, so "pyth djan" matches "Python for Django"
+        return ' AND '.join(f'"{token}"*' for token in tokens)
+
+    def search_ids(self, text, limit=DEFAULT_SEARCH_LIMIT, using=DEFAULT_DB_ALIAS, within=None):
+        # within: a filtered Course queryset (the catalog filters), applied before the LIMIT
+        # so higher-ranked courses outside it can't crowd its matches out of the page
+        tokens = tokenize(text)
+        if not tokens:
+            return []
+        weights = ', '.join(str(weight) for weight in self.weights)
+        # Every match is ranked (a top-N sort, so memory stays at `limit` rows); broad
+        # terms cost time proportional to their match count. Ties go to newer courses.
+        sql = f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s"
+        params = [self.match_expression(tokens)]
+        if within is not None:
+            subquery, subquery_params = within.order_by().values('pk').query.get_compiler(using).as_sql()
+            # +rowid: a plain rowid constraint makes FTS5 run the MATCH once per listed id
+            # (seconds for a broad filter); as an expression the MATCH scan drives instead
+            sql += f" AND +rowid IN ({subquery})"
+            params.extend(subquery_params)
+        sql += f" ORDER BY bm25({FTS_TABLE}, {weights}), rowid DESC LIMIT %s"
+        with connections[using].cursor() as cursor:
+            cursor.execute(sql, [*params, limit])
+            return [row[0] for row in cursor.fetchall()]
+
+    def search(self, queryset, text, limit=DEFAULT_SEARCH_LIMIT):
+        within = queryset if queryset.query.has_filters() else None
+        return order_by_ids(queryset, self.search_ids(text, limit, using=queryset.db, within=within))
+
+    def index_courses(self, course_ids):
+        course_ids = list(course_ids)
+        if not course_ids:
+            return
+        self.remove_courses(course_ids)
+        placeholders = ', '.join(['%s'] * len(course_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}(rowid, title, description, category, teacher) "
+                f"{INDEX_SELECT_SQL} WHERE c.id IN ({placeholders})",
+                course_ids
+            )
+
+    def remove_courses(self, course_ids):
+        course_ids = list(course_ids)
+        if not course_ids:
+            return
+        placeholders = ', '.join(['%s'] * len(course_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", course_ids)
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            cursor.execute(f"INSERT INTO {FTS_TABLE}(rowid, title, description, category, teacher) {INDEX_SELECT_SQL}")
+
+
+# Optional Postgres backend ranking with SearchVector/SearchQuery at query time
+class PostgresSearchBackend(IcontainsSearchBackend):
+    def search(self, queryset, text, limit=DEFAULT_SEARCH_LIMIT):
+        from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+        tokens = tokenize(text)
+        if not tokens:
+            return queryset.none()
+        vector = (
+            SearchVector('title', weight='A', config='simple') +
+            SearchVector('category__name', weight='B', config='simple') +
+            SearchVector('teacher__username', 'teacher__first_name', 'teacher__last_name', weight='B', config='simple') +
+            SearchVector('description', weight='C', config='simple')
+        )
+        query = SearchQuery(' & '.join(f'{token}:*' for token in tokens), search_type='raw', config='simple')
+        return (
+            queryset.annotate(document=vector, rank=SearchRank(vector, query))
+            .filter(document=query)
+            .order_by('-rank', '-created_at')[:limit]
+        )
+
+
+def get_search_backend():
+    if connection.vendor == 'sqlite':
+        return SqliteFTSSearchBackend()
+    if connection.vendor == 'postgresql':
+        return PostgresSearchBackend()
+    return IcontainsSearchBackend()
+
+
+def index_courses(course_ids):
+    get_search_backend().index_courses(course_ids)
+
+
+def remove_courses(course_ids):
+    get_search_backend().remove_courses(course_ids)
+
+
+def rebuild_index():
+    get_search_backend().rebuild()
@@ -1,17 +1,47 @@
 from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.functions import Substr
 from rest_framework import serializers
-from .models import Profile, Category, Course, Enrollment
+from .models import Profile, Category, Course, DashboardEntry, Enrollment
+from .profiling import TimedListSerializer, TimedSerializerMixin
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from rest_framework_simplejwt.tokens import Token
 
+# "?fields=id,title,teacher.username" -> {'id': {}, 'title': {}, 'teacher': {'username': {}}}
+def parse_fields(value):
+    tree = {}
+    for path in (value or '').split(','):
+        node = tree
+        for name in filter(None, path.strip().split('.')):
+            node = node.setdefault(name, {})
+    return tree
+
+
+# Sparse fieldsets: drops readable fields missing from `fields` (nested serializers
+# are narrowed by their sub-tree; an empty sub-tree keeps the whole nested object).
+class SparseFieldsMixin:
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields:
+            self.restrict_fields(fields)
+
+    def restrict_fields(self, fields):
+        for name, field in list(self.fields.items()):
+            if field.write_only:
+                continue
+            if name not in fields:
+                self.fields.pop(name)
+            elif fields[name] and isinstance(field, SparseFieldsMixin):
+                field.restrict_fields(fields[name])
+
 # BE-4: ModelSerializer (1/2+)
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Profile
         fields = ('is_student', 'is_teacher')
 
 # BE-4: ModelSerializer (2/2+)
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     profile = ProfileSerializer(read_only=True)
     class Meta:
         model = User
@@ -24,6 +54,7 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
         token = super().get_token(user)
         # BE-6: Adding custom user data to JWT payload
         token['username'] = user.username
+        token['is_staff'] = user.is_staff
         try:
             profile = user.profile
             token['is_student'] = profile.is_student
@@ -54,25 +85,30 @@ class RegisterSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         is_student = validated_data.pop('is_student', True)
         is_teacher = validated_data.pop('is_teacher', False)
+        password = validated_data.pop('password')
         validated_data.pop('password2')
-        user = User.objects.create_user(**validated_data)
-        try:
-            profile = user.profile
-            profile.is_student = is_student
-            profile.is_teacher = is_teacher
-            profile.save()
-        except Profile.DoesNotExist:
-            Profile.objects.create(user=user, is_student=is_student, is_teacher=is_teacher)
+        user = User(**validated_data)
+        user.username = User.normalize_username(user.username)
+        user.email = User.objects.normalize_email(user.email)
+        user.set_password(password)  # hashed before the transaction takes the write lock
+        # The profile is attached before the user is saved, so the post_save signal doesn't
+        # create a default one to be updated: one INSERT per table
+        user.profile = Profile(is_student=is_student, is_teacher=is_teacher)
+        with transaction.atomic():
+            user.save()
+            user.profile.save()
         return user
 
 # BE-4: ModelSerializer (3/2+)
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
-        fields = ('id', 'name', 'slug')
+        list_serializer_class = TimedListSerializer
+        fields = ('id', 'name', 'slug', 'course_count')
+        read_only_fields = ('course_count',)
 
 # BE-4: ModelSerializer (4/2+)
-class CourseSerializer(serializers.ModelSerializer):
+class CourseSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     teacher = UserSerializer(read_only=True)
     category = CategorySerializer(read_only=True)
     teacher_id = serializers.PrimaryKeyRelatedField(
@@ -84,24 +120,81 @@ class CourseSerializer(serializers.ModelSerializer):
         source='category', write_only=True, allow_null=True, required=False
     )
     is_enrolled = serializers.SerializerMethodField()
+    summary = serializers.SerializerMethodField()
+
+    # Columns each readable field needs, used to trim the SELECT for sparse fieldsets
+    FIELD_COLUMNS = {
+        'id': ('id',), 'title': ('title',), 'slug': ('slug',), 'description': ('description',),
+        'created_at': ('created_at',), 'updated_at': ('updated_at',), 'enrollment_count': ('enrollment_count',),
+        'category': ('category__id', 'category__name', 'category__slug', 'category__course_count'),
+        'teacher': (
+            'teacher__id', 'teacher__username', 'teacher__email', 'teacher__first_name', 'teacher__last_name',
+            'teacher__profile__is_student', 'teacher__profile__is_teacher'
+        ),
+    }
+    SUMMARY_LENGTH = 200
 
     class Meta:
         model = Course
+        list_serializer_class = TimedListSerializer
         fields = (
-            'id', 'title', 'slug', 'description', 'category', 'teacher',
+            'id', 'title', 'slug', 'description', 'summary', 'category', 'teacher',
             'created_at', 'updated_at', 'category_id', 'teacher_id',
-            'is_enrolled'
+            'is_enrolled', 'enrollment_count'
         )
-        read_only_fields = ('slug', 'created_at', 'updated_at')
+        read_only_fields = ('slug', 'created_at', 'updated_at', 'enrollment_count')
+
+    @classmethod
+    def optimize_queryset(cls, queryset, fields):
+        # Select only the columns (and joins) the requested fields render; the cursor
+        # ordering columns are always kept so pagination doesn't trigger deferred loads.
+        columns = {'id', 'created_at', 'enrollment_count', 'category', 'teacher'}
+        related = []
+        for name, subfields in fields.items():
+            if name == 'summary':
+                queryset = queryset.annotate(summary_text=Substr('description', 1, cls.SUMMARY_LENGTH))
+            for column in cls.FIELD_COLUMNS.get(name, ()):
+                relation, _, rest = column.partition('__')
+                if rest and subfields and rest.split('__')[0] not in subfields and rest != 'id':
+                    continue
+                columns.add(column)
+                if rest and relation not in related:
+                    related.append(relation)
+                if rest.startswith('profile__') and 'teacher__profile' not in related:
+                    related.append('teacher__profile')
+        queryset = queryset.select_related(None)
+        # select_related() without arguments would follow every foreign key
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*columns)
+
+    def get_summary(self, obj):
+        summary = getattr(obj, 'summary_text', None)
+        if summary is None:
+            summary = obj.description[:self.SUMMARY_LENGTH]
+        return summary
 
     def get_is_enrolled(self, obj):
-        user = self.context.get('request').user
-        if user and user.is_authenticated:
-            return Enrollment.objects.filter(course=obj, student=user).exists()
-        return False
+        # Views annotate `enrolled` with an Exists() subquery; otherwise fall back
+        # to a single per-request lookup of the user's enrolled course ids.
+        enrolled = getattr(obj, 'enrolled', None)
+        if enrolled is not None:
+            return enrolled
+        return obj.pk in self.get_enrolled_course_ids()
+
+    def get_enrolled_course_ids(self):
+        if 'enrolled_course_ids' not in self.context:
+            request = self.context.get('request')
+            user = getattr(request, 'user', None)
+            if user and user.is_authenticated:
+                ids = set(Enrollment.objects.filter(student_id=user.id).values_list('course_id', flat=True))
+            else:
+                ids = set()
+            self.context['enrolled_course_ids'] = ids
+        return self.context['enrolled_course_ids']
 
 # BE-4: ModelSerializer (5/2+)
-class EnrollmentSerializer(serializers.ModelSerializer):
+class EnrollmentSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     student = UserSerializer(read_only=True)
     course = CourseSerializer(read_only=True)
     course_id = serializers.PrimaryKeyRelatedField(
@@ -112,6 +205,7 @@ class EnrollmentSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Enrollment
+        list_serializer_class = TimedListSerializer
         fields = ('id', 'student', 'course', 'enrolled_at', 'course_id')
         read_only_fields = ('enrolled_at', 'student', 'course')
 
@@ -125,10 +219,42 @@ class EnrollmentSerializer(serializers.ModelSerializer):
              raise serializers.ValidationError({"course_id": "Valid Course ID is required."})
         if not hasattr(student, 'profile') or not student.profile.is_student:
              raise serializers.ValidationError({"detail": "User is not a student."})
-        if Enrollment.objects.filter(student=student, course=course).exists():
+        if Enrollment.objects.filter(student_id=student.id, course=course).exists():
              raise serializers.ValidationError({"non_field_errors": ["Already enrolled in this course."]})
         return attrs
 
+# Flat "my courses" row from the DashboardEntry read model; id is the enrollment's
+class DashboardEntrySerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='enrollment_id', read_only=True)
+    course_id = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = DashboardEntry
+        list_serializer_class = TimedListSerializer
+        fields = (
+            'id', 'course_id', 'course_title', 'course_slug', 'course_summary',
+            'teacher_username', 'category_name', 'enrolled_at'
+        )
+
+# Batch enroll/unenroll request: students act for themselves, staff and teachers may pass student_ids
+class BulkEnrollmentSerializer(serializers.Serializer):
+    MAX_ITEMS = 500
+    MAX_PAIRS = 5000  # students x courses: one result and at most one row each, in one transaction
+
+    action = serializers.ChoiceField(choices=('enroll', 'unenroll'), default='enroll')
+    course_ids = serializers.ListField(child=serializers.IntegerField(min_value=1), min_length=1, max_length=MAX_ITEMS)
+    student_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), min_length=1, max_length=MAX_ITEMS, required=False
+    )
+
+    def validate(self, attrs):
+        attrs['course_ids'] = list(dict.fromkeys(attrs['course_ids']))
+        if 'student_ids' in attrs:
+            attrs['student_ids'] = list(dict.fromkeys(attrs['student_ids']))
+        if len(attrs['course_ids']) * len(attrs.get('student_ids', [None])) > self.MAX_PAIRS:
+            raise serializers.ValidationError(f'At most {self.MAX_PAIRS} student and course pairs per request.')
+        return attrs
+
 # BE-4: Base Serializer (2/2+)
 class SimpleMessageSerializer(serializers.Serializer):
     message = serializers.CharField(max_length=200)
@@ -1,13 +1,225 @@
-from django.db.models.signals import post_save
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_init, post_save, post_delete, pre_delete
 from django.contrib.auth.models import User
 from django.dispatch import receiver
-from .models import Profile
+from .models import Profile, Category, Course, DashboardEntry, Enrollment
+from .counters import adjust_course_count, adjust_enrollment_count, adjust_facet_count, course_day
+from . import changes, dashboard, notifications, profiling, routing, search
+from .authentication import forget_full_user
+from .cache import bump_object_versions, bump_version, RESOURCE_CATEGORIES, RESOURCE_COURSES, RESOURCE_ENROLLMENT_COUNTS
 
 @receiver(post_save, sender=User)
 def create_or_update_user_profile(sender, instance, created, **kwargs):
+    # Permissions read the profile on the next request, so it is created here, not in a job
+    if created and not hasattr(instance, 'profile'):
+        Profile.objects.create(user=instance)
+
+# The account's first requests (login, profile) must find it even on a lagging replica
+@receiver(post_save, sender=User)
+def pin_new_user_to_primary(sender, instance, created, **kwargs):
+    if created and getattr(settings, 'DATABASE_REPLICAS', ()):
+        routing.pin_user(instance.pk)
+
+# Follow-up work goes to the job queue (courses.jobs), committed with the row that caused it
+@receiver(post_save, sender=User)
+def queue_welcome_email(sender, instance, created, **kwargs):
+    if created and instance.email:
+        notifications.enqueue_welcome_email(instance)
+
+@receiver(post_save, sender=Enrollment)
+def queue_enrollment_email(sender, instance, created, **kwargs):
     if created:
-        if not hasattr(instance, 'profile'):
-             Profile.objects.create(user=instance)
-             print(f"Profile created by signal for user {instance.username}")
-        else:
-             print(f"Profile already exists for user {instance.username} (signal skipped creation)")
+        notifications.enqueue_enrollment_emails([instance])
+
+# Keep the course search index in sync with the rows it is built from
+@receiver(post_save, sender=Course)
+def index_course(sender, instance, **kwargs):
+    search.index_courses([instance.pk])
+
+@receiver(post_delete, sender=Course)
+def unindex_course(sender, instance, **kwargs):
+    search.remove_courses([instance.pk])
+
+@receiver(post_save, sender=Category)
+def reindex_category_courses(sender, instance, created, **kwargs):
+    if not created:
+        search.index_courses(Course.objects.filter(category=instance).values_list('pk', flat=True))
+
+@receiver(pre_delete, sender=Category)
+def remember_category_courses(sender, instance, **kwargs):
+    # Courses are SET_NULL before post_delete fires, so collect their ids up front
+    instance._course_ids = list(Course.objects.filter(category=instance).values_list('pk', flat=True))
+
+@receiver(post_delete, sender=Category)
+def reindex_uncategorized_courses(sender, instance, **kwargs):
+    search.index_courses(getattr(instance, '_course_ids', []))
+
+@receiver(post_save, sender=User)
+def reindex_teacher_courses(sender, instance, created, update_fields=None, **kwargs):
+    # Rehashes on login only save the password
+    if not created and (update_fields is None or 'username' in update_fields):
+        search.index_courses(Course.objects.filter(teacher=instance).values_list('pk', flat=True))
+
+# Invalidate cached anonymous reads: courses embed their category and their teacher's
+# user fields and profile (UserSerializer)
+@receiver([post_save, post_delete], sender=Course)
+def invalidate_course_cache(sender, **kwargs):
+    bump_version(RESOURCE_COURSES)
+
+# Fields of User and Profile copied into the course payload. Registrations, logins and
+# password rehashes change none of them, and only teachers' changes reach the payload.
+EMBEDDED_FIELDS = {
+    User: ('username', 'email', 'first_name', 'last_name'),
+    Profile: ('is_student', 'is_teacher'),
+}
+
+def embedded_values(instance):
+    return tuple(instance.__dict__.get(name) for name in EMBEDDED_FIELDS[type(instance)])
+
+@receiver(post_init, sender=User)
+@receiver(post_init, sender=Profile)
+def remember_embedded_fields(sender, instance, **kwargs):
+    instance._loaded_embedded = embedded_values(instance)
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Profile)
+def invalidate_teacher_course_cache(sender, instance, created, **kwargs):
+    values = embedded_values(instance)
+    changed = not created and values != getattr(instance, '_loaded_embedded', None)
+    instance._loaded_embedded = values
+    teacher_id = instance.pk if sender is User else instance.user_id
+    if changed and Course.objects.filter(teacher_id=teacher_id).exists():
+        bump_version(RESOURCE_COURSES)
+
+# A deleted teacher's courses are deleted with them (and bump the version themselves)
+@receiver(post_delete, sender=Profile)
+def invalidate_teacher_profile_course_cache(sender, instance, **kwargs):
+    if Course.objects.filter(teacher_id=instance.user_id).exists():
+        bump_version(RESOURCE_COURSES)
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_category_cache(sender, **kwargs):
+    bump_version(RESOURCE_CATEGORIES, RESOURCE_COURSES)
+
+# Denormalized counters: Course.enrollment_count and Category.course_count. A count
+# change invalidates only the cached responses showing that course's count (or
+# depending on every count), not the whole course cache.
+@receiver(post_save, sender=Enrollment)
+def count_enrollment(sender, instance, created, **kwargs):
+    if created:
+        adjust_enrollment_count(instance.course_id, 1)
+        bump_object_versions(RESOURCE_ENROLLMENT_COUNTS, [instance.course_id])
+
+@receiver(post_delete, sender=Enrollment)
+def uncount_enrollment(sender, instance, **kwargs):
+    adjust_enrollment_count(instance.course_id, -1)
+    bump_object_versions(RESOURCE_ENROLLMENT_COUNTS, [instance.course_id])
+
+@receiver(post_save, sender=Course)
+def count_course(sender, instance, created, **kwargs):
+    previous = None if created else getattr(instance, '_loaded_category_id', instance.category_id)
+    previous_teacher = None if created else getattr(instance, '_loaded_teacher_id', instance.teacher_id)
+    if previous != instance.category_id:
+        adjust_course_count(previous, -1)
+        adjust_course_count(instance.category_id, 1)
+        bump_version(RESOURCE_CATEGORIES)
+    # Facet counts (CourseFacetCount) follow both the category and the teacher
+    if created or (previous, previous_teacher) != (instance.category_id, instance.teacher_id):
+        if not created:
+            adjust_facet_count(previous, previous_teacher, course_day(instance), -1)
+        adjust_facet_count(instance.category_id, instance.teacher_id, course_day(instance), 1)
+    instance._loaded_category_id = instance.category_id
+    instance._loaded_teacher_id = instance.teacher_id
+
+@receiver(post_delete, sender=Course)
+def uncount_course(sender, instance, **kwargs):
+    adjust_course_count(instance.category_id, -1)
+    adjust_facet_count(instance.category_id, instance.teacher_id, course_day(instance), -1)
+    bump_version(RESOURCE_CATEGORIES)
+
+# "My courses" read model (courses.dashboard); entries are deleted with their enrollment
+@receiver(post_save, sender=Enrollment)
+def add_dashboard_entry(sender, instance, created, **kwargs):
+    if created:
+        dashboard.add_entries(Enrollment.objects.filter(pk=instance.pk))
+
+@receiver(post_save, sender=Course)
+def refresh_course_dashboard_entries(sender, instance, created, **kwargs):
+    # A course has one entry per enrollment: rewrite them only when a copied column changed
+    values = instance.dashboard_fields()
+    if not created and values != getattr(instance, '_loaded_dashboard_fields', None):
+        dashboard.refresh_courses([instance.pk])
+    instance._loaded_dashboard_fields = values
+
+@receiver(post_save, sender=User)
+def refresh_teacher_dashboard_entries(sender, instance, created, update_fields=None, **kwargs):
+    # Logins only save last_login
+    if not created and (update_fields is None or 'username' in update_fields):
+        dashboard.refresh_entries(DashboardEntry.objects.filter(course__teacher=instance))
+
+@receiver(post_save, sender=Category)
+def refresh_category_dashboard_entries(sender, instance, created, **kwargs):
+    if not created:
+        dashboard.refresh_entries(DashboardEntry.objects.filter(course__category=instance))
+
+@receiver(post_delete, sender=Category)
+def refresh_uncategorized_dashboard_entries(sender, instance, **kwargs):
+    dashboard.refresh_courses(getattr(instance, '_course_ids', []))
+
+# Change log for delta sync (courses.changes): courses, including the category name and
+# teacher username they embed, and each student's enrollments
+@receiver(post_save, sender=Course)
+def log_course_change(sender, instance, **kwargs):
+    changes.record_courses([instance.pk])
+
+@receiver(post_delete, sender=Course)
+def log_course_deletion(sender, instance, **kwargs):
+    changes.record_courses([instance.pk], deleted=True)
+
+@receiver(post_save, sender=Category)
+def log_category_courses_change(sender, instance, created, **kwargs):
+    if not created:
+        changes.record_courses(Course.objects.filter(category=instance).values_list('pk', flat=True))
+
+@receiver(post_delete, sender=Category)
+def log_uncategorized_courses_change(sender, instance, **kwargs):
+    changes.record_courses(getattr(instance, '_course_ids', []))
+
+@receiver(post_save, sender=User)
+def log_teacher_courses_change(sender, instance, created, update_fields=None, **kwargs):
+    if not created and (update_fields is None or 'username' in update_fields):
+        changes.record_courses(Course.objects.filter(teacher=instance).values_list('pk', flat=True))
+
+@receiver(post_save, sender=Enrollment)
+def log_enrollment(sender, instance, created, **kwargs):
+    if created:
+        changes.record_enrollments([instance])
+
+@receiver(post_delete, sender=Enrollment)
+def log_unenrollment(sender, instance, **kwargs):
+    changes.record_enrollments([instance], deleted=True)
+
+# Drop the cached full User used by stateless JWT requests when the user or role changes
+@receiver([post_save, post_delete], sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    forget_full_user(instance.pk)
+
+@receiver([post_save, post_delete], sender=Profile)
+def forget_cached_profile_user(sender, instance, **kwargs):
+    forget_full_user(instance.user_id)
+
+# Per-connection SQLite tuning (WAL, synchronous, busy timeout, mmap) from settings.SQLITE_PRAGMAS
+@receiver(connection_created)
+def tune_sqlite_connection(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            cursor.execute(f'PRAGMA {pragma} = {value}')
+
+# Threads ProfilingMiddleware never runs on, e.g. sync_to_async's under ASGI
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    if getattr(settings, 'API_PROFILING', False):
+        profiling.instrument(connection)
@@ -0,0 +1,91 @@
+import re
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+
+SLUG_QUERY_CHUNK = 100
+SLUG_SAVE_ATTEMPTS = 5
+SUFFIX_RE = re.compile(r'^(.+)-(\d+)$')
+
+
+def make_base_slug(text, max_length, fallback):
+    # Imported on first use: only writes need it, not worker boot (courses.startup)
+    from pytils import translit
+
+    # Leave room for a "-N" suffix within the column length
+    slug = translit.slugify(text or '')[:max_length - 8].strip('-')
+    return slug or fallback
+
+
+def prefix_condition(prefix):
+    # SQLite's LIKE is case-insensitive and can't use the unique slug index; slugs are
+    # lowercase ASCII, so a binary range scan selects the same rows.
+    if connection.vendor == 'sqlite':
+        return Q(slug__gte=prefix, slug__lt=prefix[:-1] + chr(ord(prefix[-1]) + 1))
+    return Q(slug__startswith=prefix)
+
+
+# Returns a unique slug for every base, issuing one query per chunk of distinct bases
+def allocate_slugs(model, bases):
+    next_suffix = {}
+    distinct = sorted(set(bases))
+    for start in range(0, len(distinct), SLUG_QUERY_CHUNK):
+        chunk = distinct[start:start + SLUG_QUERY_CHUNK]
+        condition = Q()
+        for base in chunk:
+            condition |= Q(slug=base) | prefix_condition(f'{base}-')
+        existing = model.objects.filter(condition).order_by().values_list('slug', flat=True)
+        taken = {base: set() for base in chunk}
+        for slug in existing:
+            if slug in taken:
+                taken[slug].add(1)
+            match = SUFFIX_RE.match(slug)
+            if match and match.group(1) in taken:
+                taken[match.group(1)].add(int(match.group(2)))
+        for base in chunk:
+            next_suffix[base] = max(taken[base], default=0) + 1
+
+    slugs = []
+    for base in bases:
+        suffix = next_suffix[base]
+        slugs.append(base if suffix == 1 else f'{base}-{suffix}')
+        next_suffix[base] = suffix + 1
+    return slugs
+
+
+# Fills `slug` from `slug_source_field`, adding a numeric suffix on collision. Inserts run
+# in a savepoint and retry with a fresh suffix if a concurrent writer took the slug first.
+class UniqueSlugMixin:
+    slug_source_field = None
+    slug_fallback = 'item'
+
+    def base_slug(self):
+        max_length = type(self)._meta.get_field('slug').max_length
+        return make_base_slug(getattr(self, self.slug_source_field), max_length, self.slug_fallback)
+
+    @classmethod
+    def assign_slugs(cls, objs):
+        # Bulk path: one allocation query per chunk instead of one exists() per row
+        pending = [obj for obj in objs if not obj.slug]
+        for obj, slug in zip(pending, allocate_slugs(cls, [obj.base_slug() for obj in pending])):
+            obj.slug = slug
+        return objs
+
+    def save(self, *args, **kwargs):
+        # A lost race on a generated slug retries from the base ("python-3", not
+        # "python-2-2"); a slug the caller supplied is suffixed as given
+        base = self.slug
+        if not self.slug:
+            base = self.base_slug()
+            self.slug = allocate_slugs(type(self), [base])[0]
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+
+        for attempt in range(SLUG_SAVE_ATTEMPTS):
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                slug_taken = type(self).objects.filter(slug=self.slug).exists()
+                if not slug_taken or attempt == SLUG_SAVE_ATTEMPTS - 1:
+                    raise
+                self.slug = allocate_slugs(type(self), [base])[0]
@@ -0,0 +1,106 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from django.conf import settings
+from django.urls import Resolver404, get_resolver
+from django.utils import translation
+
+# Worker boot. core.wsgi/core.asgi call warm() once the application is loaded (before
+# gunicorn forks when preload_app is on, see gunicorn.conf.py) so a fresh worker's first
+# requests don't pay for resolving the URLconf, building serializer fields or loading the
+# translation catalogs. warm() touches no database: forked
+# workers must not share a connection opened in the parent.
+
+# Resolved to import every view module the API serves; never reverse()d, which would
+# also import the lazily included admin (core.admin_urls)
+WARM_PATHS = (
+    '/api/courses/', '/api/courses/1/', '/api/categories/', '/api/enrollments/', '/api/my-courses/',
+    '/api/token/', '/api/register/', '/api/changes/',
+)
+
+
+def warm():
+    resolver = get_resolver()
+    for path in WARM_PATHS:
+        try:
+            resolver.resolve(path)
+        except Resolver404:
+            pass
+    translation.activate(settings.LANGUAGE_CODE)
+    translation.deactivate()
+
+    from django.contrib.auth.models import User
+    from .serializers import (
+        CategorySerializer, CourseSerializer, DashboardEntrySerializer, EnrollmentSerializer, RegisterSerializer,
+        UserSerializer,
+    )
+
+    for serializer in (CategorySerializer, CourseSerializer, DashboardEntrySerializer, EnrollmentSerializer,
+                       RegisterSerializer, UserSerializer):
+        serializer(context={}).fields
+    User._meta.get_fields()
+
+
+# Boots core.wsgi in a fresh interpreter and serves one request through it
+PROBE = '''
+import io, json, sys, time
+start = time.perf_counter()
+from core.wsgi import application
+booted = time.perf_counter()
+status = []
+environ = {
+    'REQUEST_METHOD': 'GET', 'PATH_INFO': sys.argv[1], 'QUERY_STRING': '', 'SERVER_NAME': 'localhost',
+    'SERVER_PORT': '80', 'HTTP_HOST': 'localhost', 'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(),
+    'wsgi.errors': sys.stderr,
+}
+body = b''.join(application(environ, lambda code, headers, exc_info=None: status.append(code)))
+done = time.perf_counter()
+print(json.dumps({
+    'boot_ms': (booted - start) * 1000, 'first_response_ms': (done - booted) * 1000,
+    'status': int(status[0].split()[0]), 'bytes': len(body), 'modules': sorted(sys.modules),
+}))
+'''
+
+
+class Measurement:
+    def __init__(self, result, imports, wall_ms):
+        self.boot_ms = result['boot_ms']
+        self.first_response_ms = result['first_response_ms']
+        self.status = result['status']
+        self.modules = set(result['modules'])
+        self.imports = imports  # [(module, self_us, cumulative_us)] in import order
+        self.wall_ms = wall_ms  # interpreter start to exit
+
+    @property
+    def total_ms(self):
+        return self.boot_ms + self.first_response_ms
+
+
+def parse_importtime(stderr):
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = [field.strip() for field in line[len('import time:'):].split('|')]
+        if len(fields) != 3 or not fields[0].isdigit():
+            continue  # the header line
+        imports.append((fields[2], int(fields[0]), int(fields[1])))
+    return imports
+
+
+def measure(path='/api/courses/', env=None):
+    inherited = {name: value for name, value in os.environ.items() if name != 'DJANGO_LAZY_ADMIN'}
+    # Without an explicit DJANGO_LAZY_ADMIN, core.wsgi decides, as under a real server
+    env = {**inherited, 'DJANGO_SETTINGS_MODULE': 'core.settings', **(env or {})}
+    start = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE, path],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    if process.returncode:
+        raise RuntimeError(f'Startup probe failed:\n{process.stderr[-2000:]}')
+    output = process.stdout.strip().splitlines()[-1]
+    return Measurement(json.loads(output), parse_importtime(process.stderr), wall_ms)
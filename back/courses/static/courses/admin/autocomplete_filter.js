@@ -0,0 +1,13 @@
+'use strict';
+// Autocomplete list filters (courses.admin_performance.AutocompleteFilter): reload the
+// changelist with the picked object, or without the filter once it is cleared
+{
+    const $ = django.jQuery;
+    $(document).on('change', 'select[data-filter-url]', function() {
+        const params = new URLSearchParams(this.dataset.filterUrl);
+        if (this.value) {
+            params.set(this.name, this.value);
+        }
+        window.location.search = params.toString();
+    });
+}
@@ -1 +1,1630 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+from django.conf import settings
+import asyncio
+from asgiref.sync import sync_to_async
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, override_settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from . import async_views, changes, dashboard, jobs, profiling, routing, search, slugs, startup, views
+from .cache import AsyncSingleFlight, SingleFlight, acached_response, get_stats
+from .authentication import StatelessJWTAuthentication
+from .counters import refresh_facet_counts
+from .models import Category, ChangeLogEntry, Course, CourseFacetCount, DashboardEntry, Enrollment, Job, Profile
+from .serializers import MyTokenObtainPairSerializer
+from .throttling import get_throttle_cache
+from .views import CourseViewSet, EnrollmentListCreateView
+
+
+class CourseListQueryCountTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.teacher = User.objects.create_user('teacher', password='pass12345')
+        self.teacher.profile.is_student = False
+        self.teacher.profile.is_teacher = True
+        self.teacher.profile.save()
+        self.student = User.objects.create_user('student', password='pass12345')
+        self.category = Category.objects.create(name='Programming')
+
+    def create_courses(self, count):
+        for i in range(count):
+            course = Course.objects.create(
+                title=f'Course {Course.objects.count()}', teacher=self.teacher, category=self.category
+            )
+            if i % 2 == 0:
+                Enrollment.objects.create(student=self.student, course=course)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_course_list_query_count_is_constant(self):
+        self.client.force_authenticate(self.student)
+        self.create_courses(2)
+        small, _ = self.count_queries('/api/courses/')
+        self.create_courses(10)
+        large, response = self.count_queries('/api/courses/')
+        self.assertEqual(small, large)
+        self.assertEqual(large, 1)
+        enrolled = {course['id']: course['is_enrolled'] for course in response.json()['results']}
+        for course_id, is_enrolled in enrolled.items():
+            self.assertEqual(is_enrolled, Enrollment.objects.filter(course_id=course_id, student=self.student).exists())
+
+    def test_anonymous_course_list_query_count_is_constant(self):
+        self.create_courses(2)
+        small, _ = self.count_queries('/api/courses/')
+        self.create_courses(10)
+        large, response = self.count_queries('/api/courses/')
+        self.assertEqual(small, large)
+        self.assertFalse(any(course['is_enrolled'] for course in response.json()['results']))
+
+    def test_enrollment_list_query_count_is_constant(self):
+        self.client.force_authenticate(self.student)
+        self.create_courses(2)
+        small, _ = self.count_queries('/api/enrollments/')
+        self.create_courses(10)
+        large, response = self.count_queries('/api/enrollments/')
+        self.assertEqual(small, large)
+        self.assertTrue(all(item['course']['is_enrolled'] for item in response.json()['results']))
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.teacher = User.objects.create_user('teacher', password='pass12345')
+        courses = [Course.objects.create(title=f'Course {i}', teacher=self.teacher) for i in range(7)]
+        # Identical timestamps must still page deterministically via the id tiebreaker
+        Course.objects.filter(pk__in=[c.pk for c in courses[:4]]).update(created_at=courses[0].created_at)
+
+    def test_pages_cover_every_course_once(self):
+        seen = []
+        url = '/api/courses/?page_size=3'
+        while url:
+            data = self.client.get(url).json()
+            seen.extend(course['id'] for course in data['results'])
+            url = data['next']
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(set(seen), set(Course.objects.values_list('id', flat=True)))
+
+    def collect(self, url, link='next'):
+        seen, pages = [], 0
+        while url:
+            data = self.client.get(url).json()
+            seen.extend(course['id'] for course in data['results'])
+            url, pages = data[link], pages + 1
+            self.assertLess(pages, 100)
+        return seen
+
+    def test_popular_ordering_pages_past_long_ties(self):
+        # More ties on enrollment_count than DRF's offset_cutoff (1000)
+        Course.objects.bulk_create(
+            Course(title=f'Tied {i}', slug=f'tied-{i}', teacher=self.teacher, created_at=timezone.now())
+            for i in range(1100)
+        )
+        seen = self.collect('/api/courses/?ordering=popular&page_size=100')
+        self.assertEqual(len(seen), 1107)
+        self.assertEqual(set(seen), set(Course.objects.values_list('id', flat=True)))
+        # Walking back from the last page returns the same rows
+        data = self.client.get('/api/courses/?ordering=popular&page_size=100').json()
+        for _ in range(3):
+            data = self.client.get(data['next']).json()
+        previous = self.collect(data['previous'], link='previous')
+        self.assertEqual(len(previous), 300)
+        self.assertEqual(set(previous), set(seen[:300]))
+
+    def test_invalid_cursor_is_404(self):
+        self.assertEqual(self.client.get('/api/courses/?cursor=cD1bIngiXQ%3D%3D').status_code, 404)
+
+
+class CourseSearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.teacher = User.objects.create_user('teacher', first_name='Ada', last_name='Lovelace', password='pass12345')
+        self.category = Category.objects.create(name='Programming')
+        self.python = Course.objects.create(title='Python Basics', description='Start coding.', teacher=self.teacher)
+        self.django = Course.objects.create(
+            title='Web Development', description='Django and python for the web.', teacher=self.teacher,
+            category=self.category
+        )
+
+    def search(self, query):
+        response = self.client.get('/api/courses/search/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [course['id'] for course in response.json()['results']]
+
+    def test_prefix_match_ranks_title_above_description(self):
+        self.assertEqual(self.search('pyth'), [self.python.id, self.django.id])
+
+    def test_matches_category_and_teacher_names(self):
+        self.assertEqual(self.search('program'), [self.django.id])
+        self.assertEqual(set(self.search('lovelace')), {self.python.id, self.django.id})
+
+    def test_index_follows_updates_and_deletes(self):
+        self.python.title = 'Rust Basics'
+        self.python.save()
+        self.assertEqual(self.search('rust'), [self.python.id])
+        self.category.name = 'Engineering'
+        self.category.save()
+        self.assertEqual(self.search('engineer'), [self.django.id])
+        self.django.delete()
+        self.assertEqual(self.search('web'), [])
+
+    def test_empty_query_returns_no_results(self):
+        self.assertEqual(self.search(''), [])
+
+    def test_ranks_every_match_not_just_the_newest(self):
+        # The title match is older than 1,200 description-only matches
+        Course.objects.bulk_create(
+            Course(title=f'Course {i}', slug=f'course-{i}', description='Some python.', teacher=self.teacher)
+            for i in range(1200)
+        )
+        search.rebuild_index()
+        self.assertEqual(self.search('python')[0], self.python.id)
+
+    def test_filters_apply_before_the_limit(self):
+        # 30 title matches outside the category outrank its three description matches
+        other = Category.objects.create(name='Other')
+        Course.objects.bulk_create(
+            Course(title=f'Python {i}', slug=f'python-{i}', teacher=self.teacher, category=other) for i in range(30)
+        )
+        filtered = Course.objects.bulk_create(
+            Course(title=f'Course {i}', slug=f'course-{i}', description='Python.', teacher=self.teacher,
+                   category=self.category)
+            for i in range(2)
+        )
+        search.rebuild_index()
+        response = self.client.get('/api/courses/search/', {'q': 'python', 'limit': 10, 'category': self.category.pk})
+        self.assertEqual(
+            {course['id'] for course in response.json()['results']}, {self.django.id, *(c.pk for c in filtered)}
+        )
+
+
+class AnonymousReadCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.teacher = User.objects.create_user('teacher', password='pass12345')
+        self.category = Category.objects.create(name='Programming')
+        self.course = Course.objects.create(title='Python Basics', teacher=self.teacher, category=self.category)
+
+    def test_second_read_is_served_from_cache(self):
+        first = self.client.get('/api/courses/')
+        self.assertEqual(first['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/courses/')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(first.content, second.content)
+
+    def test_conditional_request_returns_304(self):
+        first = self.client.get(f'/api/courses/{self.course.id}/')
+        response = self.client.get(f'/api/courses/{self.course.id}/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_writes_invalidate_cached_reads(self):
+        self.client.get('/api/courses/')
+        categories = self.client.get('/api/categories/')
+        self.category.name = 'Engineering'
+        self.category.save()
+        response = self.client.get('/api/courses/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['results'][0]['category']['name'], 'Engineering')
+        self.assertNotEqual(self.client.get('/api/categories/')['ETag'], categories['ETag'])
+        self.teacher.first_name = 'Ada'
+        self.teacher.save()
+        self.assertEqual(self.client.get('/api/courses/')['X-Cache'], 'MISS')
+        self.teacher.profile.is_student = False
+        self.teacher.profile.save()
+        self.assertEqual(self.client.get('/api/courses/')['X-Cache'], 'MISS')
+
+    def test_user_writes_outside_the_payload_keep_cached_reads(self):
+        self.client.get('/api/courses/')
+        self.client.post('/api/register/', {
+            'username': 'newcomer', 'email': 'new@example.com', 'password': 'Str0ng-pass-123',
+            'password2': 'Str0ng-pass-123', 'is_student': True,
+        }, format='json')
+        self.assertTrue(User.objects.filter(username='newcomer').exists())
+        self.teacher.set_password('An0ther-pass-456')
+        self.teacher.save()
+        self.teacher.profile.save()
+        student = User.objects.get(username='newcomer')
+        student.first_name = 'New'
+        student.save()
+        self.assertEqual(self.client.get('/api/courses/')['X-Cache'], 'HIT')
+
+    def test_enrollment_invalidates_only_responses_showing_the_count(self):
+        other = Course.objects.create(title='Other', teacher=self.teacher)
+        student = User.objects.create_user('student', password='pass12345')
+        paths = {
+            'page': '/api/courses/', 'detail': f'/api/courses/{self.course.id}/', 'other': f'/api/courses/{other.id}/',
+            'sparse': '/api/courses/?fields=id,title', 'popular': '/api/courses/?ordering=popular',
+            'facets': '/api/courses/facets/',
+        }
+        etags = {name: self.client.get(path)['ETag'] for name, path in paths.items()}
+        Enrollment.objects.create(student=student, course=self.course)
+        self.assertEqual({name: self.client.get(path)['X-Cache'] for name, path in paths.items()}, {
+            'page': 'MISS', 'detail': 'MISS', 'other': 'HIT', 'sparse': 'HIT', 'popular': 'MISS', 'facets': 'HIT',
+        })
+        self.assertEqual(self.client.get(paths['detail']).json()['enrollment_count'], 1)
+        self.assertEqual(self.client.get(paths['page'], HTTP_IF_NONE_MATCH=etags['page']).status_code, 200)
+        self.assertEqual(self.client.get(paths['other'], HTTP_IF_NONE_MATCH=etags['other']).status_code, 304)
+
+    def test_authenticated_reads_bypass_cache(self):
+        self.client.force_authenticate(self.teacher)
+        response = self.client.get('/api/courses/')
+        self.assertFalse(response.has_header('X-Cache'))
+
+
+class SlugAllocationTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user('teacher', password='pass12345')
+
+    def test_duplicate_titles_get_numeric_suffixes(self):
+        slugs = [Course.objects.create(title='Python Basics', teacher=self.teacher).slug for _ in range(3)]
+        self.assertEqual(slugs, ['python-basics', 'python-basics-2', 'python-basics-3'])
+
+    def test_save_without_collision_costs_one_lookup(self):
+        course = Course(title='Unique Title', teacher=self.teacher)
+        with CaptureQueriesContext(connection) as ctx:
+            course.save()
+        slug_queries = [q['sql'] for q in ctx.captured_queries if 'SELECT' in q['sql'] and '"slug"' in q['sql']]
+        self.assertEqual(len(slug_queries), 1)
+
+    def test_lost_race_retries_with_next_suffix(self):
+        Course.objects.create(title='Race', teacher=self.teacher)
+        # Simulates a concurrent writer: the slug was allocated before the other row existed
+        course = Course(title='Race', slug='race', teacher=self.teacher)
+        course.save()
+        self.assertEqual(course.slug, 'race-2')
+
+    def test_lost_race_on_generated_slug_retries_from_the_base(self):
+        Course.objects.create(title='Race', teacher=self.teacher)
+        Course.objects.create(title='Race', teacher=self.teacher)
+        real = slugs.allocate_slugs
+        calls = []
+
+        def allocate(model, bases):
+            # The first allocation saw 'race' but not the concurrent 'race-2'
+            calls.append(bases)
+            return ['race-2'] if len(calls) == 1 else real(model, bases)
+
+        with mock.patch('courses.slugs.allocate_slugs', side_effect=allocate):
+            course = Course.objects.create(title='Race', teacher=self.teacher)
+        self.assertEqual(course.slug, 'race-3')
+        self.assertEqual(calls, [['race'], ['race']])
+
+    def test_bulk_assignment_uses_one_query(self):
+        Course.objects.create(title='Intro', teacher=self.teacher)
+        courses = [Course(title=title, teacher=self.teacher) for title in ['Intro', 'Intro', 'Other', '!!!']]
+        with self.assertNumQueries(1):
+            Course.assign_slugs(courses)
+        self.assertEqual([c.slug for c in courses], ['intro-2', 'intro-3', 'other', 'course'])
+        Course.objects.bulk_create(courses)
+
+    def test_category_slugs_are_unique(self):
+        first = Category.objects.create(name='C++')
+        second = Category.objects.create(name='C')
+        self.assertEqual((first.slug, second.slug), ('c', 'c-2'))
+
+
+class CourseImportExportTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user('teacher', password='pass12345')
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def path(self, name):
+        return os.path.join(self.tmpdir.name, name)
+
+    def test_csv_import_creates_and_updates_in_chunks(self):
+        existing = Course.objects.create(title='Old', teacher=self.teacher)
+        with open(self.path('courses.csv'), 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['title', 'description', 'category', 'teacher', 'slug'])
+            writer.writerow(['Renamed', 'Updated', 'Science', 'teacher', existing.slug])
+            for i in range(5):
+                writer.writerow(['Bulk Course', f'Row {i}', 'Science', 'teacher', ''])
+            writer.writerow(['Orphan', '', '', 'nobody', ''])
+        call_command('courses_import', self.path('courses.csv'), chunk_size=2, stdout=io.StringIO(), stderr=io.StringIO())
+
+        existing.refresh_from_db()
+        self.assertEqual((existing.title, existing.category.name), ('Renamed', 'Science'))
+        self.assertEqual(existing.title_folded, 'renamed')
+        self.assertEqual(Course.objects.filter(title='Bulk Course', title_folded='bulk course').count(), 5)
+        self.assertEqual(Category.objects.filter(name='Science').count(), 1)
+        self.assertFalse(Course.objects.filter(title='Orphan').exists())
+        self.assertEqual(len(set(Course.objects.values_list('slug', flat=True))), Course.objects.count())
+
+    def test_jsonl_export_round_trips_through_import(self):
+        Course.objects.create(title='Exported', description='Text', teacher=self.teacher)
+        call_command('courses_export', self.path('courses.jsonl'), stderr=io.StringIO())
+        Course.objects.all().delete()
+        call_command('courses_import', self.path('courses.jsonl'), stdout=io.StringIO())
+        course = Course.objects.get()
+        self.assertEqual((course.title, course.description, course.slug), ('Exported', 'Text', 'exported'))
+
+
+class BulkEnrollmentTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.teacher = User.objects.create_user('teacher', password='pass12345')
+        self.teacher.profile.is_student = False
+        self.teacher.profile.is_teacher = True
+        self.teacher.profile.save()
+        self.other_teacher = User.objects.create_user('other', password='pass12345')
+        self.other_teacher.profile.is_student = False
+        self.other_teacher.profile.is_teacher = True
+        self.other_teacher.profile.save()
+        self.students = [User.objects.create_user(f'student{i}', password='pass12345') for i in range(3)]
+        self.courses = [Course.objects.create(title=f'Course {i}', teacher=self.teacher) for i in range(3)]
+        self.foreign = Course.objects.create(title='Foreign', teacher=self.other_teacher)
+
+    def post(self, user, payload):
+        self.client.force_authenticate(user)
+        response = self.client.post('/api/enrollments/bulk/', payload, format='json')
+        return response, {(r['student_id'], r['course_id']): r['result'] for r in response.json().get('results', [])}
+
+    def test_student_enrolls_in_many_courses_with_constant_queries(self):
+        student = self.students[0]
+        Enrollment.objects.create(student=student, course=self.courses[0])
+        course_ids = [c.id for c in self.courses] + [999]
+        with CaptureQueriesContext(connection) as ctx:
+            response, results = self.post(student, {'course_ids': course_ids})
+        self.assertEqual(response.status_code, 200)
+        # Constant; includes one INSERT each for the queued emails and the change log, and
+        # the SAVEPOINT and RELEASE around the enrollment insert
+        self.assertLessEqual(len(ctx.captured_queries), 11)
+        self.assertEqual(results[(student.id, self.courses[0].id)], 'already_enrolled')
+        self.assertEqual(results[(student.id, self.courses[1].id)], 'enrolled')
+        self.assertEqual(results[(student.id, 999)], 'course_not_found')
+        self.assertEqual(Enrollment.objects.filter(student=student).count(), 3)
+
+    def test_teacher_enrolls_cohort_into_own_courses_only(self):
+        student_ids = [s.id for s in self.students] + [self.other_teacher.id]
+        response, results = self.post(self.teacher, {
+            'course_ids': [self.courses[0].id, self.foreign.id], 'student_ids': student_ids
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Enrollment.objects.filter(course=self.courses[0]).count(), 3)
+        self.assertEqual(results[(self.students[0].id, self.foreign.id)], 'forbidden')
+        self.assertEqual(results[(self.other_teacher.id, self.courses[0].id)], 'student_not_found')
+
+    def test_bulk_unenroll(self):
+        student = self.students[1]
+        Enrollment.objects.create(student=student, course=self.courses[0])
+        response, results = self.post(student, {
+            'action': 'unenroll', 'course_ids': [self.courses[0].id, self.courses[1].id]
+        })
+        self.assertEqual(results[(student.id, self.courses[0].id)], 'unenrolled')
+        self.assertEqual(results[(student.id, self.courses[1].id)], 'not_enrolled')
+        self.assertFalse(Enrollment.objects.filter(student=student).exists())
+
+    def test_students_cannot_enroll_others(self):
+        response, _ = self.post(self.students[0], {
+            'course_ids': [self.courses[0].id], 'student_ids': [self.students[1].id]
+        })
+        self.assertEqual(response.status_code, 403)
+
+    def test_pairs_are_capped(self):
+        response, _ = self.post(self.teacher, {'course_ids': list(range(1, 101)), 'student_ids': list(range(1, 52))})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('5000', str(response.json()))
+
+    def test_pair_enrolled_concurrently_is_not_reported_notified_or_logged(self):
+        student = self.students[0]
+        real = views.create_enrollments
+
+        def create_enrollments(enrollments):
+            # Another request commits the same pair after this one read the existing rows
+            Enrollment.objects.bulk_create([Enrollment(student=student, course=self.courses[0])])
+            return real(enrollments)
+
+        cursor = changes.latest_cursor()
+        with mock.patch('courses.views.create_enrollments', create_enrollments):
+            response, results = self.post(student, {'course_ids': [self.courses[0].id, self.courses[1].id]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(results[(student.id, self.courses[0].id)], 'already_enrolled')
+        self.assertEqual(results[(student.id, self.courses[1].id)], 'enrolled')
+        self.assertEqual(Enrollment.objects.filter(student=student).count(), 2)
+        self.assertEqual(
+            [job.payload['course_id'] for job in Job.objects.filter(kind='send_enrollment_email')], [self.courses[1].id]
+        )
+        self.assertEqual(
+            list(ChangeLogEntry.objects.filter(pk__gt=cursor, kind=ChangeLogEntry.ENROLLMENT)
+                 .values_list('object_id', flat=True)),
+            [self.courses[1].id],
+        )
+
+
+class DenormalizedCounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.teacher = User.objects.create_user('teacher', password='pass12345')
+        self.students = [User.objects.create_user(f'student{i}', password='pass12345') for i in range(3)]
+        self.science = Category.objects.create(name='Science')
+        self.art = Category.objects.create(name='Art')
+        self.quiet = Course.objects.create(title='Quiet', teacher=self.teacher, category=self.science)
+        self.popular = Course.objects.create(title='Popular', teacher=self.teacher, category=self.science)
+
+    def assertCounts(self):
+        for course in Course.objects.all():
+            self.assertEqual(course.enrollment_count, course.enrollments.count())
+        for category in Category.objects.all():
+            self.assertEqual(category.course_count, category.courses.count())
+
+    def test_counters_follow_single_and_bulk_writes(self):
+        for student in self.students:
+            Enrollment.objects.create(student=student, course=self.popular)
+        Enrollment.objects.create(student=self.students[0], course=self.quiet)
+        self.assertCounts()
+        self.client.force_authenticate(self.students[1])
+        self.client.post('/api/enrollments/bulk/', {'course_ids': [self.quiet.id]}, format='json')
+        self.client.post('/api/enrollments/bulk/', {'action': 'unenroll', 'course_ids': [self.popular.id]}, format='json')
+        self.assertCounts()
+        self.popular.category = self.art
+        self.popular.save()
+        self.quiet.delete()
+        self.assertCounts()
+
+    def test_failed_update_rolls_back_counters(self):
+        self.teacher.profile.is_teacher = True
+        self.teacher.profile.save()
+        self.client.force_authenticate(self.teacher)
+        # The change log write runs after the course and counter updates
+        with mock.patch('courses.changes.record_courses', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.client.patch(f'/api/courses/{self.popular.id}/', {'category_id': self.art.id}, format='json')
+        self.popular.refresh_from_db()
+        self.assertEqual(self.popular.category, self.science)
+        self.assertCounts()
+
+    def test_popularity_ordering_and_filter(self):
+        for student in self.students:
+            Enrollment.objects.create(student=student, course=self.popular)
+        response = self.client.get('/api/courses/', {'ordering': 'popular'})
+        results = response.json()['results']
+        self.assertEqual([c['id'] for c in results], [self.popular.id, self.quiet.id])
+        self.assertEqual(results[0]['enrollment_count'], 3)
+        response = self.client.get('/api/courses/', {'min_enrollments': 1})
+        self.assertEqual([c['id'] for c in response.json()['results']], [self.popular.id])
+        # Non-decimal digits and values past the integer range don't reach the database
+        self.assertEqual(len(self.client.get('/api/courses/', {'min_enrollments': '²'}).json()['results']), 2)
+        self.assertEqual(self.client.get('/api/courses/', {'min_enrollments': '9' * 30}).json()['results'], [])
+        categories = {c['name']: c['course_count'] for c in self.client.get('/api/categories/').json()}
+        self.assertEqual(categories, {'Art': 0, 'Science': 2})
+
+    def test_recount_command_repairs_drift(self):
+        Enrollment.objects.create(student=self.students[0], course=self.popular)
+        Course.objects.update(enrollment_count=42)
+        Category.objects.update(course_count=7)
+        call_command('recount_courses', stdout=io.StringIO())
+        self.assertCounts()
+
+
+class StatelessJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.teacher = User.objects.create_user('teacher', password='pass12345')
+        self.teacher.profile.is_student = False
+        self.teacher.profile.is_teacher = True
+        self.teacher.profile.save()
+        self.student = User.objects.create_user('student', password='pass12345')
+        self.course = Course.objects.create(title='Course', teacher=self.teacher)
+        for view in (CourseViewSet, EnrollmentListCreateView):
+            patcher = mock.patch.object(view, 'authentication_classes', [StatelessJWTAuthentication])
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def authenticate(self, user):
+        token = MyTokenObtainPairSerializer.get_token(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_role_checks_need_no_user_or_profile_query(self):
+        Enrollment.objects.create(student=self.student, course=self.course)
+        self.authenticate(self.student)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/enrollments/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 1)
+        tables = ' '.join(q['sql'] for q in ctx.captured_queries if q['sql'].startswith('SELECT "auth_user"') or q['sql'].startswith('SELECT "courses_profile"'))
+        self.assertEqual(tables, '')
+
+    def test_writes_use_cached_full_user(self):
+        self.authenticate(self.teacher)
+        response = self.client.post('/api/courses/', {'title': 'New'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['teacher']['username'], 'teacher')
+        response = self.client.patch(f'/api/courses/{self.course.id}/', {'description': 'x'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.authenticate(self.student)
+        response = self.client.patch(f'/api/courses/{self.course.id}/', {'description': 'y'}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+class QueryPlanTests(TestCase):
+    # Hot tables that must be reached through an index on every API path
+    HOT_TABLES = (
+        'courses_course', 'courses_enrollment', 'courses_category', 'courses_profile', 'auth_user',
+        'courses_dashboardentry', 'courses_changelogentry',
+    )
+    # The whole WHERE clause is one primary key list: its size bounds the sort
+    SORTED_BATCH = re.compile(r'WHERE "\w+"\."id" IN \([^()]*\) ORDER BY')
+
+    @classmethod
+    def setUpTestData(cls):
+        users = User.objects.bulk_create(User(username=f'user{i}') for i in range(400))
+        Profile.objects.bulk_create(
+            Profile(user=user, is_student=i >= 20, is_teacher=i < 20) for i, user in enumerate(users)
+        )
+        cls.teacher, cls.student = users[0], users[50]
+        categories = Category.objects.bulk_create(Category(name=f'Category {i}', slug=f'category-{i}') for i in range(20))
+        cls.category = categories[0]
+        courses = Course.objects.bulk_create(
+            Course(title=f'Course {i}', slug=f'course-{i}', teacher=users[i % 20], category=categories[i % 20])
+            for i in range(2000)
+        )
+        cls.course = courses[0]
+        Enrollment.objects.bulk_create(
+            Enrollment(student=users[20 + (i % 380)], course=courses[(i * 7) % 2000]) for i in range(6000)
+        )
+        dashboard.rebuild()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def full_scans(self, queries):
+        scans = []
+        for query in queries:
+            if not query['sql'].startswith('SELECT'):
+                continue
+            for detail in self.explain(query['sql']):
+                words = detail.split()
+                if words[:1] == ['SCAN'] and words[1] in self.HOT_TABLES and 'INDEX' not in detail:
+                    scans.append(f'{detail}: {query["sql"]}')
+                # Sorting must come from an index, except for ranking full-text search hits and
+                # ordering a batch fetched by primary key (the change feed's page of ids)
+                if 'TEMP B-TREE FOR ORDER BY' in detail and not self.SORTED_BATCH.search(query['sql']) and 'MATCH' not in query['sql']:
+                    scans.append(f'{detail}: {query["sql"]}')
+        return scans
+
+    def assertIndexedRequest(self, method, url, user=None, **kwargs):
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(url, **kwargs)
+        self.assertLess(response.status_code, 400, response.content)
+        self.assertEqual(self.full_scans(ctx.captured_queries), [])
+
+    def assertIndexedQuerySet(self, queryset):
+        with CaptureQueriesContext(connection) as ctx:
+            list(queryset)
+        self.assertEqual(self.full_scans(ctx.captured_queries), [])
+
+    def test_course_endpoints(self):
+        self.assertIndexedRequest('get', '/api/courses/')
+        self.assertIndexedRequest('get', '/api/courses/', self.student)
+        self.assertIndexedRequest('get', '/api/courses/?ordering=popular&min_enrollments=1')
+        self.assertIndexedRequest('get', f'/api/courses/{self.course.id}/', self.student)
+        self.assertIndexedRequest('get', '/api/course-count/', self.student)
+        self.assertIndexedRequest('get', '/api/courses/search/?q=course')
+
+    def test_category_endpoints(self):
+        self.assertIndexedRequest('get', '/api/categories/')
+        self.assertIndexedRequest('get', f'/api/categories/{self.category.id}/')
+
+    def test_enrollment_endpoints(self):
+        self.assertIndexedRequest('get', '/api/enrollments/', self.student)
+        self.assertIndexedRequest('get', '/api/my-courses/', self.student)
+        self.assertIndexedRequest(
+            'post', '/api/enrollments/bulk/', self.student, data={'course_ids': [self.course.id]}, format='json'
+        )
+        self.assertIndexedRequest('delete', f'/api/courses/{self.course.id}/unenroll/', self.student)
+
+    def test_teacher_write_endpoints(self):
+        self.assertIndexedRequest('post', '/api/courses/', self.teacher, data={'title': 'New', 'category_id': self.category.id}, format='json')
+        course = Course.objects.filter(teacher=self.teacher).first()
+        self.assertIndexedRequest('patch', f'/api/courses/{course.id}/', self.teacher, data={'description': 'x'}, format='json')
+
+    def test_change_feed(self):
+        ChangeLogEntry.objects.bulk_create(ChangeLogEntry(kind=ChangeLogEntry.COURSE, object_id=i + 1) for i in range(500))
+        self.assertIndexedRequest('get', '/api/changes/?since=450', self.student)
+        self.assertIndexedRequest('get', '/api/changes/?since=450')
+
+    def test_filtered_course_lists(self):
+        self.assertIndexedQuerySet(Course.objects.filter(category=self.category).order_by('-created_at', '-id')[:20])
+        self.assertIndexedQuerySet(Course.objects.filter(teacher=self.teacher).order_by('-created_at', '-id')[:20])
+        self.assertIndexedQuerySet(User.objects.filter(profile__is_teacher=True)[:20])
+
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.teacher = User.objects.create_user('teacher', password='pass12345')
+        self.category = Category.objects.create(name='Programming')
+        self.course = Course.objects.create(
+            title='Python', description='x' * 1000, teacher=self.teacher, category=self.category
+        )
+
+    def test_fields_trim_output_and_selected_columns(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/courses/', {'fields': 'id,title,summary,teacher.username,category.name'})
+        course = response.json()['results'][0]
+        self.assertEqual(course, {
+            'id': self.course.id, 'title': 'Python', 'summary': 'x' * 200,
+            'teacher': {'username': 'teacher'}, 'category': {'name': 'Programming'},
+        })
+        sql = ctx.captured_queries[-1]['sql'].replace('SUBSTR("courses_course"."description", 1, 200)', '')
+        self.assertNotIn('"courses_course"."description"', sql)
+        self.assertNotIn('courses_profile', sql)
+        self.assertNotIn('"auth_user"."email"', sql)
+
+    def test_default_representation_is_unchanged(self):
+        course = self.client.get(f'/api/courses/{self.course.id}/').json()
+        self.assertEqual(course['description'], 'x' * 1000)
+        self.assertEqual(course['teacher']['profile'], {'is_student': True, 'is_teacher': False})
+
+    def test_nested_object_without_subfields_is_complete(self):
+        course = self.client.get(f'/api/courses/{self.course.id}/', {'fields': 'teacher'}).json()
+        self.assertEqual(set(course), {'teacher'})
+        self.assertEqual(course['teacher']['profile']['is_student'], True)
+
+
+class FastListPathTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.teacher = User.objects.create_user('teacher', password='pass12345', first_name='Ана ')
+        self.teacher.profile.is_student, self.teacher.profile.is_teacher = False, True
+        self.teacher.profile.save()
+        orphan = User.objects.create_user('orphan', password='pass12345')
+        orphan.profile.delete()
+        self.student = User.objects.create_user('student', password='pass12345')
+        category = Category.objects.create(name='Программирование')
+        courses = [
+            Course.objects.create(title=f'Курс {i} "q" \\ \x01\u2028', description='ж ' * 150,
+                                  teacher=self.teacher if i % 3 else orphan, category=category if i % 2 else None)
+            for i in range(25)
+        ]
+        for course in courses[:4]:
+            Enrollment.objects.create(student=self.student, course=course)
+
+    def assert_same_bytes(self, path, params=None, user=None):
+        self.client.force_authenticate(user)
+        with self.settings(API_FAST_LIST=False), CaptureQueriesContext(connection) as slow_queries:
+            cache.clear()
+            slow = self.client.get(path, params)
+        cache.clear()
+        with CaptureQueriesContext(connection) as fast_queries:
+            fast = self.client.get(path, params)
+        self.assertEqual(fast.status_code, 200)
+        self.assertEqual(fast.content, slow.content)
+        self.assertLessEqual(len(fast_queries), len(slow_queries))
+        return fast
+
+    def test_course_list_matches_serializer_output(self):
+        response = self.assert_same_bytes('/api/courses/')
+        self.assert_same_bytes('/api/courses/', {'cursor': parse_qs(urlsplit(response.json()['next']).query)['cursor'][0]})
+        self.assert_same_bytes('/api/courses/', {'ordering': 'popular', 'fields': 'id,summary,teacher.profile'})
+        self.assert_same_bytes('/api/courses/', {'fields': 'title,category'}, user=self.student)
+
+    def test_enrollment_list_matches_serializer_output(self):
+        self.assert_same_bytes('/api/enrollments/', user=self.student)
+        self.assert_same_bytes('/api/enrollments/', {'page_size': 2}, user=self.student)
+
+
+class AsyncReadViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.factory = AsyncRequestFactory()
+        teacher = User.objects.create_user('teacher', password='pass12345')
+        self.student = User.objects.create_user('student', password='pass12345')
+        category = Category.objects.create(name='Programming')
+        self.courses = [
+            Course.objects.create(title=f'Course {i}', teacher=teacher, category=category if i % 2 else None)
+            for i in range(25)
+        ]
+        Enrollment.objects.create(student=self.student, course=self.courses[3])
+        self.token = str(MyTokenObtainPairSerializer.get_token(self.student).access_token)
+
+    async def assert_same_as_sync(self, view, path, authenticated=False, **kwargs):
+        headers = {'Authorization': f'Bearer {self.token}'} if authenticated else {}
+        await sync_to_async(cache.clear)()
+        expected = await sync_to_async(self.client.get)(path, headers=headers)
+        await sync_to_async(cache.clear)()
+        response = await view.as_view()(self.factory.get(path, headers=headers), **kwargs)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.content, expected.content)
+        self.assertEqual(response.get('WWW-Authenticate'), expected.get('WWW-Authenticate'))
+        return response
+
+    async def test_reads_match_sync_views(self):
+        response = await self.assert_same_as_sync(async_views.AsyncCourseListView, '/api/courses/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        cursor = json.loads(response.content)['next'].split('?')[1]
+        await self.assert_same_as_sync(async_views.AsyncCourseListView, f'/api/courses/?{cursor}', authenticated=True)
+        await self.assert_same_as_sync(async_views.AsyncCourseListView, '/api/courses/?fields=id,summary&ordering=popular')
+        course_id = self.courses[3].id
+        await self.assert_same_as_sync(async_views.AsyncCourseDetailView, f'/api/courses/{course_id}/', True, pk=course_id)
+        await self.assert_same_as_sync(async_views.AsyncCourseDetailView, '/api/courses/999/', pk=999)
+        await self.assert_same_as_sync(async_views.AsyncCategoryListView, '/api/categories/')
+        await self.assert_same_as_sync(async_views.AsyncEnrollmentListView, '/api/enrollments/', authenticated=True)
+        await self.assert_same_as_sync(async_views.AsyncCourseCountView, '/api/course-count/', authenticated=True)
+
+    async def test_permission_and_token_errors_match_sync_views(self):
+        await self.assert_same_as_sync(async_views.AsyncCourseCountView, '/api/course-count/')
+        await self.assert_same_as_sync(async_views.AsyncEnrollmentListView, '/api/enrollments/')
+        self.token = 'not-a-token'
+        await self.assert_same_as_sync(async_views.AsyncEnrollmentListView, '/api/enrollments/', authenticated=True)
+
+
+class ProfilingMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        profiling.registry.reset()
+        self.client = APIClient()
+        teacher = User.objects.create_user('teacher', password='pass12345')
+        for i in range(3):
+            Course.objects.create(title=f'Course {i}', teacher=teacher)
+        self.staff = User.objects.create_user('staff', password='pass12345', is_staff=True)
+        middleware = [name for name in settings.MIDDLEWARE if name != 'courses.profiling.ProfilingMiddleware']
+        self.middleware = self.settings(MIDDLEWARE=['courses.profiling.ProfilingMiddleware'] + middleware)
+        self.middleware.enable()
+        self.addCleanup(self.middleware.disable)
+
+    def test_server_timing_and_metrics(self):
+        self.client.force_authenticate(self.staff)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/courses/')
+        timing = response['Server-Timing']
+        self.assertRegex(timing, rf'db;dur=[\d.]+;desc="{len(queries)} queries, 0 duplicate"')
+        self.assertRegex(timing, r'serialize;dur=[\d.]+, render;dur=[\d.]+')
+
+        metrics = self.client.get('/api/metrics/')
+        self.assertEqual(metrics['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        text = metrics.content.decode()
+        self.assertIn('api_requests_total{view="course-list",method="GET",status="200"} 1', text)
+        self.assertIn(f'api_db_queries_bucket{{view="course-list",le="+Inf"}} 1', text)
+        self.assertIn(f'api_response_size_bytes_sum{{view="course-list"}} {len(response.content)}', text)
+
+    def test_metrics_are_staff_only(self):
+        self.client.force_authenticate(User.objects.get(username='teacher'))
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+
+    def test_repeated_queries(self):
+        profile = profiling.RequestProfile()
+        profile.queries = [
+            ('SELECT a FROM t WHERE id = %s', (1,), 0), ('SELECT a FROM t WHERE id = %s', (1,), 0),
+            ('SELECT a FROM t WHERE id = %s', (2,), 0), ("SELECT a FROM t WHERE name = 'x'", None, 0),
+        ]
+        self.assertEqual(profile.duplicates(), 1)
+        self.assertEqual(profile.similar(), (3, 'SELECT a FROM t WHERE id = %s'))
+
+    def test_slow_sampled_requests_are_dumped(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with self.settings(API_PROFILING_SAMPLE_RATE=1, API_PROFILING_SLOW_MS=0, API_PROFILING_DIR=directory):
+                self.client.get('/api/courses/')
+            dumps = os.listdir(directory)
+        self.assertEqual(len(dumps), 1)
+        self.assertIn('course-list', dumps[0])
+
+
+class LoadTestHarnessTests(TestCase):
+    def test_seeded_scenarios_run_without_errors(self):
+        out = io.StringIO()
+        call_command('seed_bench_data', teachers=2, students=3, categories=3, courses=60, enrollments=20, stdout=out)
+        self.assertEqual(Course.objects.count(), 60)
+        self.assertEqual(Profile.objects.filter(is_teacher=True).count(), 2)
+        self.assertEqual(sum(Course.objects.values_list('enrollment_count', flat=True)), Enrollment.objects.count())
+        enrollments = Enrollment.objects.count()
+
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'results.json')
+            call_command('bench_api', iterations=2, output=output, stdout=out)
+            call_command('bench_api', iterations=1, scenarios=['browse'], compare=output, stdout=out)
+            with open(output) as f:
+                results = json.load(f)
+        self.assertEqual(results['meta']['iterations'], 2)
+        for name in ('POST /api/token/', 'GET /api/courses/?cursor=', 'DELETE /api/courses/<id>/unenroll/',
+                     'DELETE /api/courses/<id>/', 'POST /api/register/'):
+            self.assertEqual(results['endpoints'][name]['requests'], 2)
+        self.assertEqual(sum(stats['errors'] for stats in results['endpoints'].values()), 0)
+        self.assertEqual(results['endpoints']['GET /api/categories/']['queries'], 2)
+        self.assertIn('vs baseline', out.getvalue())
+        # The scenarios undo their writes
+        self.assertEqual(Course.objects.count(), 60)
+        self.assertEqual(Enrollment.objects.count(), enrollments)
+        self.assertEqual(User.objects.filter(username__startswith='seed-signup-').count(), 0)
+
+
+class DashboardReadModelTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.teacher = User.objects.create_user('teacher', password='pass12345')
+        self.teacher.profile.is_student, self.teacher.profile.is_teacher = False, True
+        self.teacher.profile.save()
+        self.student = User.objects.create_user('student', password='pass12345')
+        self.category = Category.objects.create(name='Programming')
+        self.courses = [
+            Course.objects.create(title=f'Course {i}', description='d' * 300, teacher=self.teacher, category=self.category)
+            for i in range(25)
+        ]
+
+    def entries(self):
+        return list(DashboardEntry.objects.order_by('pk').values(
+            'pk', 'student_id', 'course_id', 'course_title', 'course_slug', 'course_summary',
+            'teacher_username', 'category_name', 'enrolled_at'
+        ))
+
+    def test_entries_follow_enrollments_and_courses(self):
+        self.client.force_authenticate(self.student)
+        for course in self.courses[:3]:
+            self.assertEqual(self.client.post('/api/enrollments/', {'course_id': course.id}, format='json').status_code, 201)
+        self.client.post('/api/enrollments/bulk/', {'action': 'enroll', 'course_ids': [c.id for c in self.courses[3:6]]}, format='json')
+        self.assertEqual(DashboardEntry.objects.filter(student=self.student).count(), 6)
+        entry = DashboardEntry.objects.get(course=self.courses[0])
+        self.assertEqual(
+            (entry.course_title, entry.course_summary, entry.teacher_username, entry.category_name),
+            ('Course 0', 'd' * 200, 'teacher', 'Programming')
+        )
+
+        self.courses[0].title = 'Renamed'
+        self.courses[0].save()
+        self.teacher.username = 'professor'
+        self.teacher.save()
+        self.category.name = 'Coding'
+        self.category.save()
+        entry.refresh_from_db()
+        self.assertEqual((entry.course_title, entry.teacher_username, entry.category_name), ('Renamed', 'professor', 'Coding'))
+        self.category.delete()
+        entry.refresh_from_db()
+        self.assertEqual(entry.category_name, '')
+
+        self.client.delete(f'/api/courses/{self.courses[1].id}/unenroll/')
+        self.assertFalse(DashboardEntry.objects.filter(course=self.courses[1]).exists())
+        incremental = self.entries()
+        call_command('rebuild_dashboard', stdout=io.StringIO())
+        self.assertEqual(self.entries(), incremental)
+
+    def test_course_saves_refresh_entries_only_when_copied_columns_change(self):
+        for course in self.courses[:2]:
+            Enrollment.objects.create(student=self.student, course=course)
+        course = Course.objects.get(pk=self.courses[0].pk)
+        course.description = 'd' * 200 + 'e' * 100  # past the summary cut
+        with CaptureQueriesContext(connection) as queries:
+            course.save()
+        self.assertFalse(any('courses_dashboardentry' in query['sql'] for query in queries))
+        course.description = 'new summary'
+        course.save()
+        self.assertEqual(DashboardEntry.objects.get(course=course).course_summary, 'new summary')
+
+    def test_my_courses_is_one_indexed_query(self):
+        for course in self.courses:
+            Enrollment.objects.create(student=self.student, course=course)
+        self.client.force_authenticate(self.student)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/my-courses/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries), 1)
+        page = response.json()
+        self.assertEqual([row['course_title'] for row in page['results']], [f'Course {i}' for i in range(24, 4, -1)])
+        self.assertEqual(set(page['results'][0]), {
+            'id', 'course_id', 'course_title', 'course_slug', 'course_summary', 'teacher_username', 'category_name', 'enrolled_at'
+        })
+        rest = self.client.get(page['next']).json()['results']
+        self.assertEqual([row['course_title'] for row in rest], [f'Course {i}' for i in range(4, -1, -1)])
+
+
+FAST_SCRYPT = {'scrypt': {'work_factor': 2 ** 10, 'block_size': 8, 'parallelism': 1}}
+
+
+class AccountFlowTests(TestCase):
+    def setUp(self):
+        get_throttle_cache().clear()
+        self.client = APIClient()
+
+    def register(self, **data):
+        data = {'username': 'newbie', 'email': 'Newbie@EXAMPLE.com', 'password': 'Zx9!long-pass',
+                'password2': 'Zx9!long-pass', **data}
+        return self.client.post('/api/register/', data, format='json')
+
+    def test_registration_writes_user_and_profile_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.register(is_student=False, is_teacher=True)
+        self.assertEqual(response.status_code, 201, response.content)
+        writes = [q['sql'] for q in queries.captured_queries if q['sql'].startswith(('INSERT', 'UPDATE'))]
+        # User, welcome email job, profile
+        self.assertEqual(len(writes), 3, writes)
+        self.assertIn('courses_job', writes[1])
+        self.assertIn('courses_profile', writes[2])
+        user = User.objects.select_related('profile').get(username='newbie')
+        self.assertEqual((user.profile.is_student, user.profile.is_teacher), (False, True))
+        self.assertEqual(user.email, 'Newbie@example.com')
+        self.assertTrue(user.check_password('Zx9!long-pass'))
+
+    def test_registration_does_not_apply_password_validators(self):
+        # As before the login/registration cost work: only the confirmation must match
+        response = self.register(password='password123', password2='password123')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertTrue(User.objects.get(username='newbie').check_password('password123'))
+
+    def test_login_loads_user_and_profile_in_one_query(self):
+        user = User.objects.create_user('student', password='Zx9!long-pass')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/token/', {'username': 'student', 'password': 'Zx9!long-pass'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries), 1)
+        token = AccessToken(response.json()['access'])
+        self.assertTrue(token['is_student'])
+        self.assertEqual(token['user_id'], user.pk)
+
+    def test_login_rejects_wrong_password(self):
+        User.objects.create_user('student', password='Zx9!long-pass')
+        response = self.client.post('/api/token/', {'username': 'student', 'password': 'wrong'}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_login_rehashes_with_the_configured_hasher(self):
+        user = User.objects.create_user('student', password='Zx9!long-pass')
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$'))
+        hashers = ['courses.passwords.TunedScryptPasswordHasher', 'courses.passwords.TunedPBKDF2PasswordHasher']
+        with self.settings(PASSWORD_HASHERS=hashers, PASSWORD_HASHER_PARAMS=FAST_SCRYPT):
+            response = self.client.post('/api/token/', {'username': 'student', 'password': 'Zx9!long-pass'}, format='json')
+            self.assertEqual(response.status_code, 200)
+            user.refresh_from_db()
+            self.assertTrue(user.password.startswith(f'scrypt${2 ** 10}$'))
+            self.assertTrue(user.check_password('Zx9!long-pass'))
+
+
+class ThrottlingAndCoalescingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        get_throttle_cache().clear()
+        self.client = APIClient()
+        self.teacher = User.objects.create_user('teacher', password='pass12345')
+        Course.objects.create(title='Python Basics', teacher=self.teacher)
+
+    def rates(self, **rates):
+        return self.settings(REST_FRAMEWORK={
+            **settings.REST_FRAMEWORK,
+            'DEFAULT_THROTTLE_RATES': {**settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], **rates},
+        })
+
+    def test_login_attempts_are_throttled_per_client(self):
+        credentials = {'username': 'teacher', 'password': 'wrong'}
+        with self.rates(login='2/min'):
+            statuses = [self.client.post('/api/token/', credentials, format='json').status_code for _ in range(3)]
+            self.assertEqual(statuses, [401, 401, 429])
+            other = self.client.post('/api/token/', credentials, format='json', REMOTE_ADDR='10.0.0.2')
+            self.assertEqual(other.status_code, 401)
+            with self.settings(API_THROTTLING=False):
+                self.assertEqual(self.client.post('/api/token/', credentials, format='json').status_code, 401)
+        self.assertEqual(get_stats()['throttled']['login'], 1)
+        staff = User.objects.create_user('staff', password='pass12345', is_staff=True)
+        self.client.force_authenticate(staff)
+        self.assertIn('api_throttled_requests_total{scope="login"} 1', self.client.get('/api/metrics/').content.decode())
+
+    def test_anonymous_reads_are_throttled_and_users_are_not(self):
+        with self.rates(anon_read='2/min'):
+            self.client.get('/api/courses/')
+            self.client.get('/api/categories/')
+            response = self.client.get('/api/courses/')
+            self.assertEqual(response.status_code, 429)
+            self.assertTrue(response.has_header('Retry-After'))
+            self.client.force_authenticate(self.teacher)
+            self.assertEqual(self.client.get('/api/courses/').status_code, 200)
+
+    def test_concurrent_calls_share_one_run(self):
+        flights, started, release, calls, results = SingleFlight(), threading.Event(), threading.Event(), [], []
+
+        def compute():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return b'body'
+
+        def call():
+            results.append(flights.do('key', compute, 5))
+
+        threads = [threading.Thread(target=call)]
+        threads[0].start()
+        started.wait(5)
+        threads += [threading.Thread(target=call) for _ in range(4)]
+        for thread in threads[1:]:
+            thread.start()
+        time.sleep(0.2)  # let the followers reach the wait
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(results), [(b'body', False)] + [(b'body', True)] * 4)
+        self.assertEqual(flights.calls, {})
+
+    def test_followers_compute_themselves_when_the_leader_fails(self):
+        flights = SingleFlight()
+
+        def fail():
+            raise ValueError
+        with self.assertRaises(ValueError):
+            flights.do('key', fail, 5)
+        self.assertEqual(flights.do('key', lambda: b'body', 5), (b'body', False))
+
+    async def test_concurrent_async_misses_render_once(self):
+        calls = []
+
+        async def render():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return 200, b'[]'
+
+        factory = AsyncRequestFactory()
+        responses = await asyncio.gather(*[
+            acached_response(factory.get('/api/courses/?burst=1'), ('courses',), render) for _ in range(5)
+        ])
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(response['X-Cache'] for response in responses), ['COALESCED'] * 4 + ['MISS'])
+        self.assertEqual((await sync_to_async(get_stats)())['coalesced'], 4)
+
+    async def test_async_waiters_do_not_share_errors(self):
+        statuses = [404, 200, 200]
+
+        async def render():
+            status = statuses.pop(0)
+            await asyncio.sleep(0.05)
+            return status, b'{}'
+
+        factory = AsyncRequestFactory()
+        responses = await asyncio.gather(*[
+            acached_response(factory.get('/api/courses/?errors=1'), ('courses',), render) for _ in range(3)
+        ])
+        self.assertEqual([response.status_code for response in responses], [404, 200, 200])
+        self.assertEqual(statuses, [])
+
+    async def test_async_coalescing_can_be_turned_off(self):
+        calls = []
+
+        async def render():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return 200, b'[]'
+
+        flights = AsyncSingleFlight()
+        await asyncio.gather(*[flights.do('key', render, 0) for _ in range(3)])
+        self.assertEqual(len(calls), 3)
+
+
+class CourseFacetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        get_throttle_cache().clear()
+        self.client = APIClient()
+        self.ada = User.objects.create_user('ada', password='pass12345')
+        self.bob = User.objects.create_user('bob', password='pass12345')
+        self.python = Category.objects.create(name='Python')
+        self.web = Category.objects.create(name='Web')
+        self.courses = [
+            Course.objects.create(title=title, teacher=teacher, category=category)
+            for title, teacher, category in [
+                ('Intro', self.ada, self.python), ('Async', self.ada, self.python), ('Django', self.ada, self.web),
+                ('Flask', self.bob, self.web), ('Misc', self.bob, None),
+            ]
+        ]
+
+    def assert_counts_match_courses(self):
+        expected = {}
+        for course in Course.objects.all():
+            key = (course.category_id, course.teacher_id, timezone.localdate(course.created_at))
+            expected[key] = expected.get(key, 0) + 1
+        actual = {}
+        for row in CourseFacetCount.objects.all():
+            key = (row.category_id, row.teacher_id, row.day)
+            actual[key] = actual.get(key, 0) + row.course_count
+        self.assertEqual({key: count for key, count in actual.items() if count}, expected)
+
+    def test_counts_follow_course_writes(self):
+        self.assert_counts_match_courses()
+        intro = Course.objects.get(title='Intro')
+        intro.category = self.web
+        intro.save()
+        flask = Course.objects.get(title='Flask')
+        flask.teacher = self.ada
+        flask.save()
+        Course.objects.get(title='Misc').delete()
+        self.assert_counts_match_courses()
+        self.web.delete()
+        self.assert_counts_match_courses()
+        self.bob.delete()
+        self.assert_counts_match_courses()
+        self.assertEqual(refresh_facet_counts(), CourseFacetCount.objects.count())
+        self.assert_counts_match_courses()
+
+    def test_list_filters(self):
+        def titles(query):
+            response = self.client.get(f'/api/courses/?{query}')
+            self.assertEqual(response.status_code, 200, response.content)
+            return sorted(course['title'] for course in response.json()['results'])
+
+        self.assertEqual(titles(f'category={self.python.pk}'), ['Async', 'Intro'])
+        self.assertEqual(titles(f'category={self.web.pk}&teacher={self.bob.pk}'), ['Flask'])
+        self.assertEqual(titles('category=none'), ['Misc'])
+        Course.objects.filter(title='Intro').update(created_at=timezone.now() - timedelta(days=10))
+        today = timezone.localdate().isoformat()
+        self.assertEqual(titles(f'created_after={today}&category={self.python.pk}'), ['Async'])
+        self.assertEqual(titles(f'created_before={(timezone.localdate() - timedelta(days=1)).isoformat()}'), ['Intro'])
+        for query in (
+            'category=python', 'category=²', f'category={"9" * 30}', 'teacher=0', f'teacher={"9" * 30}',
+            'created_after=yesterday', f'created_after={today}&created_before=2000-01-01',
+        ):
+            self.assertEqual(self.client.get(f'/api/courses/?{query}').status_code, 400, query)
+            self.assertEqual(self.client.get(f'/api/courses/facets/?{query}').status_code, 400, query)
+
+    def test_facets_exclude_their_own_filter_and_skip_course_table(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/courses/facets/?category={self.python.pk}')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q['sql'] for q in queries.captured_queries if 'courses_course"' in q['sql']])
+        data = response.json()
+        self.assertEqual(data['total'], 2)
+        self.assertEqual(
+            [(entry['name'], entry['count']) for entry in data['categories']],
+            [('Python', 2), ('Web', 2), (None, 1)],
+        )
+        self.assertEqual([(entry['username'], entry['count']) for entry in data['teachers']], [('ada', 2)])
+        self.assertEqual(self.client.get(f'/api/courses/facets/?category={self.python.pk}')['X-Cache'], 'HIT')
+
+        data = self.client.get(f'/api/courses/facets/?teacher={self.bob.pk}').json()
+        self.assertEqual(data['total'], 2)
+        self.assertEqual([(entry['name'], entry['count']) for entry in data['categories']], [('Web', 1), (None, 1)])
+        self.assertEqual([(entry['username'], entry['count']) for entry in data['teachers']], [('ada', 3), ('bob', 2)])
+
+    def test_facets_with_date_range(self):
+        Course.objects.filter(title__in=['Intro', 'Flask']).update(created_at=timezone.now() - timedelta(days=10))
+        refresh_facet_counts()
+        data = self.client.get(f'/api/courses/facets/?created_after={timezone.localdate().isoformat()}').json()
+        self.assertEqual(data['total'], 3)
+        self.assertEqual([(entry['username'], entry['count']) for entry in data['teachers']], [('ada', 2), ('bob', 1)])
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        get_throttle_cache().clear()
+        self.client = APIClient()
+        self.calls = []
+        self.addCleanup(jobs.registry.pop, 'test_job', None)
+
+    def register_handler(self, fail_times=0, batch_size=10, max_attempts=None):
+        @jobs.handler('test_job', batch_size=batch_size, max_attempts=max_attempts)
+        def test_job(payloads):
+            self.calls.append([payload['n'] for payload in payloads])
+            if len(self.calls) <= fail_times:
+                raise RuntimeError('boom')
+
+    def make_due(self):
+        Job.objects.filter(run_at__isnull=False).update(run_at=timezone.now() - timedelta(seconds=1))
+
+    def test_registration_and_enrollment_queue_emails(self):
+        response = self.client.post('/api/register/', {
+            'username': 'newbie', 'email': 'newbie@example.com',
+            'password': 'Zx9!long-pass', 'password2': 'Zx9!long-pass',
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        student = User.objects.get(username='newbie')
+        teacher = User.objects.create_user('teacher', password='pass12345')
+        course = Course.objects.create(title='Django', teacher=teacher)
+        self.client.force_authenticate(student)
+        response = self.client.post('/api/enrollments/', {'course_id': course.pk}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        # Nothing is sent in the request
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(sorted(Job.objects.values_list('kind', flat=True)), ['send_enrollment_email', 'send_welcome_email'])
+
+        call_command('run_workers', '--once', stdout=io.StringIO())
+        self.assertEqual(sorted(message.subject for message in mail.outbox), ['Enrolled in Django', 'Welcome, newbie'])
+        self.assertEqual(set(Job.objects.values_list('status', flat=True)), {Job.DONE})
+
+    def test_worker_loop_recycles_connections_before_each_poll(self):
+        stop, events = threading.Event(), []
+
+        def run_due(limit):
+            events.append('run')
+            if len(events) == 4:
+                stop.set()
+            raise RuntimeError('database went away')
+
+        with mock.patch('courses.jobs.close_old_connections', lambda: events.append('close')), \
+                mock.patch('courses.jobs.run_due', run_due), mock.patch('courses.jobs.connections'), \
+                self.assertLogs('courses.jobs', 'ERROR'):
+            jobs.work(stop, poll_interval=0)
+        self.assertEqual(events, ['close', 'run', 'close', 'run'])
+
+    def test_idempotency_key_deduplicates(self):
+        jobs.enqueue('test_job', {'n': 1}, key='once')
+        jobs.enqueue('test_job', {'n': 2}, key='once')
+        self.assertEqual(Job.objects.filter(key='once').count(), 1)
+        self.register_handler()
+        jobs.drain()
+        jobs.enqueue('test_job', {'n': 3}, key='once')  # Already done: still not run again
+        jobs.drain()
+        self.assertEqual(self.calls, [[1]])
+
+    def test_jobs_of_a_kind_run_in_batches(self):
+        self.register_handler(batch_size=2)
+        jobs.enqueue_many('test_job', [{'n': n} for n in range(5)])
+        # Claim (due ids, update, fetch), then one update per batch
+        with self.assertNumQueries(3 + 3):
+            self.assertEqual(jobs.run_due(), 5)
+        self.assertEqual(self.calls, [[0, 1], [2, 3], [4]])
+
+    def test_failures_retry_with_backoff_then_fail(self):
+        self.register_handler(fail_times=10, max_attempts=3)
+        jobs.enqueue('test_job', {'n': 1})
+        self.enterContext(self.assertLogs('courses.jobs', 'ERROR'))
+        self.assertEqual(jobs.drain(), 1)
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('RuntimeError: boom', job.last_error)
+        first_delay = job.run_at - job.started_at
+
+        self.make_due()
+        jobs.drain()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 2))
+        self.assertGreater(job.run_at - job.started_at, first_delay * 1.1)
+
+        self.make_due()
+        jobs.drain()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.run_at), (Job.FAILED, 3, None))
+        self.assertEqual(len(self.calls), 3)
+
+    def test_expired_lease_is_taken_over(self):
+        self.register_handler()
+        jobs.enqueue('test_job', {'n': 1})
+        stale = jobs.claim(10)[0]
+        self.assertEqual(jobs.claim(10), [])
+        self.make_due()  # The first worker's lease ran out
+        self.assertEqual(jobs.drain(), 1)
+        # The first worker finishing late doesn't touch the job any more
+        jobs.fail([stale], None, 'late')
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts, job.last_error), (Job.DONE, 2, ''))
+
+    def test_metrics_report_depth_and_latency(self):
+        self.register_handler()
+        jobs.enqueue_many('test_job', [{'n': 1}, {'n': 2}])
+        self.assertEqual(jobs.get_stats()['depth'], {'test_job': {Job.QUEUED: 2, Job.RUNNING: 0}})
+        jobs.drain()
+        jobs.enqueue('test_job', {'n': 3})
+        admin = User.objects.create_user('admin', password='pass12345', is_staff=True)
+        self.client.force_authenticate(admin)
+        body = self.client.get('/api/metrics/').content.decode()
+        self.assertIn('api_jobs_pending{kind="test_job",status="queued"} 1', body)
+        self.assertIn('api_jobs_finished{kind="test_job"} 2', body)
+        self.assertIn('api_jobs_wait_seconds{kind="test_job",stat="max"}', body)
+
+
+@override_settings(API_SYNC_SETTLE=0)
+class ChangeFeedTests(TestCase):
+    def setUp(self):
+        get_throttle_cache().clear()
+        self.client = APIClient()
+        self.teacher = User.objects.create_user('teacher', password='pass12345')
+        self.teacher.profile.is_student = False
+        self.teacher.profile.is_teacher = True
+        self.teacher.profile.save()
+        self.student = User.objects.create_user('student', password='pass12345')
+        self.category = Category.objects.create(name='Programming')
+        self.courses = [Course.objects.create(title=f'Course {i}', teacher=self.teacher, category=self.category) for i in range(3)]
+
+    def sync(self, since=None, user=None, **params):
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+        if since is not None:
+            params['since'] = since
+        response = client.get('/api/changes/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_feed_returns_changes_and_tombstones_after_cursor(self):
+        cursor = self.sync()['cursor']
+        self.client.force_authenticate(self.teacher)
+        created = self.client.post('/api/courses/', {'title': 'New'}, format='json').json()
+        self.client.patch(f'/api/courses/{self.courses[0].pk}/', {'title': 'Renamed'}, format='json')
+        self.client.patch(f'/api/courses/{self.courses[0].pk}/', {'title': 'Renamed again'}, format='json')
+        self.assertEqual(self.client.delete(f'/api/courses/{self.courses[1].pk}/').status_code, 204)
+
+        feed = self.sync(cursor, fields='id,title')
+        self.assertEqual(
+            sorted(feed['courses']['changed'], key=lambda course: course['id']),
+            [{'id': self.courses[0].pk, 'title': 'Renamed again'}, {'id': created['id'], 'title': 'New'}],
+        )
+        self.assertEqual(feed['courses']['deleted'], [self.courses[1].pk])
+        self.assertNotIn('enrollments', feed)
+        self.assertFalse(feed['has_more'])
+        self.assertEqual(self.sync(feed['cursor'])['courses'], {'changed': [], 'deleted': []})
+
+    def test_category_rename_changes_its_courses(self):
+        cursor = self.sync()['cursor']
+        self.category.name = 'Coding'
+        self.category.save()
+        feed = self.sync(cursor, fields='id,category.name')
+        self.assertEqual(len(feed['courses']['changed']), 3)
+        self.assertEqual({course['category']['name'] for course in feed['courses']['changed']}, {'Coding'})
+
+    def test_students_get_their_own_enrollment_changes(self):
+        other = User.objects.create_user('other', password='pass12345')
+        cursor = self.sync(user=self.student)['cursor']
+        self.client.force_authenticate(self.student)
+        self.client.post('/api/enrollments/', {'course_id': self.courses[0].pk}, format='json')
+        self.client.post('/api/enrollments/bulk/', {'course_ids': [self.courses[1].pk, self.courses[2].pk]}, format='json')
+        self.assertEqual(self.client.delete(f'/api/courses/{self.courses[2].pk}/unenroll/').status_code, 204)
+        Enrollment.objects.create(student=other, course=self.courses[0])
+
+        feed = self.sync(cursor, self.student)
+        self.assertEqual(sorted(entry['course']['id'] for entry in feed['enrollments']['changed']), [self.courses[0].pk, self.courses[1].pk])
+        self.assertEqual(feed['enrollments']['deleted'], [self.courses[2].pk])
+        self.assertEqual(feed['courses'], {'changed': [], 'deleted': []})
+
+    def test_feed_pages_and_reads_only_entries_after_cursor(self):
+        cursor = int(self.sync()['cursor'])
+        for course in self.courses:
+            course.save()
+        # Oldest and latest entry, the entries after the cursor, the changed courses
+        with self.assertNumQueries(4):
+            feed = self.sync(cursor, fields='id')
+        self.assertEqual(len(feed['courses']['changed']), 3)
+        page = changes.read(cursor, limit=2)
+        self.assertTrue(page.has_more)
+        self.assertEqual(changes.read(page.cursor, limit=2).changed[ChangeLogEntry.COURSE], [self.courses[2].pk])
+
+    @override_settings(API_SYNC_SETTLE=60)
+    def test_cursor_waits_for_recent_entries_to_settle(self):
+        cursor = self.sync()['cursor']
+        self.courses[0].save()
+        feed = self.sync(cursor, fields='id')
+        self.assertEqual(feed['courses']['changed'], [{'id': self.courses[0].pk}])
+        self.assertEqual(feed['cursor'], cursor)  # Sent again next time
+
+    def test_pruned_cursor_is_gone(self):
+        cursor = self.sync()['cursor']
+        for course in self.courses:
+            course.save()
+        ChangeLogEntry.objects.update(created_at=timezone.now() - timedelta(days=60))
+        self.assertGreater(changes.prune(), 0)
+        response = self.client.get('/api/changes/', {'since': cursor})
+        self.assertEqual(response.status_code, 410)
+        self.assertEqual(self.client.get('/api/changes/', {'since': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/changes/', {'since': '²'}).status_code, 400)
+
+    def test_cursor_ahead_of_the_log_is_gone(self):
+        # E.g. issued before the database was reset
+        cursor = int(self.sync()['cursor'])
+        self.assertEqual(self.client.get('/api/changes/', {'since': cursor}).status_code, 200)
+        self.assertEqual(self.client.get('/api/changes/', {'since': cursor + 1}).status_code, 410)
+        self.assertEqual(self.client.get('/api/changes/', {'since': '9' * 30}).status_code, 410)
+        ChangeLogEntry.objects.all().delete()
+        self.assertEqual(self.client.get('/api/changes/', {'since': cursor}).status_code, 410)
+        self.assertEqual(self.client.get('/api/changes/', {'since': 0}).status_code, 200)
+
+
+@override_settings(ADMIN_PERFORMANCE_MODE=True, ADMIN_COUNT_LIMIT=5)
+class AdminPerformanceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('root', 'root@example.com', 'pass12345')
+        cls.teachers = [User.objects.create_user(f'teacher{i}') for i in range(3)]
+        cls.python = Course.objects.create(title='Python Basics', teacher=cls.teachers[0])
+        cls.intro = Course.objects.create(title='Intro to Python', teacher=cls.teachers[1])
+        Course.objects.bulk_create(Course(title=f'Course {i}', slug=f'course-{i}', teacher=cls.teachers[2]) for i in range(8))
+        cls.students = User.objects.bulk_create(User(username=f'student{i}') for i in range(8))
+        Enrollment.objects.bulk_create(Enrollment(student=student, course=cls.python) for student in cls.students)
+        Enrollment.objects.create(student=cls.teachers[0], course=cls.intro)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def changelist(self, model, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(f'/admin/courses/{model}/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(int(response['X-Query-Count']), len(ctx.captured_queries) - 2)  # Not the session and user
+        self.assertContains(response, f'{response["X-Query-Count"]} queries')
+        return response, ctx.captured_queries
+
+    def test_counts_are_capped(self):
+        response, queries = self.changelist('enrollment', course__id__exact=self.python.pk)
+        self.assertEqual(response.context['cl'].result_count, 6)
+        self.assertContains(response, 'Counted up to 6 rows')
+        self.assertFalse([query for query in queries if 'COUNT(*)' in query['sql'] and 'LIMIT' not in query['sql']])
+
+    def test_unfiltered_count_is_estimated_from_statistics(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        response, _ = self.changelist('enrollment')
+        self.assertEqual(response.context['cl'].result_count, 9)
+        self.assertContains(response, 'estimate')
+
+    def test_teacher_filter_loads_only_the_selected_teacher(self):
+        response, _ = self.changelist('course', teacher__id__exact=self.teachers[0].pk)
+        self.assertEqual([course.pk for course in response.context['cl'].result_list], [self.python.pk])
+        self.assertContains(response, 'data-filter-url')
+        self.assertContains(response, f'<option value="{self.teachers[0].pk}" selected>teacher0</option>', html=True)
+        self.assertNotContains(response, '>teacher1</option>')
+
+    def test_search_matches_prefixes(self):
+        response, _ = self.changelist('course', q='pyth')
+        self.assertEqual([course.pk for course in response.context['cl'].result_list], [self.python.pk])
+        response, _ = self.changelist('enrollment', q='intro')
+        self.assertEqual([enrollment.course_id for enrollment in response.context['cl'].result_list], [self.intro.pk])
+        response, _ = self.changelist('enrollment', q='teacher')
+        self.assertEqual(len(response.context['cl'].result_list), 1)
+
+    def test_search_folds_case_beyond_ascii(self):
+        course = Course.objects.create(title='Курс Python', teacher=self.teachers[0])
+        for term in ('Курс', 'курс', 'КУРС'):
+            response, _ = self.changelist('course', q=term)
+            self.assertEqual([found.pk for found in response.context['cl'].result_list], [course.pk])
+        course.title = 'Straße'
+        course.save()
+        response, _ = self.changelist('course', q='STRASS')
+        self.assertEqual([found.pk for found in response.context['cl'].result_list], [course.pk])
+
+    def test_user_search_keeps_email_and_names(self):
+        User.objects.create_user('jdoe', 'Jane.Doe@example.com', first_name='Jane')
+        for term in ('jane.doe@', 'JANE', 'JDoe'):
+            response = self.client.get('/admin/auth/user/', {'q': term})
+            self.assertEqual([user.username for user in response.context['cl'].result_list], ['jdoe'])
+
+    def test_autocomplete_uses_prefix_search(self):
+        response = self.client.get('/admin/autocomplete/', {
+            'app_label': 'courses', 'model_name': 'enrollment', 'field_name': 'course', 'term': 'python',
+        })
+        self.assertEqual([result['text'] for result in response.json()['results']], ['Python Basics'])
+
+    def test_change_form_reports_query_count(self):
+        response = self.client.get(f'/admin/courses/course/{self.python.pk}/change/')
+        self.assertContains(response, f'{response["X-Query-Count"]} queries')
+
+    @override_settings(ADMIN_PERFORMANCE_MODE=False)
+    def test_stock_admin_when_disabled(self):
+        response = self.client.get('/admin/courses/course/', {'q': 'pyth'})
+        self.assertEqual(len(response.context['cl'].result_list), 2)
+        self.assertNotIn('X-Query-Count', response)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], DATABASE_PIN_SECONDS=5)
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.router = routing.PrimaryReplicaRouter()
+        self.student = User.objects.create_user('student', password='pass12345')
+        self.other = User.objects.create_user('other', password='pass12345')
+        cache.clear()  # Creating the accounts pinned them
+
+    def route(self, method='get', user=None, view=None, **extra):
+        # The alias the view's reads go to (None: the primary)
+        routed = []
+
+        def get_response(request):
+            if view is not None:
+                view()
+            routed.append(self.router.db_for_read(Course))
+            return HttpResponse()
+
+        if user is not None:
+            extra['HTTP_AUTHORIZATION'] = f'Bearer {AccessToken.for_user(user)}'
+        routing.DatabaseRoutingMiddleware(get_response)(getattr(RequestFactory(), method)('/api/courses/', **extra))
+        return routed[0]
+
+    def test_reads_go_to_replicas_and_everything_else_to_the_primary(self):
+        self.assertEqual(self.route('get'), 'replica1')
+        self.assertEqual(self.route('get', self.student), 'replica1')
+        self.assertIsNone(self.route('post'))
+        self.assertIsNone(self.route('get', HTTP_COOKIE=f'{settings.SESSION_COOKIE_NAME}=x'))
+        self.assertIsNone(self.router.db_for_read(Course))  # Outside a request
+        self.assertEqual(self.router.db_for_write(Course), 'default')
+
+    def test_writer_reads_from_primary_for_the_pin_window(self):
+        write = lambda: self.router.db_for_write(Enrollment)
+        self.assertIsNone(self.route('post', self.student, view=write))
+        self.assertIsNone(self.route('get', self.student))
+        self.assertEqual(self.route('get', self.other), 'replica1')
+        cache.delete(routing.pin_key(self.student.pk))  # The window has passed
+        self.assertEqual(self.route('get', self.student), 'replica1')
+
+    def test_write_during_read_moves_the_rest_of_the_request_to_primary(self):
+        self.assertIsNone(self.route('get', self.student, view=lambda: self.router.db_for_write(Course)))
+        self.assertIsNone(self.route('get', self.student))
+
+    def test_new_accounts_and_fresh_cache_versions_read_from_primary(self):
+        user = User.objects.create_user('newcomer', password='pass12345')
+        self.assertIsNone(self.route('get', user))
+        self.assertIsNone(self.route('get', view=lambda: routing.read_primary_since(time.time())))
+        self.assertEqual(self.route('get', view=lambda: routing.read_primary_since(time.time() - 60)), 'replica1')
+
+    @override_settings(DATABASE_REPLICAS=['replica1', 'replica2', 'replica3'])
+    def test_one_replica_serves_every_read_of_a_request(self):
+        routed = []
+
+        def get_response(request):
+            routed.append({self.router.db_for_read(model) for model in (Course, Enrollment, User) for _ in range(10)})
+            return HttpResponse()
+
+        for _ in range(20):
+            routing.DatabaseRoutingMiddleware(get_response)(RequestFactory().get('/api/courses/'))
+        self.assertTrue(all(len(aliases) == 1 for aliases in routed))
+        self.assertGreater(len(set.union(*routed)), 1)  # Still spread across requests
+
+    def test_replicas_need_a_shared_cache(self):
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': '/tmp/x'}}
+        with override_settings(CACHES=locmem):
+            self.assertEqual([error.id for error in routing.check_pin_cache(None)], ['courses.E001'])
+        with override_settings(CACHES=shared):
+            self.assertEqual(routing.check_pin_cache(None), [])
+        with override_settings(CACHES=locmem, DATABASE_REPLICAS=[]):
+            self.assertEqual(routing.check_pin_cache(None), [])
+
+    @override_settings(
+        DATABASE_REPLICAS=['default'], DATABASE_ROUTERS=['courses.routing.PrimaryReplicaRouter'],
+        MIDDLEWARE=['courses.routing.DatabaseRoutingMiddleware'] + settings.MIDDLEWARE,
+    )
+    def test_enrollment_pins_the_student(self):
+        get_throttle_cache().clear()
+        course = Course.objects.create(title='Course', teacher=self.other)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.student)}')
+        self.assertEqual(client.post('/api/enrollments/', {'course_id': course.pk}, format='json').status_code, 201)
+        self.assertTrue(cache.get(routing.pin_key(self.student.pk)))
+        self.assertEqual(client.get('/api/enrollments/').json()['results'][0]['course']['id'], course.pk)
+        self.assertIsNone(cache.get(routing.pin_key(self.other.pk)))
+
+
+class StartupTests(TestCase):
+    def test_fresh_worker_serves_first_request_within_budget(self):
+        # A new interpreter, as a scaled-up worker; the request needs no database
+        with tempfile.TemporaryDirectory() as directory:
+            result = startup.measure('/api/enrollments/', {'DJANGO_DB_NAME': os.path.join(directory, 'db.sqlite3')})
+        self.assertEqual(result.status, 401)
+        for module in ('courses.admin', 'django.contrib.auth.admin', 'pytils'):
+            self.assertNotIn(module, result.modules)
+        self.assertTrue(any(name == 'courses.views' for name, _, _ in result.imports))
+        self.assertLess(result.total_ms, settings.STARTUP_BUDGET_MS, f'boot {result.boot_ms:.0f} ms, first response {result.first_response_ms:.0f} ms')
+
+    def test_admin_is_loaded_on_first_use(self):
+        with tempfile.TemporaryDirectory() as directory:
+            result = startup.measure('/admin/login/', {'DJANGO_DB_NAME': os.path.join(directory, 'db.sqlite3')})
+        self.assertEqual(result.status, 200)
+        self.assertIn('courses.admin', result.modules)
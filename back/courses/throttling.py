@@ -0,0 +1,65 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import ScopedRateThrottle, SimpleRateThrottle
+from .cache import record
+
+# DRF throttles with per-endpoint scopes; rates are REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'].
+# Request histories live in the API_THROTTLE_CACHE alias, a per-process locmem cache by
+# default: no round trip per request, but every worker counts on its own, so the
+# effective limit is the rate times the number of worker processes.
+
+
+def get_throttle_cache():
+    return caches[getattr(settings, 'API_THROTTLE_CACHE', 'throttle')]
+
+
+class LocalCacheThrottleMixin:
+    @property
+    def cache(self):
+        return get_throttle_cache()
+
+    def get_rate(self):
+        # Looked up per request (DRF reads the rates once, at import)
+        if not getattr(settings, 'API_THROTTLING', True):
+            return None
+        try:
+            return api_settings.DEFAULT_THROTTLE_RATES[self.scope]
+        except KeyError:
+            raise ImproperlyConfigured(f"No default throttle rate set for '{self.scope}' scope")
+
+    def throttle_failure(self):
+        record(f'throttled:{self.scope}')
+        return False
+
+
+# The view's throttle_scope, per user (or client address when anonymous)
+class ScopedThrottle(LocalCacheThrottleMixin, ScopedRateThrottle):
+    pass
+
+
+# Anonymous reads only: authenticated and write requests are left to the view's own scopes
+class AnonReadThrottle(LocalCacheThrottleMixin, SimpleRateThrottle):
+    scope = 'anon_read'
+
+    def get_cache_key(self, request, view):
+        if request.method not in SAFE_METHODS or (request.user and request.user.is_authenticated):
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+async def acheck_throttles(request, view):
+    # APIView.check_throttles for courses.async_views; locmem is called directly,
+    # like courses.cache.acache
+    local = isinstance(get_throttle_cache(), LocMemCache)
+    durations = []
+    for throttle in view.get_throttles():
+        allowed = throttle.allow_request(request, view) if local else await sync_to_async(throttle.allow_request)(request, view)
+        if not allowed:
+            durations.append(throttle.wait())
+    if durations:
+        view.throttled(request, max((duration for duration in durations if duration is not None), default=None))
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from . import views
@@ -9,9 +10,27 @@ router.register(r'courses', views.CourseViewSet, basename='course')
 urlpatterns = [
     path('register/', views.RegisterView.as_view(), name='register'),
     path('enrollments/', views.EnrollmentListCreateView.as_view(), name='enrollment-list-create'),
+    path('my-courses/', views.MyCoursesView.as_view(), name='my-courses'),
+    path('changes/', views.ChangeFeedView.as_view(), name='changes'),
+    path('enrollments/bulk/', views.BulkEnrollmentView.as_view(), name='enrollment-bulk'),
     path('enrollments/<int:pk>/', views.EnrollmentDetailView.as_view(), name='enrollment-detail'),
     path('test-fbv/', views.simple_test_view, name='test-fbv'), # BE-5: URL mapping for the required Function-Based View (FBV)
     path('courses/<int:course_pk>/unenroll/', views.UnenrollView.as_view(), name='course-unenroll'),
     path('course-count/', views.course_count_view, name='course-count'), # BE-5: URL mapping for the required Function-Based View (FBV 2/2+)
+    path('cache-stats/', views.cache_stats_view, name='cache-stats'),
+    path('metrics/', views.metrics_view, name='metrics'),
     path('', include(router.urls)),
-]
\ No newline at end of file
+]
+
+if settings.API_ASYNC_VIEWS:
+    from . import async_views
+
+    # Same names as the router/sync routes, so reverse() keeps working
+    urlpatterns[:0] = [
+        path('courses/', async_views.AsyncCourseListView.as_view(), name='course-list'),
+        path('courses/<int:pk>/', async_views.AsyncCourseDetailView.as_view(), name='course-detail'),
+        path('categories/', async_views.AsyncCategoryListView.as_view(), name='category-list'),
+        path('enrollments/', async_views.AsyncEnrollmentListView.as_view(), name='enrollment-list-create'),
+        path('my-courses/', async_views.AsyncMyCoursesView.as_view(), name='my-courses'),
+        path('course-count/', async_views.AsyncCourseCountView.as_view(), name='course-count'),
+    ]
@@ -3,42 +3,122 @@ from rest_framework import status
 from django.shortcuts import get_object_or_404
 from django.shortcuts import render
 from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef
+from django.http import HttpResponse
 from rest_framework import generics, permissions, viewsets
 from rest_framework.response import Response
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.exceptions import PermissionDenied
-from .models import Category, Course, Enrollment
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from .models import Category, ChangeLogEntry, Course, DashboardEntry, Enrollment
 from .serializers import (
-    RegisterSerializer, UserSerializer, CategorySerializer,
-    CourseSerializer, EnrollmentSerializer, SimpleMessageSerializer
+    RegisterSerializer, UserSerializer, CategorySerializer, parse_fields,
+    CourseSerializer, EnrollmentSerializer, SimpleMessageSerializer, BulkEnrollmentSerializer,
+    DashboardEntrySerializer
 )
+from .authentication import get_full_user
+from .fastpath import FastListMixin
+from .renderers import FastJSONRenderer
+from . import changes, dashboard, facets, jobs, notifications, profiling
+from .cache import (
+    CachedReadMixin, RESOURCE_CATEGORIES, RESOURCE_COURSES, RESOURCE_ENROLLMENT_COUNTS, bump_object_versions, get_cache,
+    get_stats, get_version, render_stats,
+)
+from .counters import deferred_counts, refresh_enrollment_counts
+from .pagination import CourseCursorPagination, DashboardCursorPagination, EnrollmentCursorPagination
+from .search import get_search_backend, DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT
+from .throttling import AnonReadThrottle, ScopedThrottle
 from .permissions import IsTeacher, IsStudent, IsTeacherOwnerOrReadOnly, IsStudentOwnerOrReadOnly
 from rest_framework_simplejwt.views import TokenObtainPairView
 from .serializers import MyTokenObtainPairSerializer
 
+MAX_INTEGER = 2 ** 63 - 1  # Largest integer SQLite and Postgres bigint accept
+
 # BE-5: CBV (1/2+) | BE-6: Handles JWT Login
 class MyTokenObtainPairView(TokenObtainPairView):
     serializer_class = MyTokenObtainPairSerializer
+    throttle_classes = [ScopedThrottle]
+    throttle_scope = 'login'
 
 # BE-5: CBV (2/2+) - Handles user registration
 class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
     permission_classes = (permissions.AllowAny,)
     serializer_class = RegisterSerializer
+    throttle_classes = [ScopedThrottle]
+    throttle_scope = 'register'
 
 # BE-5: CBV (ViewSet) - Handles Category List/Retrieve (ReadOnly)
-class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
+class CategoryViewSet(CachedReadMixin, FastListMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    throttle_classes = [AnonReadThrottle]
+    cache_resource = RESOURCE_CATEGORIES
 
 # BE-5: CBV (ViewSet) | BE-7: Provides Authenticated CRUD for Course model
-class CourseViewSet(viewsets.ModelViewSet):
+class CourseViewSet(CachedReadMixin, FastListMixin, viewsets.ModelViewSet):
     queryset = Course.objects.all().select_related('teacher', 'category', 'teacher__profile')
     serializer_class = CourseSerializer
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    pagination_class = CourseCursorPagination
+    throttle_classes = [AnonReadThrottle]
+    cache_resource = RESOURCE_COURSES
+    # An enrollment invalidates the cached pages showing that course's count only
+    cache_dependency = (RESOURCE_ENROLLMENT_COUNTS, 'enrollment_count')
+
+    def get_cache_resources(self):
+        # Popular and min_enrollments lists follow every count, and so does a count shown
+        # without the id it is versioned by
+        params = self.request.query_params
+        fields = self.get_requested_fields()
+        if (self.action == 'list' and (params.get('ordering') == 'popular' or 'min_enrollments' in params)
+                or fields and 'enrollment_count' in fields and 'id' not in fields):
+            return (RESOURCE_COURSES, RESOURCE_ENROLLMENT_COUNTS)
+        return (RESOURCE_COURSES,)
+
+    def get_requested_fields(self):
+        # ?fields= sparse fieldsets apply to reads only; writes always validate the full serializer
+        if self.request.method not in permissions.SAFE_METHODS:
+            return None
+        return parse_fields(self.request.query_params.get('fields')) or None
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_requested_fields()
+        if fields:
+            kwargs['fields'] = fields
+        return super().get_serializer(*args, **kwargs)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields = self.get_requested_fields()
+        if fields:
+            queryset = CourseSerializer.optimize_queryset(queryset, fields)
+        if self.action in ('list', 'search'):
+            queryset = facets.filter_courses(queryset, self.get_filters())
+        # isdecimal(): isdigit() also accepts '²', which int() rejects. Values past the
+        # 64-bit range the database binds are clamped (no count reaches them anyway).
+        min_enrollments = self.request.query_params.get('min_enrollments', '')
+        if min_enrollments.isdecimal():
+            queryset = queryset.filter(enrollment_count__gte=min(int(min_enrollments), MAX_INTEGER))
+        user = self.request.user
+        if user and user.is_authenticated:
+            # Resolve is_enrolled for every row in the same query instead of one EXISTS per course
+            queryset = queryset.annotate(
+                enrolled=Exists(Enrollment.objects.filter(course=OuterRef('pk'), student_id=user.id))
+            )
+        return queryset
+
+    def get_filters(self):
+        # ?category=, ?teacher=, ?created_after=, ?created_before= (courses.facets)
+        if not hasattr(self, '_filters'):
+            self._filters = facets.parse_filters(self.request.query_params)
+        return self._filters
 
     def get_permissions(self):
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'search', 'facets']:
             permission_classes_list = [permissions.AllowAny]
         elif self.action == 'create':
             permission_classes_list = [permissions.IsAuthenticated, IsTeacher]
@@ -47,23 +127,221 @@ class CourseViewSet(viewsets.ModelViewSet):
         return [permission() for permission in permission_classes_list]
 
     def perform_create(self, serializer):
-         serializer.save(teacher=self.request.user)
+         # The insert and the category counter update (post_save) commit together
+         with transaction.atomic():
+             serializer.save(teacher=get_full_user(self.request.user))
+
+    # Updates and deletes too: their signal handlers write counters, facet counts,
+    # dashboard rows and the change log, which must commit or roll back with the row
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            serializer.save()
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+
+    # Ranked prefix search over title, description, category and teacher via the search index
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        query = request.query_params.get('q', '')
+        try:
+            limit = min(max(int(request.query_params.get('limit', DEFAULT_SEARCH_LIMIT)), 1), MAX_SEARCH_LIMIT)
+        except ValueError:
+            limit = DEFAULT_SEARCH_LIMIT
+        courses = get_search_backend().search(self.get_queryset(), query, limit)
+        serializer = self.get_serializer(courses, many=True)
+        return Response({"query": query, "results": serializer.data})
+
+    # Course counts per category and per teacher under the current filters, from the
+    # CourseFacetCount aggregates; anonymous responses are cached like list()
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        return self.cached_response(lambda request: Response(facets.summary(self.get_filters())), request)
+
+ENROLLMENT_RELATED = ('student', 'student__profile', 'course', 'course__category', 'course__teacher', 'course__teacher__profile')
 
 # BE-5: CBV | BE-7: Provides Authenticated Create/List for Enrollment model
-class EnrollmentListCreateView(generics.ListCreateAPIView):
+class EnrollmentListCreateView(FastListMixin, generics.ListCreateAPIView):
      serializer_class = EnrollmentSerializer
+     renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
      permission_classes = [permissions.IsAuthenticated]
+     pagination_class = EnrollmentCursorPagination
 
      def get_queryset(self):
          user = self.request.user
          if hasattr(user, 'profile') and user.profile.is_student:
-              return Enrollment.objects.filter(student=user).select_related('student', 'course', 'course__teacher')
+              return Enrollment.objects.filter(student_id=user.id).select_related(*ENROLLMENT_RELATED)
          return Enrollment.objects.none()
 
      def perform_create(self, serializer):
          if not (hasattr(self.request.user, 'profile') and self.request.user.profile.is_student):
               raise PermissionDenied("Only students can enroll in courses.")
-         serializer.save(student=self.request.user)
+         # The insert and the enrollment counter update (post_save) commit together
+         with transaction.atomic():
+             serializer.save(student=get_full_user(self.request.user))
+
+# Student dashboard served from the DashboardEntry read model: a page is one range scan
+# on dashboard_student_date_idx, however many enrollments the student has
+class MyCoursesView(FastListMixin, generics.ListAPIView):
+    serializer_class = DashboardEntrySerializer
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = DashboardCursorPagination
+
+    def get_queryset(self):
+        return DashboardEntry.objects.filter(student_id=self.request.user.id)
+
+def create_enrollments(enrollments):
+    # Returns the enrollments this request inserted. A pair a concurrent request enrolled
+    # first fails the whole insert (unique_together); it is dropped and the rest retried,
+    # so only rows created here are reported, notified and logged.
+    while enrollments:
+        try:
+            with transaction.atomic():
+                return Enrollment.objects.bulk_create(enrollments)
+        except IntegrityError:
+            taken = set(Enrollment.objects.filter(
+                student_id__in={enrollment.student_id for enrollment in enrollments},
+                course_id__in={enrollment.course_id for enrollment in enrollments},
+            ).values_list('student_id', 'course_id'))
+            remaining = [e for e in enrollments if (e.student_id, e.course_id) not in taken]
+            if len(remaining) == len(enrollments):
+                raise
+            enrollments = remaining
+    return []
+
+# Batch enroll/unenroll: set-based validation and one bulk write inside a single transaction
+class BulkEnrollmentView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, format=None):
+        serializer = BulkEnrollmentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        user = request.user
+        profile = getattr(user, 'profile', None)
+
+        if 'student_ids' in data:
+            if not (user.is_staff or (profile and profile.is_teacher)):
+                raise PermissionDenied("Only staff and teachers can enroll other students.")
+            student_ids = set(
+                User.objects.filter(pk__in=data['student_ids'], profile__is_student=True).values_list('pk', flat=True)
+            )
+            requested_students = data['student_ids']
+        else:
+            if not (profile and profile.is_student):
+                raise PermissionDenied("Only students can enroll in courses.")
+            student_ids = {user.pk}
+            requested_students = [user.pk]
+
+        course_teachers = dict(Course.objects.filter(pk__in=data['course_ids']).values_list('pk', 'teacher_id'))
+        # Teachers manage cohorts for their own courses only
+        restricted = 'student_ids' in data and not user.is_staff
+
+        with transaction.atomic():
+            existing = dict(
+                ((student_id, course_id), pk) for pk, student_id, course_id in
+                Enrollment.objects.filter(student_id__in=student_ids, course_id__in=course_teachers.keys())
+                .values_list('pk', 'student_id', 'course_id')
+            )
+            results, to_create, to_delete = [], [], []
+            for student_id in requested_students:
+                for course_id in data['course_ids']:
+                    if student_id not in student_ids:
+                        result = 'student_not_found'
+                    elif course_id not in course_teachers:
+                        result = 'course_not_found'
+                    elif restricted and course_teachers[course_id] != user.pk:
+                        result = 'forbidden'
+                    elif data['action'] == 'enroll':
+                        if (student_id, course_id) in existing:
+                            result = 'already_enrolled'
+                        else:
+                            to_create.append(Enrollment(student_id=student_id, course_id=course_id))
+                            result = 'enrolled'  # unless a concurrent request wins the insert
+                    elif (student_id, course_id) in existing:
+                        to_delete.append(existing[(student_id, course_id)])
+                        result = 'unenrolled'
+                    else:
+                        result = 'not_enrolled'
+                    results.append({"student_id": student_id, "course_id": course_id, "result": result})
+
+            with deferred_counts():
+                created = create_enrollments(to_create)
+                if to_delete:
+                    Enrollment.objects.filter(pk__in=to_delete).delete()
+            if len(created) < len(to_create):
+                created_pairs = {(enrollment.student_id, enrollment.course_id) for enrollment in created}
+                for result in results:
+                    if result['result'] == 'enrolled' and (result['student_id'], result['course_id']) not in created_pairs:
+                        result['result'] = 'already_enrolled'
+                to_create = created
+            # bulk_create sends no signals, so recount the touched courses in one statement
+            if to_create:
+                refresh_enrollment_counts({enrollment.course_id for enrollment in to_create})
+                dashboard.add_entries(Enrollment.objects.filter(
+                    student_id__in={enrollment.student_id for enrollment in to_create},
+                    course_id__in={enrollment.course_id for enrollment in to_create},
+                ))
+                notifications.enqueue_enrollment_emails(to_create)
+                changes.record_enrollments(to_create)
+                bump_object_versions(RESOURCE_ENROLLMENT_COUNTS, {enrollment.course_id for enrollment in to_create})
+
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+# Delta sync: ?since=<cursor> returns the courses created, updated or deleted after the
+# cursor (in the ?fields= shape of the course list) and, for students, their enrollment
+# changes, each read from the change log (courses.changes). Without ?since= it returns the
+# current cursor: take it, load the lists, then sync from it. 410 means the cursor is
+# older than the retained log or ahead of it (e.g. after a database reset), and the
+# client must reload.
+class ChangeFeedView(APIView):
+    permission_classes = [permissions.AllowAny]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    throttle_classes = [AnonReadThrottle]
+
+    def get(self, request, format=None):
+        user = request.user
+        profile = getattr(user, 'profile', None) if user.is_authenticated else None
+        student_id = user.id if profile and profile.is_student else None
+        since = request.query_params.get('since')
+        if since is None:
+            feed = changes.Feed(changes.latest_cursor(), False)
+        elif not since.isdecimal():  # isdigit() also accepts '²', which int() rejects
+            raise ValidationError({'since': 'Expected a cursor returned by this endpoint.'})
+        else:
+            try:
+                feed = changes.read(int(since), student_id)
+            except changes.CursorExpired:
+                return Response({'detail': 'The cursor has expired; reload and sync again.'}, status=status.HTTP_410_GONE)
+
+        fields = parse_fields(request.query_params.get('fields')) or None
+        courses = CourseViewSet.queryset.filter(pk__in=feed.changed[ChangeLogEntry.COURSE])
+        if fields:
+            courses = CourseSerializer.optimize_queryset(courses, fields)
+        courses = list(courses)
+        # Deleted again after the last entry read: report it with the tombstones
+        gone = set(feed.changed[ChangeLogEntry.COURSE]) - {course.pk for course in courses}
+        data = {
+            'cursor': str(feed.cursor),
+            'has_more': feed.has_more,
+            'courses': {
+                'changed': CourseSerializer(courses, many=True, fields=fields, context={'request': request}).data,
+                'deleted': feed.deleted[ChangeLogEntry.COURSE] + sorted(gone),
+            },
+        }
+        if student_id is not None:
+            enrollments = list(Enrollment.objects.filter(
+                student_id=student_id, course_id__in=feed.changed[ChangeLogEntry.ENROLLMENT]
+            ).select_related(*ENROLLMENT_RELATED))
+            gone = set(feed.changed[ChangeLogEntry.ENROLLMENT]) - {enrollment.course_id for enrollment in enrollments}
+            # Enrollments are keyed by course id: tombstones list the courses left
+            data['enrollments'] = {
+                'changed': EnrollmentSerializer(enrollments, many=True, context={'request': request}).data,
+                'deleted': feed.deleted[ChangeLogEntry.ENROLLMENT] + sorted(gone),
+            }
+        return Response(data)
 
 # BE-5: CBV | BE-7: Provides Authenticated Retrieve/Delete for Enrollment model
 class EnrollmentDetailView(generics.RetrieveDestroyAPIView):
@@ -73,9 +351,14 @@ class EnrollmentDetailView(generics.RetrieveDestroyAPIView):
     def get_queryset(self):
         user = self.request.user
         if hasattr(user, 'profile') and user.profile.is_student:
-             return Enrollment.objects.filter(student=user)
+             return Enrollment.objects.filter(student_id=user.id)
         return Enrollment.objects.none()
 
+    def perform_destroy(self, instance):
+        # The delete, the enrollment counter, dashboard row and change log entry commit together
+        with transaction.atomic():
+            instance.delete()
+
 # BE-5: FBV (1/2) - Example Function-Based View
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
@@ -101,13 +384,14 @@ class UnenrollView(APIView):
             )
         course = get_object_or_404(Course, pk=course_pk)
         try:
-            enrollment = Enrollment.objects.get(student=student, course=course)
+            enrollment = Enrollment.objects.get(student_id=student.id, course=course)
         except Enrollment.DoesNotExist:
             return Response(
                 {"detail": "You are not enrolled in this course."},
                 status=status.HTTP_404_NOT_FOUND
             )
-        enrollment.delete()
+        with transaction.atomic():
+            enrollment.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 # BE-5: FBV (2/2+) - Example #2 Function-Based View
@@ -115,7 +399,22 @@ class UnenrollView(APIView):
 @permission_classes([permissions.IsAuthenticated]) 
 def course_count_view(request):
     try:
-        count = Course.objects.count() 
+        # Counted once per course-cache version instead of a COUNT(*) on every call
+        key = f'api:course-count:{get_version(RESOURCE_COURSES):.3f}'
+        count = get_cache().get_or_set(key, Course.objects.count, None)
         return Response({"total_courses": count}, status=status.HTTP_200_OK)
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+# Hit/miss counters of the anonymous read cache (staff only)
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def cache_stats_view(request):
+    return Response(get_stats(), status=status.HTTP_200_OK)
+
+# Prometheus text format (staff only): cache and throttle counters, job queue depth and
+# latency, and the request profiling histograms when API_PROFILING is on
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def metrics_view(request):
+    return HttpResponse(render_stats() + jobs.render_stats() + profiling.registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
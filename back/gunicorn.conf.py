@@ -0,0 +1,12 @@
+import os
+
+# gunicorn core.wsgi:application (picks up this file from the working directory).
+# The application, including courses.startup.warm(), is loaded once in the master and
+# forked, so a worker started by a scale-up or a restart serves its first request
+# without importing Django or the API. warm() opens no database connection, so
+# workers never share one inherited from the master.
+preload_app = True
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
@@ -1,15 +1,20 @@
 import { Component, OnInit } from '@angular/core';
 import { CommonModule } from '@angular/common';
+import { FormsModule } from '@angular/forms';
 import { RouterLink } from '@angular/router';
-import { Observable, catchError, of } from 'rxjs';
-import { CourseService, Course } from '../../services/course.service'; // FE-1: Importing API data interface | FE-2: Importing service for API data access
+import { BehaviorSubject, Observable, catchError, concatMap, of, scan, tap } from 'rxjs';
+import { CourseService, Course, CourseFacets, CourseFilters, Page } from '../../services/course.service'; // FE-1: Importing API data interface | FE-2: Importing service for API data access
 import { ToastrService } from 'ngx-toastr';
 
+// Only what the cards render; skips the full description and nested profiles
+const LIST_FIELDS = 'id,title,summary,created_at,teacher.username,category.name';
+
 @Component({
   selector: 'app-course-list',
   standalone: true,
   imports: [
     CommonModule, // FE-7: Required for async pipe/*ngIf/*ngFor
+    FormsModule,  // ngModel on the filter controls
     RouterLink    // FE-6: Required for routerLink
   ],
   templateUrl: './course-list.component.html',
@@ -18,6 +23,10 @@ import { ToastrService } from 'ngx-toastr';
 export class CourseListComponent implements OnInit {
   courses$: Observable<Course[]>; // FE-2: Observable holding API data from service
   errorLoading: boolean = false;
+  nextPageUrl: string | null = null; // Cursor link to the next page, null on the last page
+  filters: CourseFilters = {}; // Applied by the API; the facet counts follow them
+  facets$: Observable<CourseFacets | null> = of(null);
+  private pageUrl$ = new BehaviorSubject<string | null>(null);
 
   constructor(
     private courseService: CourseService, // FE-2: Injecting service for API data access
@@ -30,15 +39,50 @@ export class CourseListComponent implements OnInit {
     this.loadCourses();
   }
 
+  applyFilters(): void {
+    this.loadCourses();
+  }
+
+  clearFilters(): void {
+    this.filters = {};
+    this.loadCourses();
+  }
+
   loadCourses(): void { // FE-2: Method calling service to fetch API data
     this.errorLoading = false;
-    this.courses$ = this.courseService.getCourses().pipe( // FE-2: Calling service method
+    this.nextPageUrl = null;
+    this.pageUrl$ = new BehaviorSubject<string | null>(null);
+    this.facets$ = this.courseService.getCourseFacets(this.filters).pipe(
       catchError(error => {
-        console.error('Error fetching courses:', error);
-        this.toastr.error('Failed to load courses. Please try again later.', 'Error');
-        this.errorLoading = true;
-        return of([]);
+        console.error('Error fetching course facets:', error);
+        return of(null);
       })
     );
+    this.courses$ = this.pageUrl$.pipe(
+      concatMap(url => this.fetchPage(url).pipe( // FE-2: Calling service method
+        catchError(error => {
+          console.error('Error fetching courses:', error);
+          this.toastr.error('Failed to load courses. Please try again later.', 'Error');
+          this.errorLoading = true;
+          return of<Page<Course>>({ next: null, previous: null, results: [] });
+        })
+      )),
+      tap(page => this.nextPageUrl = page.next),
+      scan((courses: Course[], page) => [...courses, ...page.results], [] as Course[])
+    );
+  }
+
+  // The unfiltered catalog is kept by the service and synced through the change feed
+  private fetchPage(url: string | null): Observable<Page<Course>> {
+    const filtered = Object.values(this.filters).some(value => value !== null && value !== undefined && value !== '');
+    return filtered
+      ? this.courseService.getCourses(url, LIST_FIELDS, this.filters)
+      : this.courseService.getCatalogPage(url, LIST_FIELDS);
+  }
+
+  loadMore(): void { // Fetches the next page lazily instead of the whole catalog
+    if (this.nextPageUrl) {
+      this.pageUrl$.next(this.nextPageUrl);
+    }
   }
 }
\ No newline at end of file
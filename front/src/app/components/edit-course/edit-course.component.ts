@@ -71,7 +71,7 @@ export class EditCourseComponent implements OnInit {
            return;
         }
         this.courseData.title = course.title;
-        this.courseData.description = course.description;
+        this.courseData.description = course.description ?? '';
         this.courseData.category_id = course.category?.id ?? null;
         this.pageTitle = `Edit: ${course.title}`;
         this.isLoadingCourse = false;
@@ -1,8 +1,8 @@
 import { Component, OnInit } from '@angular/core';
 import { CommonModule } from '@angular/common';
 import { RouterLink } from '@angular/router';
-import { Observable, of, catchError } from 'rxjs';
-import { CourseService, Enrollment } from '../../services/course.service'; // FE-1: Importing API data interface | FE-2: Importing service for API data access
+import { BehaviorSubject, Observable, of, catchError, concatMap, scan, tap } from 'rxjs';
+import { CourseService, DashboardEntry, Page } from '../../services/course.service'; // FE-1: Importing API data interface | FE-2: Importing service for API data access
 import { ToastrService } from 'ngx-toastr';
 
 @Component({
@@ -14,8 +14,10 @@ import { ToastrService } from 'ngx-toastr';
 })
 export class MyCoursesComponent implements OnInit {
 
-  enrollments$: Observable<Enrollment[]>; // FE-2: Observable holding API data from service
+  enrollments$: Observable<DashboardEntry[]>; // FE-2: Observable holding API data from service
   errorLoading: boolean = false;
+  nextPageUrl: string | null = null; // Cursor link to the next page, null on the last page
+  private pageUrl$ = new BehaviorSubject<string | null>(null);
 
   constructor(
     private courseService: CourseService, // FE-2: Injecting service for API data access
@@ -30,14 +32,26 @@ export class MyCoursesComponent implements OnInit {
 
   loadEnrollments(): void { // FE-2: Method calling service to fetch API data | BE-7: Fetches enrollments for authenticated user
     this.errorLoading = false;
-    this.enrollments$ = this.courseService.getMyEnrollments().pipe( // FE-2: Calling service method
-      catchError(error => {
-        console.error('Error fetching enrollments:', error);
-        this.toastr.error('Failed to load your enrolled courses.', 'Error');
-        this.errorLoading = true;
-        return of([]);
-      })
+    this.nextPageUrl = null;
+    this.pageUrl$ = new BehaviorSubject<string | null>(null);
+    this.enrollments$ = this.pageUrl$.pipe(
+      concatMap(url => this.courseService.getMyCourses(url).pipe( // FE-2: Calling service method
+        catchError(error => {
+          console.error('Error fetching enrollments:', error);
+          this.toastr.error('Failed to load your enrolled courses.', 'Error');
+          this.errorLoading = true;
+          return of<Page<DashboardEntry>>({ next: null, previous: null, results: [] });
+        })
+      )),
+      tap(page => this.nextPageUrl = page.next),
+      scan((enrollments: DashboardEntry[], page) => [...enrollments, ...page.results], [] as DashboardEntry[])
     );
   }
 
+  loadMore(): void {
+    if (this.nextPageUrl) {
+      this.pageUrl$.next(this.nextPageUrl);
+    }
+  }
+
 }
\ No newline at end of file
@@ -1,14 +1,15 @@
 // src/app/services/course.service.ts
 
 import { Injectable } from '@angular/core';
-import { HttpClient } from '@angular/common/http';
-import { Observable } from 'rxjs';
+import { HttpClient, HttpParams } from '@angular/common/http';
+import { EMPTY, Observable, catchError, concatMap, expand, last, map, tap, throwError } from 'rxjs';
 
 // Интерфейс для Категории
 export interface Category {
   id: number;
   name: string;
   slug: string;
+  course_count?: number; // Количество курсов в категории
 }
 
 // Интерфейс для Курса
@@ -16,12 +17,14 @@ export interface Course {
   id: number;
   title: string;
   slug: string;
-  description: string;
+  description?: string; // Не входит в облегчённый список (?fields=...)
+  summary?: string; // Первые 200 символов описания
   created_at: string;
   updated_at: string;
   category?: Category | null;
   teacher?: { id: number; username: string; email?: string; first_name?: string; last_name?: string };
   is_enrolled?: boolean; // Статус записи для текущего юзера
+  enrollment_count?: number; // Количество записавшихся студентов
 }
 
 // Интерфейс для Записи (Enrollment)
@@ -32,6 +35,56 @@ export interface Enrollment {
   course: Course;
 }
 
+// Строка дашборда "Мои курсы" (денормализованная, см. /api/my-courses/)
+export interface DashboardEntry {
+  id: number; // ID записи (enrollment)
+  course_id: number;
+  course_title: string;
+  course_slug: string;
+  course_summary: string; // Первые 200 символов описания
+  teacher_username: string;
+  category_name: string; // Пустая строка, если категории нет
+  enrolled_at: string;
+}
+
+// Фильтры каталога (выполняются на сервере, см. /api/courses/?category=...)
+export interface CourseFilters {
+  category?: number | 'none' | null; // 'none' — курсы без категории
+  teacher?: number | null;
+  created_after?: string | null; // YYYY-MM-DD, включительно
+  created_before?: string | null; // YYYY-MM-DD, включительно
+}
+
+// Количество курсов по категориям и преподавателям для текущих фильтров (/api/courses/facets/)
+export interface CourseFacets {
+  total: number;
+  categories: { id: number | null; name: string | null; slug: string | null; count: number }[];
+  teachers: { id: number; username: string; count: number }[]; // Только преподаватели с наибольшим числом курсов
+}
+
+// Изменения после курсора (/api/changes/?since=...)
+export interface ChangeFeed {
+  cursor: string;
+  has_more: boolean; // Есть ещё изменения: повторить запрос с новым курсором
+  courses: { changed: Course[]; deleted: number[] };
+  enrollments?: { changed: Enrollment[]; deleted: number[] }; // Только для студентов; deleted — ID курсов
+}
+
+// Загруженные страницы каталога без фильтров и курсор, с которого они синхронизируются
+interface CatalogSnapshot {
+  cursor: string;
+  fields: string;
+  courses: Course[];
+  next: string | null;
+}
+
+// Страница ответа с курсорной пагинацией
+export interface Page<T> {
+  next: string | null;
+  previous: string | null;
+  results: T[];
+}
+
 // Тип для данных при обновлении курса
 type CourseUpdateData = Partial<{
   title: string;
@@ -46,13 +99,137 @@ type CourseUpdateData = Partial<{
 export class CourseService {
   private apiUrl = 'http://127.0.0.1:8000/api'; // Базовый URL API
 
+  private catalog: CatalogSnapshot | null = null;
+
   constructor(private http: HttpClient) { }
 
   /**
-   * Получает список всех курсов.
+   * Получает страницу списка курсов.
+   * @param pageUrl - ссылка `next` из предыдущей страницы (первая страница, если не указана)
+   * @param filters - фильтры каталога
+   */
+  getCourses(pageUrl?: string | null, fields?: string, filters: CourseFilters = {}): Observable<Page<Course>> {
+    // Ссылка на следующую страницу уже содержит параметры fields и фильтры
+    if (pageUrl) {
+      return this.http.get<Page<Course>>(pageUrl);
+    }
+    let params = this.filterParams(filters);
+    if (fields) {
+      params = params.set('fields', fields);
+    }
+    return this.http.get<Page<Course>>(`${this.apiUrl}/courses/`, { params });
+  }
+
+  /**
+   * Получает количество курсов по категориям и преподавателям для фильтров.
+   * @param filters - фильтры каталога
    */
-  getCourses(): Observable<Course[]> {
-    return this.http.get<Course[]>(`${this.apiUrl}/courses/`);
+  getCourseFacets(filters: CourseFilters = {}): Observable<CourseFacets> {
+    return this.http.get<CourseFacets>(`${this.apiUrl}/courses/facets/`, { params: this.filterParams(filters) });
+  }
+
+  /**
+   * Страница каталога без фильтров. При повторном открытии списка уже загруженные
+   * страницы обновляются через /api/changes/ вместо повторной загрузки.
+   * @param pageUrl - ссылка `next` из предыдущей страницы (первая страница, если не указана)
+   * @param fields - поля курсов (?fields=)
+   */
+  getCatalogPage(pageUrl: string | null, fields: string): Observable<Page<Course>> {
+    const snapshot = this.catalog;
+    if (pageUrl) {
+      return this.getCourses(pageUrl).pipe(tap(page => {
+        if (snapshot && snapshot.next === pageUrl) {
+          snapshot.courses = [...snapshot.courses, ...page.results];
+          snapshot.next = page.next;
+        }
+      }));
+    }
+    if (!snapshot || snapshot.fields !== fields) {
+      // Курсор берётся до загрузки: изменения между запросами придут при следующей синхронизации
+      return this.getChanges(null).pipe(
+        concatMap(feed => this.getCourses(null, fields).pipe(
+          tap(page => this.catalog = { cursor: feed.cursor, fields, courses: page.results, next: page.next })
+        ))
+      );
+    }
+    return this.syncCatalog(snapshot).pipe(
+      map(() => ({ next: snapshot.next, previous: null, results: snapshot.courses })),
+      catchError(error => {
+        if (error.status !== 410) {
+          return throwError(() => error);
+        }
+        // Курсор устарел: загружаем заново
+        this.catalog = null;
+        return this.getCatalogPage(null, fields);
+      })
+    );
+  }
+
+  /**
+   * Получает изменения курсов (и записей текущего студента) после курсора.
+   * Без курсора возвращает только текущий курсор.
+   * @param since - курсор из предыдущего ответа
+   * @param fields - поля курсов (?fields=)
+   */
+  getChanges(since: string | null, fields?: string): Observable<ChangeFeed> {
+    let params = new HttpParams();
+    if (since) {
+      params = params.set('since', since);
+    }
+    if (fields) {
+      params = params.set('fields', fields);
+    }
+    return this.http.get<ChangeFeed>(`${this.apiUrl}/changes/`, { params });
+  }
+
+  // Применяет все изменения после курсора снимка, страница за страницей
+  private syncCatalog(snapshot: CatalogSnapshot): Observable<ChangeFeed> {
+    return this.getChanges(snapshot.cursor, snapshot.fields).pipe(
+      expand(feed => feed.has_more ? this.getChanges(feed.cursor, snapshot.fields) : EMPTY),
+      tap(feed => {
+        this.applyChanges(snapshot, feed);
+        snapshot.cursor = feed.cursor;
+      }),
+      last()
+    );
+  }
+
+  // Список отсортирован по дате создания (новые первыми): изменённые курсы заменяются на
+  // месте, новые добавляются в начало; курсы с ещё не загруженных страниц пропускаются
+  private applyChanges(snapshot: CatalogSnapshot, feed: ChangeFeed): void {
+    const removed = new Set<number>(feed.courses.deleted);
+    const changed = new Map(feed.courses.changed.map(course => [course.id, course]));
+    const courses = snapshot.courses
+      .filter(course => !removed.has(course.id))
+      .map(course => {
+        const update = changed.get(course.id);
+        changed.delete(course.id);
+        return update ?? course;
+      });
+    const newest = courses.length ? courses[0].created_at : '';
+    const added = [...changed.values()]
+      .filter(course => course.created_at > newest)
+      .sort((a, b) => b.created_at.localeCompare(a.created_at));
+    snapshot.courses = [...added, ...courses];
+  }
+
+  // Пустые фильтры в запрос не попадают
+  private filterParams(filters: CourseFilters): HttpParams {
+    let params = new HttpParams();
+    for (const [name, value] of Object.entries(filters)) {
+      if (value !== null && value !== undefined && value !== '') {
+        params = params.set(name, String(value));
+      }
+    }
+    return params;
+  }
+
+  /**
+   * Ищет курсы на сервере (по названию, описанию, категории и преподавателю).
+   * @param query - строка поиска, поддерживает префиксы слов
+   */
+  searchCourses(query: string): Observable<{ query: string; results: Course[] }> {
+    return this.http.get<{ query: string; results: Course[] }>(`${this.apiUrl}/courses/search/`, { params: { q: query } });
   }
 
   /**
@@ -95,10 +272,19 @@ export class CourseService {
   }
 
   /**
-   * Получает список записей (enrollments) для текущего залогиненного пользователя.
+   * Получает страницу записей (enrollments) для текущего залогиненного пользователя.
+   * @param pageUrl - ссылка `next` из предыдущей страницы (первая страница, если не указана)
+   */
+  getMyEnrollments(pageUrl?: string | null): Observable<Page<Enrollment>> {
+    return this.http.get<Page<Enrollment>>(pageUrl || `${this.apiUrl}/enrollments/`);
+  }
+
+  /**
+   * Получает страницу дашборда "Мои курсы" для текущего студента.
+   * @param pageUrl - ссылка `next` из предыдущей страницы (первая страница, если не указана)
    */
-  getMyEnrollments(): Observable<Enrollment[]> {
-    return this.http.get<Enrollment[]>(`${this.apiUrl}/enrollments/`);
+  getMyCourses(pageUrl?: string | null): Observable<Page<DashboardEntry>> {
+    return this.http.get<Page<DashboardEntry>>(pageUrl || `${this.apiUrl}/my-courses/`);
   }
 
   // --- НОВЫЙ МЕТОД ДЛЯ ОБНОВЛЕНИЯ КУРСА ---